@@ -1,39 +1,114 @@
 import datetime
-import os
+import threading
+import shutil
+import gzip
+import time
 import json
+import os
 
 def open_makedirs(filename, *args, **kwargs):
     """ Open file, creating the parent directories if neccesary. """
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     return open(filename, *args, **kwargs)
 
-def grottext(conf, data, jsonmsg) :
+def gzip_file(filename):
+    """ Compress filename to filename.gz and remove filename. """
+    try:
+        with open(filename, 'rb') as src, gzip.open(filename + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(filename)
+    except OSError as e:
+        print("\t - Grott grotcsv gzip failed:", filename, e)
+
+class CsvWriter:
     """
-    Grot extension to log data to CSV file
-    One CSV file per day is saved.
-    extvar configuration:
-    "outpath": path where to save CSV files, default: "/home/pi/grottlog"
-    "csvheader": comma separated string with fields to store, defaults to all available fields
-    Updated: 2022-01-05
-    Version 2.6.1
+    Long-lived CSV writer for one output path.
+    The daily file is kept open (buffered), lines are flushed every flushlines lines or flushinterval seconds,
+    at midnight the file is closed (and gzipped if configured) and a new file is started.
     """
 
-    resultcode = 0
-
-    if conf.verbose :
-
-        print("\t - " + "Grott extension module entered ")
-        ###
-        ### uncomment this print statements if you want to see the information that is availble.
-        ###
-
-        # print(jsonmsg)
-        # print(data)
-        # print(dir(conf))
-        # print(conf.extvar)
-
-    jsonobj = json.loads(jsonmsg)
-
+    def __init__(self, outpath, flushlines=100, flushinterval=60, compress=False):
+        self.outpath = outpath
+        self.flushlines = flushlines
+        self.flushinterval = flushinterval
+        self.compress = compress
+        self.lock = threading.Lock()
+        self.file = None
+        self.filename = None
+        self.day = None
+        self.unflushed = 0
+        self.lastflush = time.monotonic()
+        self.flusher = threading.Thread(target=self.run, name="grotcsv", daemon=True)
+        self.flusher.start()
+
+    def filename_for(self, now):
+        return os.path.join(self.outpath, '{0.year}-minute/{0.year}{0.month:02}{0.day:02}.csv'.format(now))
+
+    def open(self, now, csvheader):
+        self.filename = self.filename_for(now)
+        self.day = now.date()
+        self.file = open_makedirs(self.filename, 'a', buffering=64*1024)
+        if self.file.tell() == 0:
+            self.file.write(csvheader + '\n')
+
+    def rotate(self):
+        # close the file of the previous day (gzip in the background, grott keeps running)
+        self.flush()
+        self.file.close()
+        if self.compress:
+            threading.Thread(target=gzip_file, args=(self.filename,), name="grotcsv-gzip", daemon=True).start()
+        self.file = None
+
+    def write(self, lines, csvheader):
+        now = datetime.datetime.now()
+        with self.lock:
+            if self.file is not None and now.date() != self.day:
+                self.rotate()
+            if self.file is None:
+                self.open(now, csvheader)
+            self.file.writelines(lines)
+            self.unflushed += len(lines)
+            if self.unflushed >= self.flushlines or time.monotonic() - self.lastflush >= self.flushinterval:
+                self.flush()
+
+    def flush(self):
+        if self.file is not None and self.unflushed:
+            self.file.flush()
+        self.unflushed = 0
+        self.lastflush = time.monotonic()
+
+    def run(self):
+        # flush lines waiting longer than flushinterval and rotate at midnight, also if no records are received
+        while True:
+            time.sleep(min(max(self.flushinterval, 1), 60))
+            with self.lock:
+                if self.file is None:
+                    continue
+                if datetime.datetime.now().date() != self.day:
+                    self.rotate()
+                elif time.monotonic() - self.lastflush >= self.flushinterval:
+                    self.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.flush()
+                self.file.close()
+                self.file = None
+
+# one writer per output path (kept open between records)
+writers = {}
+
+def get_writer(conf, outpath):
+    writer = writers.get(outpath)
+    if writer is None:
+        writer = writers[outpath] = CsvWriter(outpath,
+                                              int(conf.extvar.get("flushlines", 100)),
+                                              float(conf.extvar.get("flushinterval", 60)),
+                                              str(conf.extvar.get("gzip", False)).lower() in ("true", "yes", "on", "1"))
+    return writer
+
+def get_options(conf, fields):
     try:
         outpath = conf.extvar["outpath"]
     except:
@@ -41,17 +116,71 @@ def grottext(conf, data, jsonmsg) :
     try:
         csvheader = conf.extvar["csvheader"]
     except:
-        csvheader = "device,time," + ",".join(jsonobj["values"].keys())
+        csvheader = "device,time," + ",".join(fields)
     csventries = [s.strip() for s in csvheader.split(',')]
+    return outpath, csvheader, csventries
 
-    now = datetime.datetime.now()
-    csvfile = os.path.join(outpath, '{0.year}-minute/{0.year}{0.month:02}{0.day:02}.csv'.format(now))
+def csv_line(device, rectime, values, csventries):
+    values = dict(values, device=device, time=rectime)
+    if "totworktime" in values and isinstance(values["totworktime"], float):
+        # round totworktime a bit so it doesn't take 18 characters
+        values["totworktime"] = round(values["totworktime"], 2)
+    return ','.join(str(values[k]) for k in csventries) + '\n'
 
-    values = {
-        "device":jsonobj["device"],
-        "time":jsonobj["time"],
-    }
+def grottext_batch(conf, records) :
+    """
+    Grot extension to log data to CSV file (extension API v2, all waiting records in one call)
+    One CSV file per day is saved, the file is kept open and written buffered.
+    extvar configuration:
+    "outpath": path where to save CSV files, default: "/home/pi/grottlog"
+    "csvheader": comma separated string with fields to store, defaults to all available fields
+    "flushlines": write buffered lines to disk after this number of lines, default: 100
+    "flushinterval": write buffered lines to disk after this number of seconds, default: 60
+    "gzip": compress the file of the previous day after midnight (True / False), default: False
+    Updated: 2026-10-18
+    Version 2.8.4
+    """
+
+    if not records:
+        return 0
+
+    # the fields are resolved per record (a batch can hold records of different layouts, e.g. inverter and smart meter)
+    # consecutive records with the same csvheader are written in one call
+    groups = []
+    for record in records:
+        outpath, csvheader, csventries = get_options(conf, record.values.keys())
+        if not groups or groups[-1][1] != csvheader:
+            groups.append((outpath, csvheader, []))
+        groups[-1][2].append(csv_line(record.device, record.time, record.values, csventries))
+
+    for outpath, csvheader, lines in groups:
+        if conf.verbose :
+            print("\t - " + "Grott extension module entered ")
+            print("csvheader: ", csvheader)
+            print("csvlines: ", len(lines))
+
+        get_writer(conf, outpath).write(lines, csvheader)
+
+    return 0
+
+def grottext_stop(conf) :
+    """
+    Called at grott shutdown after the last record is processed: write the buffered lines and close the files.
+    """
+
+    for writer in writers.values():
+        writer.close()
 
+def grottext(conf, data, jsonmsg) :
+    """
+    Grot extension to log data to CSV file (extension API v1, used by grott versions without grottext_batch)
+    Same configuration as grottext_batch.
+    """
+
+    jsonobj = json.loads(jsonmsg)
+    outpath, csvheader, csventries = get_options(conf, jsonobj["values"].keys())
+
+    values = {}
     for key in jsonobj["values"]:
         # test if there is an divide factor is specifed
         try:
@@ -61,22 +190,16 @@ def grottext(conf, data, jsonmsg) :
 
         if type(jsonobj["values"][key]) != type(str()) and keydivide != 1:
             values[key] = jsonobj["values"][key]/keydivide
-            if key == "totworktime":
-                # round totworktime a bit so it doesn't take 18 characters
-                values[key] = round(values[key], 2)
         else:
             values[key] = jsonobj["values"][key]
 
-    csvline = ','.join(str(values[k]) for k in csventries) + '\n'
+    csvline = csv_line(jsonobj["device"], jsonobj["time"], values, csventries)
 
     if conf.verbose :
-        print("csvfile: ", csvfile)
+        print("\t - " + "Grott extension module entered ")
         print("csvheader: ", csvheader)
         print("csvline: ", csvline)
 
-    with open_makedirs(csvfile, 'a') as f:
-        if os.path.getsize(csvfile) == 0:
-            f.write(csvheader + '\n')
-        f.write(csvline)
+    get_writer(conf, outpath).write([csvline], csvheader)
 
-    return resultcode
+    return 0
@@ -2,13 +2,14 @@
 # author Etienne G.
 
 import json
+import threading
 from datetime import datetime, timezone
 
-from paho.mqtt.publish import single, multiple
-
 from grottconf import Conf
+from grottlog import logger
+from grottmqtt import MqttPublisher
 
-__version__ = "0.0.7-rc2"
+__version__ = "0.0.8"
 
 """A pluging for grott
 This plugin allow to have autodiscovery of the device in HA
@@ -20,6 +21,13 @@ Config:
     - ha_mqtt_port (required): The port (the default is oftent 1883)
     - ha_mqtt_user (optional): The user use to connect to the broker (you can use your user)
     - ha_mqtt_password (optional): The password to connect to the mqtt broket (you can use your password)
+    - ha_deadband (optional): Minimal change (in HA unit) before a value is published again, per sensor
+      e.g. {"pvpowerout": 5, "pvtemperature": 0.5}, the key "default" applies to all other numeric sensors
+    - ha_status_topic (optional): The HA birth / status topic (default: homeassistant/status)
+
+One MQTT connection is kept open. Every sensor has its own state topic and only changed values are
+published. The discovery configs are sent once per device and again when HA (re)starts (birth message
+"online" on the status topic), the values are then published again as well.
 
 Return codes:
     - 0: Everything is OK
@@ -34,7 +42,8 @@ Return codes:
 
 
 config_topic = "homeassistant/{sensor_type}/grott/{device}_{attribut}/config"
-state_topic = "homeassistant/grott/{device}/state"
+state_topic = "homeassistant/grott/{device}/{attribut}/state"
+status_topic = "homeassistant/status"
 
 
 mapping = {
@@ -497,7 +506,7 @@ def make_payload(conf: Conf, device: str, name: str, key: str, unit: str = None)
     payload = {
         "name": "{name}",
         "unique_id": f"grott_{device}_{key}",  # Generate a unique device ID
-        "state_topic": f"homeassistant/grott/{device}/state",
+        "state_topic": state_topic.format(device=device, attribut=key),
         "device": {
             "identifiers": [device],  # Group under a device
             "name": device,
@@ -530,17 +539,111 @@ def make_payload(conf: Conf, device: str, name: str, key: str, unit: str = None)
     return payload
 
 
+def get_divide(conf: Conf, key: str):
+    "Divide factor of key in the current layout (1 if not defined)"
+    try:
+        return float(conf.recorddict[conf.layout][key].get("divide", 1))
+    except (KeyError, AttributeError, TypeError, ValueError):
+        return 1
+
+
+def diff_values(conf: Conf, last: dict, values: dict, deadband: dict):
+    "Return the values that are new or changed more than their deadband (HA unit) compared to last"
+    default = deadband.get("default", 0)
+    changed = {}
+    for key, value in values.items():
+        if key in last:
+            previous = last[key]
+            if isinstance(value, (int, float)) and isinstance(previous, (int, float)):
+                if abs(value - previous) / get_divide(conf, key) <= deadband.get(
+                    key, default
+                ):
+                    continue
+            elif value == previous:
+                continue
+        changed[key] = value
+    return changed
+
+
 class MqttStateHandler:
-    __pv_config = {}
+    """Persistent MQTT client, discovery state and last published values
+
+    The state is reset by the extension worker (check_resend) when HA restarted (the paho thread
+    only sets the resend flag) or when the publisher dropped messages (the dropped values are unknown).
+    """
+
     client_name = "Grott - HA"
 
-    @classmethod
-    def is_configured(cls, serial: str):
-        return cls.__pv_config.get(serial, False)
+    def __init__(self, conf: Conf):
+        params = process_conf(conf)
+        self.client = MqttPublisher(
+            params["hostname"],
+            params["port"],
+            client_id=params["client_id"],
+            auth=params["auth"],
+        )
+        self.deadband = conf.extvar.get("ha_deadband", {})
+        self.__pv_config = {}
+        self.__last_values = {}
+        self.lock = threading.Lock()
+        self.resend = threading.Event()
+        self.lost = self.lost_messages()
+        self.client.subscribe(
+            conf.extvar.get("ha_status_topic", status_topic), self.on_status
+        )
+
+    def on_status(self, topic, payload):
+        # HA (re)started: send the discovery configs and all values again (with the next record)
+        if payload.strip().lower() == b"online":
+            logger.info(
+                "\tGrott HA %s - HA online, resending configuration", __version__
+            )
+            self.resend.set()
+
+    def lost_messages(self):
+        return self.client.dropped + self.client.failed
+
+    def check_resend(self):
+        "Reset the state after an HA restart (all) or dropped messages (published values)"
+        lost = self.lost_messages()
+        with self.lock:
+            if self.resend.is_set():
+                self.resend.clear()
+                self.__pv_config.clear()
+                self.__last_values.clear()
+            elif lost != self.lost:
+                self.__last_values.clear()
+            self.lost = lost
+
+    def is_configured(self, serial: str):
+        with self.lock:
+            return self.__pv_config.get(serial, False)
+
+    def set_configured(self, serial: str):
+        with self.lock:
+            self.__pv_config[serial] = True
+
+    def changed_values(self, conf: Conf, serial: str, values: dict):
+        "Return the values that changed more than the deadband since the last publish"
+        with self.lock:
+            return diff_values(
+                conf, self.__last_values.setdefault(serial, {}), values, self.deadband
+            )
+
+    def set_published(self, serial: str, values: dict):
+        with self.lock:
+            self.__last_values.setdefault(serial, {}).update(values)
 
-    @classmethod
-    def set_configured(cls, serial: str):
-        cls.__pv_config[serial] = True
+
+handler = None
+
+
+def get_handler(conf: Conf):
+    "Create the persistent MQTT client at the first record"
+    global handler
+    if handler is None:
+        handler = MqttStateHandler(conf)
+    return handler
 
 
 def process_conf(conf: Conf):
@@ -572,16 +675,6 @@ def process_conf(conf: Conf):
     }
 
 
-def publish_single(conf: Conf, topic, payload, retain=False):
-    conf = process_conf(conf)
-    return single(topic, payload=payload, retain=retain, **conf)
-
-
-def publish_multiple(conf: Conf, msgs):
-    conf = process_conf(conf)
-    return multiple(msgs, **conf)
-
-
 def grottext(conf: Conf, data: str, jsonmsg: str):
     """Allow to push to HA MQTT bus, with auto discovery"""
 
@@ -593,6 +686,13 @@ def grottext(conf: Conf, data: str, jsonmsg: str):
         print("Missing configuration for ha_mqtt")
         return 1
 
+    try:
+        state = get_handler(conf)
+    except Exception as e:
+        print("[HA ext] - Exception while connecting - {}".format(e))
+        return 3
+    state.check_resend()
+
     # Need to decode the json string
     jsonmsg = json.loads(jsonmsg)
 
@@ -611,10 +711,7 @@ def grottext(conf: Conf, data: str, jsonmsg: str):
     values["grott_last_push"] = dt.isoformat()
 
     # Layout can be undefined
-    if not MqttStateHandler.is_configured(device_serial) and getattr(
-        conf, "layout", None
-    ):
-        configs_payloads = []
+    if not state.is_configured(device_serial) and getattr(conf, "layout", None):
         print(f"\tGrott HA {__version__} - creating {device_serial} config in HA")
         for key in values.keys():
             # Generate a configuration payload
@@ -629,56 +726,37 @@ def grottext(conf: Conf, data: str, jsonmsg: str):
                     device=device_serial,
                     attribut=key,
                 )
-                configs_payloads.append(
-                    {
-                        "topic": topic,
-                        "payload": json.dumps(payload),
-                        "retain": True,
-                    }
-                )
+                state.client.publish(topic, json.dumps(payload), retain=True)
             except Exception as e:
                 print(
                     f"\t - [grott HA] {__version__} Exception while creating new sensor {key}: {e}"
                 )
                 return 6
 
-        # Create a virtual last_push key to allow tracking when there was the last data transmission
-
-        try:
-            key = "grott_last_push"
-            payload = make_payload(conf, device_serial, key, key)
-            topic = config_topic.format(
-                sensor_type="sensor",
-                device=device_serial,
-                attribut=key,
-            )
-            configs_payloads.append(
-                {
-                    "topic": topic,
-                    "payload": json.dumps(payload),
-                    "retain": True,
-                }
-            )
-        except Exception as e:
-            print(
-                f"\t - [grott HA] {__version__} Exception while creating new sensor last push: {e}"
-            )
-            return 4
-        publish_multiple(conf, configs_payloads)
-        # Now it's configured, no need to come back
-        MqttStateHandler.set_configured(device_serial)
+        # Now it's configured, no need to come back (until HA restarts)
+        state.set_configured(device_serial)
 
-    if not MqttStateHandler.is_configured(device_serial):
+    if not state.is_configured(device_serial):
         print(f"\t[Grott HA] {__version__} Can't configure device: {device_serial}")
         return 7
 
-    # Push the vales to the topics
+    # Push the changed values to the sensor topics
+    # only the values queued by the publisher are recorded as published (sent again if dropped)
+    changed = state.changed_values(conf, device_serial, values)
+    published = {}
     try:
-        publish_single(
-            conf, state_topic.format(device=device_serial), json.dumps(values)
-        )
+        for key, value in changed.items():
+            if not state.client.publish(
+                state_topic.format(device=device_serial, attribut=key),
+                json.dumps({key: value}),
+            ):
+                raise OSError("publish queue full")
+            published[key] = value
     except Exception as e:
         print("[HA ext] - Exception while publishing - {}".format(e))
-        # Reset connection state in case of problem
         return 2
+    finally:
+        state.set_published(device_serial, published)
+    if conf.verbose:
+        print(f"\t - Grott HA - {len(changed)} of {len(values)} values published")
     return 0
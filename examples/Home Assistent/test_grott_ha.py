@@ -6,7 +6,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 
 import pytest
 from grottconf import Conf
-from grott_ha import make_payload, mapping
+from grott_ha import MqttStateHandler, diff_values, make_payload, mapping
 
 
 @pytest.fixture
@@ -101,3 +101,46 @@ def test_name_generation_non_mapped(conf):
     payload = make_payload(conf, serial, "test", "test")
 
     assert payload["name"] == "NCO7410 test"
+
+
+def test_diff_values(conf):
+    "Test that only new and changed values are published"
+    last = {"pvserial": "NCO7410", "pvstatus": 1, "pvpowerout": 1000}
+    values = {"pvserial": "NCO7410", "pvstatus": 1, "pvpowerout": 1001, "pvtemperature": 300}
+
+    changed = diff_values(conf, last, values, {})
+    assert changed == {"pvpowerout": 1001, "pvtemperature": 300}
+
+
+def test_diff_values_deadband(conf):
+    "Test that the deadband is applied in HA unit (after the divider)"
+    last = {"pvpowerout": 1000, "pvstatus": 1}
+    # pvpowerout divider is 10: 1040 is 4 W more
+    values = {"pvpowerout": 1040, "pvstatus": 2}
+
+    assert diff_values(conf, last, values, {"pvpowerout": 5}) == {"pvstatus": 2}
+    assert diff_values(conf, last, values, {"pvpowerout": 3}) == values
+    assert diff_values(conf, last, values, {"default": 5}) == {}
+
+
+def test_state_resend(conf):
+    "Test that the values are sent again after a publisher drop and the configs after an HA restart"
+    conf.extvar = {"ha_mqtt_host": "127.0.0.1", "ha_mqtt_port": 1}
+    state = MqttStateHandler(conf)
+    state.client.running = False
+    state.set_configured(serial)
+    state.set_published(serial, {"pvpowerout": 1000})
+    state.check_resend()
+    assert state.changed_values(conf, serial, {"pvpowerout": 1000}) == {}
+
+    # a message was dropped by the publisher: all values are sent again
+    state.client.dropped += 1
+    state.check_resend()
+    assert state.changed_values(conf, serial, {"pvpowerout": 1000}) == {"pvpowerout": 1000}
+    assert state.is_configured(serial)
+
+    # HA restarted: the configs are sent again (at the next record)
+    state.on_status("homeassistant/status", b"online")
+    assert state.is_configured(serial)
+    state.check_resend()
+    assert not state.is_configured(serial)
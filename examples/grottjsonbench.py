@@ -0,0 +1,42 @@
+#Benchmark: precompiled JSON serializer (grottdata.JsonSerializer) vs json.dumps for the MQTT message.
+#Run from the grott directory (layout json files are loaded like in grott): python examples/grottjsonbench.py
+# Updated: 2026-10-18
+# Version 2.8.4
+
+verrel = "2.8.4"
+
+import sys, json, random, timeit
+
+sys.path.insert(0, ".")
+from grottconf import Conf
+
+#proces config file
+conf = Conf(verrel)
+
+rnd = random.Random(1)
+loops = 2000
+
+print("\nlayout".ljust(22), "fields".rjust(7), "json.dumps (us)".rjust(16), "serializer (us)".rjust(16), "gain".rjust(7))
+total_dumps = total_ser = 0
+for name, decoder in sorted(conf.decoders.items()):
+    #create record values of the right type (text fields get a serial like string)
+    values = []
+    for field in decoder.recordfields:
+        spec = conf.recorddict[name].get(field, {})
+        if spec.get("type") == "text" or field in ("pvserial", "device", "datalogserial"):
+            values.append("".join(rnd.choice("ABCDEF0123456789") for _ in range(10)))
+        else:
+            values.append(rnd.randint(0, 65535))
+    jsonobj = {"device": values[0], "time": "2026-10-18T12:00:00", "buffered": "no", "values": dict(zip(decoder.recordfields, values))}
+    serializer = decoder.serializer
+
+    #output must be identical
+    assert serializer.dumps(jsonobj["device"], jsonobj["time"], "no", values) == json.dumps(jsonobj), name
+
+    t_dumps = timeit.timeit(lambda: json.dumps({"device": jsonobj["device"], "time": jsonobj["time"], "buffered": "no", "values": dict(zip(decoder.recordfields, values))}), number=loops) / loops * 1e6
+    t_ser = timeit.timeit(lambda: serializer.dumps(jsonobj["device"], jsonobj["time"], "no", values), number=loops) / loops * 1e6
+    total_dumps += t_dumps
+    total_ser += t_ser
+    print(name.ljust(21), str(len(values)).rjust(7), "{:16.2f}".format(t_dumps), "{:16.2f}".format(t_ser), "{:6.1f}x".format(t_dumps / t_ser))
+
+print("\ntotal".ljust(22), "".rjust(7), "{:16.2f}".format(total_dumps), "{:16.2f}".format(total_ser), "{:6.1f}x".format(total_dumps / total_ser))
@@ -0,0 +1,125 @@
+#Benchmark: grott proxy latency and idle CPU load by number of concurrent datalogger connections.
+#A local echo server is used as Growatt server, ping records (not processed) are sent through the proxy and the round trip is measured.
+#Run from the grott directory: python examples/grottproxybench.py [proxy module file ...] (default grottproxy.py grottaproxy.py)
+#To compare with a previous version: git show <commit>:grottproxy.py > /tmp/grottproxy_old.py
+#                                    python examples/grottproxybench.py /tmp/grottproxy_old.py grottproxy.py
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import sys, time, random, socket, selectors, threading, importlib.util, types
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, ".")
+import grottcodec
+
+levels = (10, 100, 500, 1000, 2000, 4000)
+rounds = 300
+
+#more connections than the default open files limit
+if resource is not None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def echo_server(port):
+    #Growatt server stand-in: returns every received record
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", port))
+    server.listen(4096)
+    sel = selectors.DefaultSelector()
+    sel.register(server, selectors.EVENT_READ)
+    while True:
+        for key, mask in sel.select():
+            if key.fileobj is server:
+                conn, addr = server.accept()
+                sel.register(conn, selectors.EVENT_READ)
+                continue
+            try:
+                data = key.fileobj.recv(4096)
+            except OSError:
+                data = b""
+            if data:
+                key.fileobj.sendall(data)
+            else:
+                sel.unregister(key.fileobj)
+                key.fileobj.close()
+
+def run_proxy(proxy, conf, state):
+    try:
+        proxy.main(conf)
+    except Exception as e:
+        state["error"] = repr(e)
+
+def bench(filename):
+    spec = importlib.util.spec_from_file_location("grottproxy_bench_%d" % id(filename), filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    echoport = free_port()
+    threading.Thread(target=echo_server, args=(echoport,), daemon=True).start()
+    time.sleep(0.1)
+    conf = types.SimpleNamespace(grottip="127.0.0.1", grottport=free_port(), growattip="127.0.0.1", growattport=echoport,
+                                 verbose=False, blockcmd=False, minrecl=100000, recwl=[], noipf=False, decodeworkers=1, decodequeue=1000, connecttimeout=10, dnsttl=300)
+    proxy = module.Proxy(conf) if hasattr(module, "Proxy") else module.AsyncProxy(conf)
+    state = {"error": None}
+    threading.Thread(target=run_proxy, args=(proxy, conf, state), daemon=True).start()
+    #wait until the proxy listens
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", conf.grottport), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    #ping record (06 protocol, with crc)
+    payload = bytes(random.Random(1).getrandbits(8) for _ in range(30))
+    record = grottcodec.add_crc(bytes.fromhex("00010006") + (len(payload) + 2).to_bytes(2, "big") + bytes.fromhex("0116") + payload)
+
+    print("\n" + filename)
+    print("connections".rjust(12), "avg (ms)".rjust(10), "p50 (ms)".rjust(10), "p99 (ms)".rjust(10), "max (ms)".rjust(10), "idle cpu %".rjust(11))
+    clients = []
+    rnd = random.Random(2)
+    for level in levels:
+        try:
+            while len(clients) < level and state["error"] is None:
+                sock = socket.create_connection(("127.0.0.1", conf.grottport), timeout=5)
+                clients.append(sock)
+            latencies = []
+            for _ in range(rounds):
+                if state["error"] is not None:
+                    break
+                sock = rnd.choice(clients)
+                start = time.perf_counter()
+                sock.sendall(record)
+                received = b""
+                while len(received) < len(record):
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        raise OSError("connection closed by proxy")
+                    received += chunk
+                latencies.append(time.perf_counter() - start)
+        except OSError as e:
+            state["error"] = state["error"] or repr(e)
+        if state["error"] is not None:
+            print(str(level).rjust(12), "  failed:", state["error"])
+            break
+        #cpu time used by the process (proxy, echo server, benchmark) while all connections are idle
+        cpu = time.process_time()
+        time.sleep(1)
+        cpu = (time.process_time() - cpu) * 100
+        latencies.sort()
+        print(str(level).rjust(12), "{:10.3f}".format(sum(latencies) / len(latencies) * 1000), "{:10.3f}".format(latencies[len(latencies) // 2] * 1000),
+              "{:10.3f}".format(latencies[int(len(latencies) * 0.99)] * 1000), "{:10.3f}".format(latencies[-1] * 1000), "{:11.1f}".format(cpu))
+    for sock in clients:
+        sock.close()
+
+for filename in sys.argv[1:] or ["grottproxy.py", "grottaproxy.py"]:
+    bench(filename)
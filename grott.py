@@ -10,14 +10,15 @@
 #
 #       For version history see: version_history.txt
 
-# Updated: 2023-12-04
+# Updated: 2026-10-18
 
-verrel = "2.8.3"
+verrel = "2.8.4"
 
 import sys
 
 from grottconf import Conf
 from grottproxy import Proxy
+from grottaproxy import AsyncProxy
 from grottsniffer import Sniff
 
 #proces config file
@@ -36,12 +37,21 @@ if conf.mode == 'proxy':
         except KeyboardInterrupt:
             print("Ctrl C - Stopping server")
             try: 
-                proxy.on_close(conf)
+                proxy.close(conf)
             except:     
                 print("\t - no ports to close")
             sys.exit(1)
 
-if conf.mode == 'sniff':
+elif conf.mode == 'aproxy':
+        proxy = AsyncProxy(conf)
+        try:
+            proxy.main(conf)
+        except KeyboardInterrupt:
+            print("Ctrl C - Stopping server")
+            proxy.close(conf)
+            sys.exit(1)
+
+elif conf.mode == 'sniff':
         sniff = Sniff(conf)
         try: 
             sniff.main(conf)
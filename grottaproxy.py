@@ -0,0 +1,120 @@
+#Grott Growatt monitor :  asyncio Proxy (mode = aproxy)
+#
+# Same function as grottproxy, implemented with asyncio streams: asyncio.start_server accepts the datalogger connections,
+# for every connection an upstream connection to the Growatt server is opened and both directions are piped by a coroutine.
+# Writes wait for drain() (back pressure: a slow side stops reading from the other side), when one side disconnects
+# the other pipe is cancelled and both connections are closed. Records are forwarded first and then queued to the decode
+# workers (procdata, grottsink.SinkWorker as in grottproxy), the pipe never waits for decoding or the outputs.
+# Records are reassembled per direction (grottcodec.FrameReader).
+# The Growatt server address comes from the grottproxy Resolver cache, connects are limited to connecttimeout seconds.
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import socket
+import asyncio
+
+import grottcodec
+
+from grottdata import procdata
+from grottlog import logger
+from grottsink import SinkWorker
+from grottproxy import Resolver, filter_record, buffer_size, backlog
+
+class AsyncProxy:
+
+    def __init__(self, conf):
+        logger.info("\nGrott asyncio proxy mode started")
+        #set default grottip address
+        if conf.grottip == "default" : conf.grottip = '0.0.0.0'
+        try:
+            hostname = (socket.gethostname())
+            logger.info("Hostname : %s", hostname)
+            logger.info("IP :  %s , port :  %s \n", socket.gethostbyname(hostname), conf.grottport)
+        except:
+            logger.info("IP and port information not available")
+        self.forward_to = (conf.growattip, conf.growattport)
+        self.connecttimeout = conf.connecttimeout
+        self.resolver = Resolver(conf.dnsttl)
+        self.resolver.refresh(conf.growattip, conf.growattport)
+        #decode / dispatch workers (stats: queue depth, dropped records)
+        self.decoder = SinkWorker("decode", procdata, conf.decodequeue, "dropoldest", workers=conf.decodeworkers)
+        self.connections = 0                                    #open datalogger connections
+        self.server = None
+
+    def main(self, conf):
+        asyncio.run(self.serve(conf))
+
+    async def serve(self, conf):
+        self.server = await asyncio.start_server(lambda reader, writer: self.handle(conf, reader, writer),
+                                                 conf.grottip, conf.grottport, backlog=backlog, reuse_address=True)
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle(self, conf, reader, writer):
+        # datalogger connected: open the upstream connection and pipe both directions until one side disconnects
+        clientaddr = writer.get_extra_info("peername")
+        address = self.resolver.resolve(self.forward_to[0], self.forward_to[1])
+        try:
+            if address is None:
+                raise OSError("{} not resolved".format(self.forward_to[0]))
+            upreader, upwriter = await asyncio.wait_for(asyncio.open_connection(address[0], address[1]), self.connecttimeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            if isinstance(e, asyncio.TimeoutError): e = "connect timeout ({} sec)".format(self.connecttimeout)
+            logger.error("\t - Grott - grottproxy forward error :  %s", e)
+            if conf.verbose: logger.debug("\t - Closing connection with client side %s", clientaddr)
+            writer.close()
+            return
+        if conf.verbose: logger.debug("\t - %s has connected", clientaddr)
+        self.connections += 1
+        pipes = [asyncio.ensure_future(self.pipe(conf, reader, upwriter)),
+                 asyncio.ensure_future(self.pipe(conf, upreader, writer))]
+        try:
+            await asyncio.wait(pipes, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for pipe in pipes:
+                pipe.cancel()
+            for side in (writer, upwriter):
+                side.close()
+            self.connections -= 1
+            if conf.verbose: logger.debug("\t - %s has disconnected", clientaddr)
+
+    async def pipe(self, conf, reader, writer):
+        # forward records from reader to writer, valid records are queued to the decode workers
+        framer = grottcodec.FrameReader()
+        while True:
+            try:
+                data = await reader.read(buffer_size)
+            except OSError:
+                if conf.verbose : logger.debug("\t - Grott connection error")
+                return
+            if not data:
+                return
+            for record in framer.feed(data):
+                if not await self.forward(conf, writer, record):
+                    return
+
+    async def forward(self, conf, writer, data):
+        # forward and process one record, returns False if the connection is closed
+        logger.debug("")
+        logger.debug("\t - Growatt packet received:")
+        logger.debug("\t\t  %s", writer.get_extra_info("peername"))
+        if not filter_record(conf, data):
+            return True
+        # send data to destination
+        writer.write(data)
+        try:
+            await writer.drain()
+        except OSError:
+            return False
+        if len(data) > conf.minrecl :
+            #process received data (in a decode worker)
+            self.decoder.put(conf, data)
+        else:
+            if conf.verbose: logger.debug("\t - Data less then minimum record length, data not processed")
+        return True
+
+    def close(self, conf):
+        # stop accepting connections and the decode workers
+        if self.server is not None:
+            self.server.close()
+        self.decoder.stop()
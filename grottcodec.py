@@ -0,0 +1,165 @@
+# grottcodec.py Growatt record codec (scramble / unscramble and CRC)
+# shared by grottdata, grottproxy, grottsniffer and grottserver
+# FrameReader reassembles records from a TCP stream (a read can hold several records or a part of a record)
+# Updated: 2026-10-18
+# Version 2.8.4
+
+from functools import lru_cache
+
+#import libscrc for crc calculation, if not available a (slower) table driven modbus crc is used
+try:
+    import libscrc
+except:
+    libscrc = None
+
+# Growatt records are scrambled (XOR) with this mask, the 8 byte header is never scrambled
+MASK = b"Growatt"
+HEADER_LENGTH = 8
+
+def _crc_table():
+    # create modbus crc16 lookup table (reflected poly 0xA001)
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 1: crc = (crc >> 1) ^ 0xA001
+            else: crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+_CRCTABLE = _crc_table()
+
+@lru_cache(maxsize=64)
+def _mask(length):
+    # return the XOR mask for a body of <length> bytes as an integer (cached per record length)
+    repeat = MASK * (length // len(MASK) + 1)
+    return int.from_bytes(repeat[:length], "big")
+
+def decrypt(data):
+    # unscramble Growatt record (bytes, bytearray or memoryview), returns bytes
+    # scrambling is a symmetric XOR, the same routine is used to encrypt.
+    data = bytes(data)
+    nbody = len(data) - HEADER_LENGTH
+    if nbody <= 0:
+        return data
+    body = int.from_bytes(data[HEADER_LENGTH:], "big") ^ _mask(nbody)
+    return data[:HEADER_LENGTH] + body.to_bytes(nbody, "big")
+
+encrypt = decrypt
+
+def modbus_crc(data):
+    # calculate modbus crc16 over data
+    if libscrc is not None:
+        return libscrc.modbus(bytes(data))
+    crc = 0xFFFF
+    table = _CRCTABLE
+    for byte in bytes(data):
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+def add_crc(data):
+    # append modbus crc16 (big endian) to record
+    return bytes(data) + modbus_crc(data).to_bytes(2, "big")
+
+def check_crc(data):
+    # test if last 2 bytes of the record contain a valid modbus crc16
+    return len(data) > 2 and int.from_bytes(data[-2:], "big") == modbus_crc(data[:-2])
+
+def protocol(data):
+    # protocol id as used in layout names (e.g. "02", "05", "06")
+    return "{:02x}".format(data[3])
+
+def crc_length(data):
+    # "05" and "06" protocol records have a 2 byte crc trailer
+    return 2 if data[3] in (5, 6) else 0
+
+def validate_record(data):
+    # validata data record on length and CRC (for "05" and "06" records)
+    # returns 0 if record is valid, 8 if not
+    ldata = len(data)
+    if ldata < HEADER_LENGTH:
+        return 8
+    len_orgpayload = int.from_bytes(data[4:6], "big")
+    lcrc = crc_length(data)
+    len_realpayload = ldata - 6 - lcrc
+    if len_realpayload != len_orgpayload:
+        return 8
+    if lcrc and not check_crc(data):
+        return 8
+    return 0
+
+# protocol ids (header byte 3) of Growatt records
+PROTOCOLS = (2, 5, 6)
+# max record length (largest Growatt records are about 1 KB), a longer length field is a corrupt header
+MAX_RECORD_LENGTH = 4096
+
+class FrameReader:
+    # incremental record reassembler for one TCP stream (connection / direction)
+    # record length = 6 (sequence, protocol, payload length) + payload length (header bytes 4-6) + crc trailer (05 / 06)
+    # a header with a length above MAX_RECORD_LENGTH or a 05 / 06 record with an invalid crc is dropped and the
+    # next plausible record header is searched (resync), so one corrupt record does not stall the stream.
+    # 02 records (no crc) found by a resync are only accepted if followed by the next record header or the end of the data.
+    __slots__ = ("buffer", "resync", "dropped")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.resync = False                                     #searching the next record header after a corrupt record
+        self.dropped = 0                                        #bytes dropped by resync
+
+    def feed(self, data):
+        # add received data, returns the complete records (list of bytes), an incomplete record is kept until the rest is fed
+        # data that does not start with a Growatt record header can not be framed and is returned unchanged
+        buffer = self.buffer
+        buffer += data
+        size = len(buffer)
+        frames = []
+        pos = 0
+        skip = 0
+        view = memoryview(buffer)
+        try:
+            while size - pos >= 4:
+                if view[pos+2] != 0 or view[pos+3] not in PROTOCOLS:
+                    if self.resync:
+                        pos += 1
+                        skip += 1
+                        continue
+                    frames.append(bytes(view[pos:]))
+                    pos = size
+                    break
+                if size - pos < 6:
+                    break
+                lcrc = 2 if view[pos+3] in (5, 6) else 0
+                end = pos + 6 + int.from_bytes(view[pos+4:pos+6], "big") + lcrc
+                if end - pos > MAX_RECORD_LENGTH:
+                    self.resync = True
+                    pos += 1
+                    skip += 1
+                    continue
+                if end > size:
+                    break
+                if lcrc and not check_crc(view[pos:end]):
+                    self.resync = True
+                    pos += 1
+                    skip += 1
+                    continue
+                if self.resync and not lcrc and end < size:
+                    # 02 records have no crc: after a resync the record must be followed by a record header
+                    if size - end < 4:
+                        break
+                    if view[end+2] != 0 or view[end+3] not in PROTOCOLS:
+                        pos += 1
+                        skip += 1
+                        continue
+                frames.append(bytes(view[pos:end]))
+                pos = end
+                self.resync = False
+        finally:
+            view.release()
+        if pos:
+            del buffer[:pos]
+        self.dropped += skip
+        return frames
+
+    def pending(self):
+        # bytes of an incomplete record
+        return len(self.buffer)
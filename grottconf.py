@@ -5,8 +5,10 @@
 
 import configparser, sys, argparse, os, json, io
 import ipaddress
+import grottlog
 from os import walk
-from grottdata import format_multi_line, str2bool
+from grottdata import format_multi_line, str2bool, str2list, UtcConverter, PVOUTPUTFIELDS
+from grottdecoder import compile_layouts
 
 class Conf : 
 
@@ -16,6 +18,16 @@ class Conf :
         #Set default variables 
         self.verbose = False
         self.trace = False
+        self.lograte = 0                                                                            #max messages per second for each log message (0 = no limit)
+        self.tracesample = 1                                                                        #log every nth hex dump (1 = all)
+        self.dispatch = True                                                                        #process outputs in own worker thread (False = sequential in record processing)
+        self.sinkqueue = 1000                                                                       #max records waiting per output
+        self.decodeworkers = 1                                                                      #proxy: record decode / dispatch worker threads
+        self.decodequeue = 1000                                                                     #proxy: max records waiting to be decoded (oldest are dropped)
+        self.dispatcher = None                                                                      #output dispatcher (grottsink.Dispatcher)
+        self.spooldir = ""                                                                          #directory to save MQTT / InfluxDB messages that can not be sent ("" = no spool)
+        self.spoolsize = 100                                                                        #max spool size per output (MB)
+        self.spoolrate = 100                                                                        #max spooled messages sent per second after the output is available again
         self.cfgfile = "grott.ini"
         self.minrecl = 100
         self.decrypt = True
@@ -34,11 +46,14 @@ class Conf :
         self.grottip = "default"                                                                    #connect to server IP adress     
         self.outfile ="sys.stdout"  
         self.tmzone = "local"                                                                       #set timezone (at this moment only used for influxdb)                
+        self.utcconv = None                                                                         #timezone converter (UtcConverter), created at influx initialisation
 
         #Growatt server default 
         #self.growattip = "47.91.67.66"
         self.growattip = "server.growatt.com"
         self.growattport = 5279
+        self.connecttimeout = 10                                                                    #proxy: max seconds to connect to the Growatt server
+        self.dnsttl = 300                                                                           #proxy: seconds the Growatt server address is cached (refreshed in background)
 
         #MQTT default
         self.mqttip = "localhost"
@@ -52,6 +67,10 @@ class Conf :
         self.mqttuser = "grott"
         self.mqttpsw = "growatt2020"
         self.mqttretain = False
+        self.mqttfields = []                                                                        #fields needed in MQTT message (empty = all fields)
+        self.mqttqueue = 1000                                                                       #max MQTT messages waiting to be sent (oldest are dropped)
+        self.mqttclient = None                                                                      #persistent MQTT client (grottmqtt.MqttPublisher), created at init
+        self.mqttoverflow = "dropoldest"                                                            #output queue full: dropoldest, dropnewest or block
 
         #pvoutput default 
         self.pvoutput = False
@@ -65,6 +84,10 @@ class Conf :
         self.pvdisv1 = False
         self.pvtemp = False
         self.pvuplimit = 5
+        self.pvbatchurl = "https://pvoutput.org/service/r2/addbatchstatus.jsp"
+        self.pvbatchsize = 30                                                                       #max statuses per request (100 with PVOutput donation)
+        self.pvuploader = None                                                                      #PVOutput batch uploader (grottpvout.PvOutputUploader)
+        self.pvoverflow = "dropoldest"
         
         #influxdb default 
         self.influx = False
@@ -77,12 +100,25 @@ class Conf :
         self.iftoken  = "influx_token"
         self.iforg  = "grottorg"
         self.ifbucket = "grottdb" 
+        self.iffields = []                                                                          #fields written to influx (empty = all fields)
+        self.ifbatchsize = 100                                                                      #write to influx if batchsize points are collected
+        self.ifflushinterval = 1000                                                                 #or the oldest point waits flushinterval ms
+        self.ifwriter = None                                                                        #batched influx writer (grottinflux.InfluxBatchWriter)
+        self.ifnative = False                                                                       #write line protocol with grott http client (no influxdb libraries needed)
+        self.ifgzip = False                                                                         #gzip compress native writes
+        self.ifprecision = "s"                                                                      #native line protocol time precision (s, ms, us, ns)
+        self.ifoverflow = "dropoldest"
 
         #extension 
         self.extension = False
         self.extname = "grottext"
         #self.extvar = {"ip": "localhost", "port":8000}  
         self.extvar = {"none": "none"}  
+        self.extfields = []                                                                         #fields needed by the extension (empty = all fields)
+        self.extoverflow = "dropoldest"
+        self.exttimeout = 10                                                                        #max seconds for one extension call (0 = no limit)
+        self.extensions = []                                                                        #imported extensions (grottextension.Extension), see load_extensions
+        self.extbatch = 100                                                                         #max records per grottext_batch call
         
         print("Grott Growatt logging monitor : " + self.verrel)    
 
@@ -100,6 +136,9 @@ class Conf :
         #Process environmental variable to override config and environmental settings
         self.parserset() 
 
+        #start logging (verbose = debug, trace = trace level) 
+        grottlog.setup(verbose=self.verbose, trace=self.trace, rate=self.lograte, tracesample=self.tracesample)
+
         #Prepare invert settings
         self.SN = "".join(['{:02x}'.format(ord(x)) for x in self.inverterid])
         self.offset = 6 
@@ -108,6 +147,16 @@ class Conf :
         #prepare MQTT security
         if not self.mqttauth: self.pubauth = None
         else: self.pubauth = dict(username=self.mqttuser, password=self.mqttpsw)
+
+        #start persistent MQTT client (connects / reconnects in the background)
+        if not self.nomqtt:
+            try:
+                from grottmqtt import MqttPublisher
+                self.mqttclient = MqttPublisher(self.mqttip, self.mqttport, client_id=self.inverterid, auth=self.pubauth, queuesize=self.mqttqueue, 
+                                                spool=self.open_spool("mqtt"), spoolrate=self.spoolrate)
+            except Exception as e:
+                self.mqttclient = None
+                grottlog.logger.warning("\t - Grott persistent MQTT client not started, connect per message: %s", e)
         
         #define recordlayouts 
         self.set_reclayouts()
@@ -115,10 +164,17 @@ class Conf :
         #define record whitlist (if blocking / filtering enabled 
         self.set_recwl()
 
+        #start PVOutput batch uploader (statuses are sent by a background thread)
+        if self.pvoutput: 
+            from grottpvout import PvOutputUploader
+            self.pvuploader = PvOutputUploader(self.pvapikey, self.pvbatchurl, batchsize=self.pvbatchsize)
+
         #prepare influxDB
         if self.influx :  
             if self.ifip == "localhost" : self.ifip = '0.0.0.0'
-            if self.influx2 == False: 
+            if self.ifnative: 
+                self.influxnative()
+            elif self.influx2 == False: 
                 if self.verbose :  print("")
                 if self.verbose :  print("\t - " + "Grott InfluxDB V1 initiating started")
                 try:     
@@ -191,13 +247,110 @@ class Conf :
                     print(e)
                     self.influx = False                       # no influx processing any more till restart (and errors repared)
                     raise SystemExit("Grott Influxdb initialisation error") 
+
+            #resolve timezone once 
+            self.utcconv = UtcConverter(self.tmzone, self.verbose)
+
+            #start batched writer (points are written by a background thread)
+            from grottinflux import InfluxBatchWriter
+            if self.ifnative: 
+                write = self.ifline.write
+            elif self.influx2: 
+                write = lambda bucket, points: self.ifwrite_api.write(bucket, self.iforg, points)
+            else: 
+                write = lambda database, points: self.influxclient.write_points(points, database=database)
+            self.ifwriter = InfluxBatchWriter(write, batchsize=self.ifbatchsize, interval=self.ifflushinterval, 
+                                              spool=self.open_spool("influx"), spoolrate=self.spoolrate)
+
+        #import extensions and start output workers 
+        self.load_extensions()
+        self.start_dispatcher()
             
+    def open_spool(self, name): 
+        #disk spool for output name (see grottspool), None if no spooldir specified
+        if not self.spooldir: return None
+        from grottspool import Spool
+        return Spool(self.spooldir, name, maxsize=self.spoolsize*1024*1024)
+
+    def start_dispatcher(self): 
+        #every enabled output gets its own queue and worker thread (see grottsink), dispatch = False: outputs are processed in procdata
+        if not self.dispatch: return
+        from grottsink import Dispatcher, POLICIES
+        from grottdata import publish_mqtt, send_pvoutput, write_influx
+        self.dispatcher = Dispatcher()
+        outputs = [("mqtt", not self.nomqtt, publish_mqtt, self.mqttoverflow, None, 0, None), 
+                   ("pvoutput", self.pvoutput, send_pvoutput, self.pvoverflow, None, 0, None), 
+                   ("influx", self.influx, write_influx, self.ifoverflow, None, 0, None)]
+        #every extension has its own worker (with timeout), grottext_batch extensions get all waiting records at once
+        #the extension is stopped (grottext_stop) by its worker after the last queued record
+        for ext in self.extensions: 
+            if ext.batch is not None: 
+                func = lambda items, ext=ext: ext.run(self, items)
+            else: 
+                func = lambda record, jsonmsg, ext=ext: ext.run(self, [(record, jsonmsg)])
+            outputs.append(("extension " + ext.name, self.extension, func, self.extoverflow, self.exttimeout or None, self.extbatch if ext.batch is not None else 0, 
+                            lambda ext=ext: ext.stop(self)))
+        for name, enabled, func, policy, timeout, batch, onstop in outputs: 
+            if not enabled: continue
+            if policy not in POLICIES: 
+                print("\t - " + "Grott invalid overflow policy for", name, ":", policy, ", dropoldest used")
+                policy = "dropoldest"
+            self.dispatcher.add(name, func, self.sinkqueue, policy, timeout, batch, onstop=onstop)
+
+    def load_extensions(self): 
+        #import extensions (extname: comma separated list of extension modules) once at startup
+        self.extensions = []
+        if not self.extension: return
+        from grottextension import load_extensions
+        self.extensions = load_extensions(str2list(self.extname), self.verbose)
+        if not self.dispatch: 
+            #extensions run in procdata: stop them at exit (with dispatch the extension worker stops the extension)
+            import atexit
+            atexit.register(lambda: [ext.stop(self) for ext in self.extensions])
+
+    def influxnative(self): 
+        #initialise native line protocol writer (grottinflux), check / create database (v1) or check bucket (v2)
+        from grottinflux import InfluxLineWriter, LineEncoder, PRECISIONS
+        if self.verbose :  print("")
+        if self.verbose :  print("\t - " + "Grott InfluxDB native writer initiating started")
+        if self.ifprecision not in PRECISIONS: 
+            print("\t - " + "Grott InfluxDB precision invalid:", self.ifprecision, "s used")
+            self.ifprecision = "s"
+        if self.influx2: 
+            self.ifline = InfluxLineWriter(self.ifip, self.ifport, v2=True, org=self.iforg, token=self.iftoken, precision=self.ifprecision, compress=self.ifgzip)
+        else:
+            self.ifline = InfluxLineWriter(self.ifip, self.ifport, user=self.ifuser, password=self.ifpsw, precision=self.ifprecision, compress=self.ifgzip)
+        self.ifencoder = LineEncoder(self.ifprecision)
+        try: 
+            if self.influx2: 
+                if not self.ifline.bucket_exists(self.ifbucket): 
+                    print("\t - " + "influxDB bucket ", self.ifbucket, "not defined")  
+                    self.influx = False      
+                    raise SystemExit("Grott Influxdb initialisation error")
+            else: 
+                #create database if not yet defined (no error if it exists)
+                self.ifline.query('CREATE DATABASE "{}"'.format(self.ifdbname))
+        except OSError as e: 
+            if self.verbose :  print("\t - " + "Grott can not contact InfluxDB")   
+            print("\t -", e)
+            self.influx = False                       # no influx processing any more till restart (and errors repared)
+            raise SystemExit("Grott Influxdb initialisation error")
+
     def print(self): 
         print("\nGrott settings:\n")
         print("_Generic:")
         print("\tversion:             \t",self.verrel)
         print("\tverbose:             \t",self.verbose)
         print("\ttrace:               \t",self.trace)
+        print("\tlograte:             \t",self.lograte)
+        print("\ttracesample:         \t",self.tracesample)
+        print("\tdispatch:            \t",self.dispatch)
+        print("\tsinkqueue:           \t",self.sinkqueue)
+        print("\tdecodeworkers:       \t",self.decodeworkers)
+        print("\tdecodequeue:         \t",self.decodequeue)
+        print("\tspooldir:            \t",self.spooldir)
+        print("\tspoolsize:           \t",self.spoolsize)
+        print("\tspoolrate:           \t",self.spoolrate)
         print("\tconfig file:         \t",self.cfgfile)
         print("\tminrecl:             \t",self.minrecl)
         print("\tdecrypt:             \t",self.decrypt)
@@ -229,15 +382,22 @@ class Conf :
         print("\tmqtttauth:           \t",self.mqttauth)
         print("\tmqttuser:            \t",self.mqttuser)
         print("\tmqttpsw:             \t","**secret**")                       #scramble output if tested!
+        print("\tmqttfields:          \t",self.mqttfields)
+        print("\tmqttqueue:           \t",self.mqttqueue)
+        print("\tmqttoverflow:        \t",self.mqttoverflow)
         #print("\tmqttpsw:     \t",self.mqttpsw)                       #scramble output if tested!
         print("_Growatt server:")
         print("\tgrowattip:           \t",self.growattip)
         print("\tgrowattport:         \t",self.growattport)
+        print("\tconnecttimeout:      \t",self.connecttimeout)
+        print("\tdnsttl:              \t",self.dnsttl)
         print("_PVOutput:")
         print("\tpvoutput:            \t",self.pvoutput)
         print("\tpvdisv1:             \t",self.pvdisv1)
         print("\tpvtemp:              \t",self.pvtemp)   
-        print("\tpvurl:               \t",self.pvurl)
+        print("\tpvbatchurl:          \t",self.pvbatchurl)
+        print("\tpvbatchsize:         \t",self.pvbatchsize)
+        print("\tpvoverflow:          \t",self.pvoverflow)
         print("\tpvapikey:            \t",self.pvapikey)                
         print("\tpvinverters:         \t",self.pvinverters)
         if self.pvinverters == 1 :
@@ -257,12 +417,23 @@ class Conf :
         print("\torganization:       \t",self.iforg ) 
         print("\tbucket:             \t",self.ifbucket) 
         print("\ttoken:              \t","**secret**")
+        print("\tfields:             \t",self.iffields)
+        print("\tbatchsize:          \t",self.ifbatchsize)
+        print("\tflushinterval:      \t",self.ifflushinterval)
+        print("\tnative:             \t",self.ifnative)
+        print("\tgzip:               \t",self.ifgzip)
+        print("\tprecision:          \t",self.ifprecision)
+        print("\toverflow:           \t",self.ifoverflow)
         #print("\ttoken:       \t",self.iftoken)  
         
         print("_Extension:")
         print("\textension:          \t",self.extension) 
         print("\textname:            \t",self.extname)  
         print("\textvar:             \t",self.extvar) 
+        print("\toverflow:           \t",self.extoverflow)
+        print("\ttimeout:            \t",self.exttimeout)
+        print("\tbatch:              \t",self.extbatch)
+        print("\textfields:          \t",self.extfields) 
          
         print()
 
@@ -274,7 +445,7 @@ class Conf :
         parser.add_argument('--version', action='version', version=self.verrel)
         parser.add_argument('-c',help="set config file if not specified config file is grott.ini",metavar="[config file]")
         parser.add_argument('-o',help="set output file, if not specified output is stdout",metavar="[output file]")
-        parser.add_argument('-m',help="set mode (sniff or proxy), if not specified mode is sniff",metavar="[mode]")
+        parser.add_argument('-m',help="set mode (sniff, proxy or aproxy), if not specified mode is sniff",metavar="[mode]")
         parser.add_argument('-i',help="set inverterid, if not specified inverterid of .ini file is used",metavar="[inverterid]")
         parser.add_argument('-nm','--nomqtt',help="disable mqtt send",action='store_true')
         parser.add_argument('-t','--trace',help="enable trace, use in addition to verbose option (only available in sniff mode)",action='store_true')
@@ -297,8 +468,8 @@ class Conf :
                 
         if (args.m != None) : 
             #print("mode: ",args.m)
-            if (args.m == "proxy") : 
-                self.amode = "proxy"
+            if (args.m in ("proxy", "aproxy")) : 
+                self.amode = args.m
             else :
                 self.amode = "sniff"                                        # default
         if (args.i != None and args.i != "none") :                          # added none for docker support 
@@ -352,7 +523,14 @@ class Conf :
         # 
         self.influx = str2bool(self.influx)
         self.influx2 = str2bool(self.influx2)
+        self.ifnative = str2bool(self.ifnative)
+        self.ifgzip = str2bool(self.ifgzip)
+        self.dispatch = str2bool(self.dispatch)
         self.extension = str2bool(self.extension)
+        #
+        self.mqttfields = str2list(self.mqttfields)
+        self.iffields = str2list(self.iffields)
+        self.extfields = str2list(self.extfields)
                
     def procconf(self): 
         print("\nGrott process configuration file")
@@ -360,6 +538,15 @@ class Conf :
         config.read(self.cfgfile)
         if config.has_option("Generic","minrecl"): self.minrecl = config.getint("Generic","minrecl")
         if config.has_option("Generic","verbose"): self.verbose = config.getboolean("Generic","verbose")
+        if config.has_option("Generic","lograte"): self.lograte = config.getint("Generic","lograte")
+        if config.has_option("Generic","tracesample"): self.tracesample = config.getint("Generic","tracesample")
+        if config.has_option("Generic","dispatch"): self.dispatch = config.get("Generic","dispatch")
+        if config.has_option("Generic","sinkqueue"): self.sinkqueue = config.getint("Generic","sinkqueue")
+        if config.has_option("Generic","decodeworkers"): self.decodeworkers = config.getint("Generic","decodeworkers")
+        if config.has_option("Generic","decodequeue"): self.decodequeue = config.getint("Generic","decodequeue")
+        if config.has_option("Generic","spooldir"): self.spooldir = config.get("Generic","spooldir")
+        if config.has_option("Generic","spoolsize"): self.spoolsize = config.getint("Generic","spoolsize")
+        if config.has_option("Generic","spoolrate"): self.spoolrate = config.getint("Generic","spoolrate")
         if config.has_option("Generic","decrypt"): self.decrypt = config.getboolean("Generic","decrypt")
         if config.has_option("Generic","compat"): self.compat = config.getboolean("Generic","compat")
         if config.has_option("Generic","includeall"): self.includeall = config.getboolean("Generic","includeall")
@@ -377,6 +564,8 @@ class Conf :
         if config.has_option("Generic","valueoffset"): self.valueoffset = config.get("Generic","valueoffset")
         if config.has_option("Growatt","ip"): self.growattip = config.get("Growatt","ip") 
         if config.has_option("Growatt","port"): self.growattport = config.getint("Growatt","port")
+        if config.has_option("Growatt","connecttimeout"): self.connecttimeout = config.getfloat("Growatt","connecttimeout")
+        if config.has_option("Growatt","dnsttl"): self.dnsttl = config.getint("Growatt","dnsttl")
         if config.has_option("MQTT","nomqtt"): self.nomqtt = config.get("MQTT","nomqtt")
         if config.has_option("MQTT","ip"): self.mqttip = config.get("MQTT","ip")
         if config.has_option("MQTT","port"): self.mqttport = config.getint("MQTT","port")
@@ -388,12 +577,17 @@ class Conf :
         if config.has_option("MQTT","auth"): self.mqttauth = config.getboolean("MQTT","auth")
         if config.has_option("MQTT","user"): self.mqttuser = config.get("MQTT","user")
         if config.has_option("MQTT","password"): self.mqttpsw = config.get("MQTT","password")
+        if config.has_option("MQTT","fields"): self.mqttfields = config.get("MQTT","fields")
+        if config.has_option("MQTT","queue"): self.mqttqueue = config.getint("MQTT","queue")
+        if config.has_option("MQTT","overflow"): self.mqttoverflow = config.get("MQTT","overflow")
         if config.has_option("PVOutput","pvoutput"): self.pvoutput = config.get("PVOutput","pvoutput")
         if config.has_option("PVOutput","pvtemp"): self.pvtemp = config.get("PVOutput","pvtemp")
         if config.has_option("PVOutput","pvdisv1"): self.pvdisv1 = config.get("PVOutput","pvdisv1")
         if config.has_option("PVOutput","pvinverters"): self.pvinverters = config.getint("PVOutput","pvinverters")
         if config.has_option("PVOutput","apikey"): self.pvapikey = config.get("PVOutput","apikey")
         if config.has_option("PVOutput", "pvuplimit"): self.pvuplimit = config.getint("PVOutput", "pvuplimit")
+        if config.has_option("PVOutput", "batchsize"): self.pvbatchsize = config.getint("PVOutput", "batchsize")
+        if config.has_option("PVOutput", "overflow"): self.pvoverflow = config.get("PVOutput", "overflow")
         # if more inverter are installed at the same interface (shinelink) get systemids
         #if self.pvinverters > 1 : 
         for x in range(self.pvinverters+1) : 
@@ -412,10 +606,21 @@ class Conf :
         if config.has_option("influx","org"): self.iforg = config.get("influx","org")
         if config.has_option("influx","bucket"): self.ifbucket = config.get("influx","bucket")
         if config.has_option("influx","token"): self.iftoken = config.get("influx","token")
+        if config.has_option("influx","fields"): self.iffields = config.get("influx","fields")
+        if config.has_option("influx","batchsize"): self.ifbatchsize = config.getint("influx","batchsize")
+        if config.has_option("influx","flushinterval"): self.ifflushinterval = config.getint("influx","flushinterval")
+        if config.has_option("influx","native"): self.ifnative = config.get("influx","native")
+        if config.has_option("influx","gzip"): self.ifgzip = config.get("influx","gzip")
+        if config.has_option("influx","precision"): self.ifprecision = config.get("influx","precision")
+        if config.has_option("influx","overflow"): self.ifoverflow = config.get("influx","overflow")
         #extensionINFLUX
         if config.has_option("extension","extension"): self.extension = config.get("extension","extension") 
         if config.has_option("extension","extname"): self.extname = config.get("extension","extname") 
         if config.has_option("extension","extvar"): self.extvar = eval(config.get("extension","extvar"))
+        if config.has_option("extension","fields"): self.extfields = config.get("extension","fields")
+        if config.has_option("extension","overflow"): self.extoverflow = config.get("extension","overflow")
+        if config.has_option("extension","timeout"): self.exttimeout = config.getfloat("extension","timeout")
+        if config.has_option("extension","batch"): self.extbatch = config.getint("extension","batch")
 
     def getenv(self, envvar):
         envval = os.getenv(envvar)
@@ -425,8 +630,17 @@ class Conf :
 
     def procenv(self): 
         print("\nGrott process environmental variables")
-        if os.getenv('gmode') in ("sniff", "proxy") :  self.mode = self.getenv('gmode')
+        if os.getenv('gmode') in ("sniff", "proxy", "aproxy") :  self.mode = self.getenv('gmode')
         if os.getenv('gverbose') != None :  self.verbose = self.getenv('gverbose')
+        if os.getenv('glograte') != None :  self.lograte = int(self.getenv('glograte'))
+        if os.getenv('gtracesample') != None :  self.tracesample = int(self.getenv('gtracesample'))
+        if os.getenv('gdispatch') != None :  self.dispatch = self.getenv('gdispatch')
+        if os.getenv('gsinkqueue') != None :  self.sinkqueue = int(self.getenv('gsinkqueue'))
+        if os.getenv('gdecodeworkers') != None :  self.decodeworkers = int(self.getenv('gdecodeworkers'))
+        if os.getenv('gdecodequeue') != None :  self.decodequeue = int(self.getenv('gdecodequeue'))
+        if os.getenv('gspooldir') != None :  self.spooldir = self.getenv('gspooldir')
+        if os.getenv('gspoolsize') != None :  self.spoolsize = int(self.getenv('gspoolsize'))
+        if os.getenv('gspoolrate') != None :  self.spoolrate = int(self.getenv('gspoolrate'))
         if os.getenv('gminrecl') != None : 
             if 0 <= int(os.getenv('gminrecl')) <= 255  :     self.minrecl = self.getenv('gminrecl')
         if os.getenv('gdecrypt') != None : self.decrypt = self.getenv('gdecrypt')
@@ -460,6 +674,8 @@ class Conf :
             if 0 <= int(os.getenv('ggrowattport')) <= 65535  :  self.growattport = int(self.getenv('ggrowattport'))
             else : 
                if self.verbose : print("\nGrott Growatt server Port address env invalid")   
+        if os.getenv('gconnecttimeout') != None :  self.connecttimeout = float(self.getenv('gconnecttimeout'))
+        if os.getenv('gdnsttl') != None :  self.dnsttl = int(self.getenv('gdnsttl'))
         #handle mqtt environmentals    
         if os.getenv('gnomqtt') != None :  self.nomqtt = self.getenv('gnomqtt')
         if os.getenv('gmqttip') != None :    
@@ -481,6 +697,9 @@ class Conf :
         if os.getenv('gmqttauth') != None :  self.mqttauth = self.getenv('gmqttauth')
         if os.getenv('gmqttuser') != None :  self.mqttuser = self.getenv('gmqttuser')
         if os.getenv('gmqttpassword') != None : self.mqttpsw = self.getenv('gmqttpassword')
+        if os.getenv('gmqttfields') != None : self.mqttfields = self.getenv('gmqttfields')
+        if os.getenv('gmqttqueue') != None : self.mqttqueue = int(self.getenv('gmqttqueue'))
+        if os.getenv('gmqttoverflow') != None : self.mqttoverflow = self.getenv('gmqttoverflow')
         #Handle PVOutput variables
         if os.getenv('gpvoutput') != None :  self.pvoutput = self.getenv('gpvoutput')
         if os.getenv('gpvtemp') != None :  self.pvtemp = self.getenv('gpvtemp')
@@ -493,6 +712,8 @@ class Conf :
         if self.pvinverters == 1 : 
             if os.getenv('gpvsystemid') != None :  self.pvsystemid[1] = self.getenv('gpvsystemid')
         if os.getenv('pvuplimit') != None :  self.pvuplimit = int(self.getenv('pvuplimit'))
+        if os.getenv('gpvbatchsize') != None :  self.pvbatchsize = int(self.getenv('gpvbatchsize'))
+        if os.getenv('gpvoverflow') != None :  self.pvoverflow = self.getenv('gpvoverflow')
         #Handle Influx
         if os.getenv('ginflux') != None :  self.influx = self.getenv('ginflux')
         if os.getenv('ginflux2') != None :  self.influx2 = self.getenv('ginflux2')
@@ -512,10 +733,21 @@ class Conf :
         if os.getenv('giforg') != None :  self.iforg = self.getenv('giforg')
         if os.getenv('gifbucket') != None :  self.ifbucket = self.getenv('gifbucket')
         if os.getenv('giftoken') != None :  self.iftoken = self.getenv('giftoken')
+        if os.getenv('giffields') != None :  self.iffields = self.getenv('giffields')
+        if os.getenv('gifbatchsize') != None :  self.ifbatchsize = int(self.getenv('gifbatchsize'))
+        if os.getenv('gifflushinterval') != None :  self.ifflushinterval = int(self.getenv('gifflushinterval'))
+        if os.getenv('gifnative') != None :  self.ifnative = self.getenv('gifnative')
+        if os.getenv('gifgzip') != None :  self.ifgzip = self.getenv('gifgzip')
+        if os.getenv('gifprecision') != None :  self.ifprecision = self.getenv('gifprecision')
+        if os.getenv('gifoverflow') != None :  self.ifoverflow = self.getenv('gifoverflow')
         #Handle Extension
         if os.getenv('gextension') != None :  self.extension = self.getenv('gextension')
         if os.getenv('gextname') != None :  self.extname = self.getenv('gextname')
         if os.getenv('gextvar') != None :  self.extvar = eval(self.getenv('gextvar'))
+        if os.getenv('gextfields') != None :  self.extfields = self.getenv('gextfields')
+        if os.getenv('gextoverflow') != None :  self.extoverflow = self.getenv('gextoverflow')
+        if os.getenv('gexttimeout') != None :  self.exttimeout = float(self.getenv('gexttimeout'))
+        if os.getenv('gextbatch') != None :  self.extbatch = int(self.getenv('gextbatch'))
         
     def set_recwl(self):    
         #define record that will not be blocked or inspected if blockcmd is specified
@@ -1602,5 +1834,26 @@ class Conf :
         if self.verbose: print("\nGrott layout records loaded")
         for key in self.recorddict :
             if self.verbose : print(key, " : ")
-            if self.verbose : print(self.recorddict[key])  
+            if self.verbose : print(self.recorddict[key])
+
+        self.compile_layouts()
+
+    def subscribed_fields(self): 
+        #fields needed by the enabled outputs, None if all fields are needed (includeall or an output without field list)
+        if self.includeall: return None
+        fields = set()
+        outputs = [(not self.nomqtt, self.mqttfields), (self.influx, self.iffields), (self.extension, self.extfields)]
+        for enabled, outfields in outputs: 
+            if not enabled: continue
+            if not outfields: return None
+            fields.update(outfields)
+        if self.pvoutput: fields.update(PVOUTPUTFIELDS)
+        return fields
+
+    def compile_layouts(self):
+        #compile record layouts to decoders (call again if recorddict or output field lists are changed)
+        self.decoders = compile_layouts(self.recorddict, self.includeall, self.subscribed_fields())
+        #clear layout resolution cache (see grottdata.procdata)
+        self.layoutcache = {}
+        if self.verbose: print("\nGrott layout records compiled : ", len(self.decoders))  
 
@@ -10,14 +10,17 @@ import time
 import sys
 import struct
 import textwrap
-from itertools import cycle # to support "cycling" the iterator
 import json, codecs
+from json.encoder import encode_basestring_ascii
 from typing import Dict
 # requests
 
 #import mqtt                       
 import paho.mqtt.publish as publish
 
+import grottcodec
+from grottlog import logger, TRACE, LazyDump
+
 
 class GrottPvOutLimit:
 
@@ -32,7 +35,7 @@ class GrottPvOutLimit:
             if ok:
                 self.register[pvserial] = int(now)
             else:
-                if conf.verbose: print(f'\t - PVOut: Update refused for {pvserial} due to time limitation')
+                if conf.verbose: logger.debug("\t - PVOut: Update refused for %s due to time limitation", pvserial)
         else:
             self.register.update({pvserial: int(now)})
             ok = True
@@ -51,26 +54,9 @@ def format_multi_line(prefix, string, size=80):
             size -= 1
     return '\n'.join([prefix + line for line in textwrap.wrap(string, size)])
 
-#decrypt data. 
+#decrypt data (returns hex string, kept for compatibility, use grottcodec.decrypt for bytes)
 def decrypt(decdata) :   
-
-    ndecdata = len(decdata)
-
-    # Create mask and convert to hexadecimal
-    mask = "Growatt"
-    hex_mask = ['{:02x}'.format(ord(x)) for x in mask]    
-    nmask = len(hex_mask)
-
-    #start decrypt routine 
-    unscrambled = list(decdata[0:8])                                            #take unscramble header
-    
-    for i,j in zip(range(0,ndecdata-8),cycle(range(0,nmask))): 
-        unscrambled = unscrambled + [decdata[i+8] ^ int(hex_mask[j],16)]
-    
-    result_string = "".join("{:02x}".format(n) for n in unscrambled)
-    
-    print("\t - " + "Growatt data decrypted V2")   
-    return result_string        
+    return grottcodec.decrypt(decdata).hex()
 
 def str2bool(defstr):
     if defstr in ("True", "true", "TRUE", "y", "Y", "yes", "YES", 1, "1") : defret = True 
@@ -79,76 +65,274 @@ def str2bool(defstr):
         return(defret)
     else : return()
 
-def procdata(conf,data):    
+def str2list(defstr):
+    # comma separated string (ini / environment) to list, a list is returned unchanged 
+    if isinstance(defstr, (list, tuple, set)) : return list(defstr)
+    return [item.strip() for item in str(defstr).split(",") if item.strip()]
+
+def _jsonvalue(value):
+    # JSON representation of one value (same as json.dumps)
+    if type(value) is int:
+        return int.__repr__(value)
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+class JsonSerializer:
+    # precompiled JSON message for a fixed field set / order:
+    # {"device": .., "time": .., "buffered": .., "values": {"field1": .., "field2": ..}}
+    # key fragments are created once, only the values are filled in per record.
+    # intfields: fields that are always int (formatted with %d), other fields are converted with _jsonvalue
+
+    def __init__(self, fields, intfields=()):
+        self.fields = fields
+        keys = ", ".join(encode_basestring_ascii(name).replace("%", "%%") + (": %d" if name in intfields else ": %s") for name in fields)
+        self._template = '{"device": %s, "time": %s, "buffered": %s, "values": {' + keys + '}}'
+        self._other = tuple(idx for idx, name in enumerate(fields) if name not in intfields)
+
+    def dumps(self, device, time, buffered, values):
+        # values in fields order
+        if self._other:
+            values = list(values)
+            for idx in self._other:
+                values[idx] = _jsonvalue(values[idx])
+        return self._template % (_jsonvalue(device), _jsonvalue(time), _jsonvalue(buffered), *values)
+
+class UtcConverter:
+    # convert record time (local time, %Y-%m-%dT%H:%M:%S) to UTC time (same format) for InfluxDB
+    # the timezone is resolved once, the UTC offset is cached per hour (timezone "local" uses the fixed system offset)
+
+    def __init__(self, tmzone, verbose=False):
+        try:  
+            import pytz
+        except: 
+            pytz = None
+        self.pytz = pytz
+        self.local = None
+        if pytz is not None: 
+            try: 
+                self.local = pytz.timezone(tmzone) 
+            except : 
+                if verbose :  
+                    if tmzone ==  "local":  logger.debug("\t - Timezone local specified default timezone used")
+                    else : logger.debug("\t - Grott unknown timezone :  %s , default timezone used", tmzone)
+        self.tmzone = tmzone if self.local is not None else "local"
+        #local time hour (%Y-%m-%dT%H) : offset to UTC 
+        self.offsets = {}
+
+    def offset(self, naive): 
+        # offset to add to local time (naive datetime) to get UTC time 
+        if self.local is None: 
+            return timedelta(seconds=time.timezone)
+        #raises an exception for non existing or ambiguous (dst change) times, like localize
+        return -self.local.localize(naive, is_dst=None).utcoffset()
+
+    def hour_offset(self, naive): 
+        # offset valid for the whole hour of naive, None if the offset changes (or is not defined) in this hour 
+        start = naive.replace(minute=0, second=0)
+        try: 
+            offset = self.offset(start)
+            if offset == self.offset(start + timedelta(minutes=59, seconds=59)) : return offset
+        except Exception: 
+            pass
+        return None
+
+    def utc(self, jsondate):
+        naive = datetime(int(jsondate[0:4]), int(jsondate[5:7]), int(jsondate[8:10]), int(jsondate[11:13]), int(jsondate[14:16]), int(jsondate[17:19]))
+        hour = jsondate[:13]
+        try: 
+            offset = self.offsets[hour]
+        except KeyError: 
+            offset = self.hour_offset(naive)
+            if len(self.offsets) > 1024 : self.offsets.clear()
+            self.offsets[hour] = offset
+        #dst change in this hour: no cached offset
+        if offset is None : offset = self.offset(naive)
+        utc_dt = naive + offset
+        return "%04d-%02d-%02dT%02d:%02d:%02d" % (utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour, utc_dt.minute, utc_dt.second)
+
+# fields used by PVOutput processing (see send_pvoutput) 
+PVOUTPUTFIELDS = ("pvserial", "pvpowerout", "pvgridvoltage", "pvenergytoday", "pvtemperature", "pos_act_energy", "pos_rev_act_power", "voltage_l1")
+
+# field names of compat mode records 
+COMPATFIELDS = ("pvserial", "pvstatus", "pvpowerin", "pv1voltage", "pv1current", "pv1watt", "pv2voltage", "pv2current", "pv2watt", "pvpowerout", 
+                "pvfrequentie", "pvgridvoltage", "pvenergytoday", "pvenergytotal", "pvtemperature", "pvipmtemperature")
+COMPATINDEX = {name: idx for idx, name in enumerate(COMPATFIELDS)}
+COMPATSERIALIZER = JsonSerializer(COMPATFIELDS, COMPATFIELDS[1:])
+
+class DecodedRecord:
+    # Decoded data record (see decode_record), holds no reference to conf
+    # values is a list in fields order, fields, index (name : position) and serializer are owned by the layout (shared by all records)
+    # a dict or JSON object of the values is only created on request (asdict, scaled, jsonobj, tojson)
+    __slots__ = ("layout", "header", "plaindata", "buffered", "time", "timefromserver", "device", "fields", "values", "index", "serializer", "divide")
+
+    def __init__(self, layout, header, plaindata, buffered, time, timefromserver, device, fields, values, index, serializer, divide=None):
+        self.layout = layout                            # record layout used (None in compat mode)
+        self.header = header                            # record header (hex string)
+        self.plaindata = plaindata                      # decrypted record (bytes)
+        self.buffered = buffered                        # "yes", "no" or "nodetect" (compat mode)
+        self.time = time                                # record date/time (%Y-%m-%dT%H:%M:%S)
+        self.timefromserver = timefromserver            # True if time is grott server time
+        self.device = device                            # device id (pvserial, datalogserial or layout device)
+        self.fields = fields                            # field names (tuple)
+        self.values = values                            # decoded values (list)
+        self.index = index                              # field name : position in values
+        self.serializer = serializer                    # JsonSerializer for fields
+        self.divide = divide                            # layout divide factors (tuple in fields order, None = no divide)
+
+    def __getitem__(self, key):
+        return self.values[self.index[key]]
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def get(self, key, default=None):
+        try:
+            return self.values[self.index[key]]
+        except KeyError:
+            return default
+
+    def items(self):
+        return zip(self.fields, self.values)
+
+    def asdict(self):
+        return dict(zip(self.fields, self.values))
+
+    def scaled(self):
+        # values with the layout divide factor applied (text values are not changed)
+        if self.divide is None:
+            return self.asdict()
+        return {key: value / divide if divide != 1 and isinstance(value, (int, float)) else value 
+                for key, value, divide in zip(self.fields, self.values, self.divide)}
+
+    @property
+    def rectype(self):
+        return self.header[14:16]
+
+    @property
+    def hexdata(self):
+        return self.plaindata.hex()
+
+    def jsonobj(self):
+        # object used for the JSON (MQTT) message
+        return {
+                    "device" : self.device,
+                    "time" : self.time, 
+                    "buffered" : self.buffered,
+                    "values" : self.asdict()
+                }
+
+    def tojson(self):
+        # JSON (MQTT) message, same as json.dumps(self.jsonobj())
+        return self.serializer.dumps(self.device, self.time, self.buffered, self.values)
+
+def resolve_layout(conf, header, ndata): 
+    # determine record layout from header and record length, returns: layout, buffered, novalidrec
+    is_smart_meter = header[14:16] in ("20","1b")
+    novalidrec = False
+    layout = "T" + header[6:8] + header[12:14] + header[14:16]
+    #v270 add X for extended except for smart monitor records
+    if ((ndata > 375) and not is_smart_meter) :  layout = layout + "X"
+
+    #v270 no invtype added to layout for smart monitor records
+    if (conf.invtype != "default") and not is_smart_meter :
+            layout = layout + conf.invtype.upper()
+
+    if header[14:16] == "50" : buffered = "yes"
+    else: buffered = "no" 
+
+    if conf.verbose : logger.debug("\t - layout   :  %s", layout)
+    if layout not in conf.recorddict:
+        #try generic if generic record exist
+        if conf.verbose : logger.debug("\t - no matching record layout found, try generic")
+        if header[14:16] in ("04","50") :
+            layout = layout.replace(header[12:16], "NNNN")
+            if layout not in conf.recorddict:
+                #no valid record fall back on old processing? 
+                if conf.verbose : logger.debug("\t - no matching record layout found, standard processing performed")
+                layout = "none"
+                novalidrec = True  
+        else:         
+            novalidrec = True     
+    return layout, buffered, novalidrec
+
+def resolve_invtype(conf, layout, plaindata): 
+    # Handle systems with mixed invtype: add inverter type (from invtypemap) for inverter serial to layout
+    inverterType = "default"
+
+    inverterSerial = None
+    try:
+        inverterSerial = plaindata[38:48].decode('ASCII')
+        if conf.verbose:
+            logger.debug("\t - Possible Inverter serial %s", inverterSerial)
+    except UnicodeDecodeError:
+        # In case of problem (eg: new record type with different serial placement)
+        pass
+
+    if inverterSerial:
+        # Lookup inverter type based on inverter serial
+        try:
+            inverterType = conf.invtypemap[inverterSerial]
+            logger.debug("\t - Matched inverter serial to inverter type %s", inverterType)
+        except:
+            inverterType = "default"
+            logger.debug("\t - Inverter serial not recognised - using inverter type %s", inverterType)
+
+    if (inverterType != "default") :
+        layout = layout + inverterType.upper()
+    return layout
+
+def decode_record(conf, data):    
+    # decode a Growatt data record, returns a DecodedRecord or None if the record is not a (valid) data record
+    # conf is not changed (except the layout resolution cache), record information is returned in the DecodedRecord
     if conf.verbose: 
-        print("\t - " + "Growatt original Data:") 
-        print(format_multi_line("\t\t ", data))
+        logger.debug("\t - Growatt original Data:") 
+        logger.debug("%s", LazyDump(format_multi_line, "\t\t ", data))
 
-    header = "".join("{:02x}".format(n) for n in data[0:8])
+    header = data[0:8].hex()
     ndata = len(data)
     buffered = "nodetect"                                               # set buffer detection to nodetect (for compat mode), wil in auto detection changed to no or yes        
     is_smart_meter = header[14:16] in ("20","1b")
 
     # automatic detect protocol (decryption and protocol) only if compat = False!
     novalidrec = False
+    layout = None                                                       # no layout used in compat mode
     if conf.compat is False : 
         if conf.verbose : 
-            print("\t - " + "Grott automatic protocol detection")  
-            print("\t - " + "Grott data record length", ndata)
-        #print(header)
-        layout = "T" + header[6:8] + header[12:14] + header[14:16]
-        #v270 add X for extended except for smart monitor records
-        if ((ndata > 375) and not is_smart_meter) :  layout = layout + "X"
-
-        #v270 no invtype added to layout for smart monitor records
-        if (conf.invtype != "default") and not is_smart_meter :
-                layout = layout + conf.invtype.upper()
-
-        if header[14:16] == "50" : buffered = "yes"
-        else: buffered = "no" 
-
-        if conf.verbose : print("\t - " + "layout   : ", layout)
-        try:            
-            # does record layout record exists? 
-            test = conf.recorddict[layout]
-        except:
-            #try generic if generic record exist
-            if conf.verbose : print("\t - " + "no matching record layout found, try generic")
-            if header[14:16] in ("04","50") :
-                layout = layout.replace(header[12:16], "NNNN")
-                try:
-                    # does generic record layout record exists? 
-                    test = conf.recorddict[layout]
-                except:
-                    #no valid record fall back on old processing? 
-                    if conf.verbose : print("\t - " + "no matching record layout found, standard processing performed")
-                    layout = "none"
-                    novalidrec = True  
-            else:         
-                novalidrec = True     
+            logger.debug("\t - Grott automatic protocol detection")  
+            logger.debug("\t - Grott data record length %s", ndata)
+        #layout resolution is cached per header signature (cache is cleared when layouts are compiled)
+        layoutkey = (conf.invtype, data[3], data[6], data[7], ndata > 375)
+        try: 
+            layout, buffered, novalidrec = conf.layoutcache[layoutkey]
+            if conf.verbose : logger.debug("\t - layout   :  %s (cached)", layout)
+        except KeyError: 
+            layout, buffered, novalidrec = resolve_layout(conf, header, ndata)
+            if len(conf.layoutcache) > 1024 : conf.layoutcache.clear()
+            conf.layoutcache[layoutkey] = (layout, buffered, novalidrec)
     
-        conf.layout = layout
-        if conf.verbose : print("\t - " + "Record layout used : ", layout)
+        if conf.verbose : logger.debug("\t - Record layout used :  %s", layout)
     
     #Decrypt 
-    try: 
-        #see if decrypt keyword is defined
-        conf.decrypt =  str2bool(conf.recorddict[layout]["decrypt"]["value"])
-    except:   
-        #if decrypt not defined, default is decypt
-        conf.decrypt = True  
+    if layout in conf.decoders: 
+        #see if decrypt keyword is defined (precompiled in layout decoder)
+        decrypt = conf.decoders[layout].decrypt
+    else:   
+        #if decrypt not defined (or compat mode), default is decypt
+        decrypt = True  
     
-    if conf.decrypt: 
-        result_string = decrypt(data) 
-        if conf.verbose : print("\t - " + "Grott Growatt data decrypted")        
+    if decrypt: 
+        plaindata = grottcodec.decrypt(data) 
+        if conf.verbose : logger.debug("\t - Grott Growatt data decrypted")        
     else: 
         #do not decrypt 
-        result_string = data.hex()
-        if conf.verbose: print("\t - " + "Grott Growatt unencrypted data used")                                      
+        plaindata = bytes(data)
+        if conf.verbose: logger.debug("\t - Grott Growatt unencrypted data used")                                      
+    result_string = plaindata.hex()
                                                         
     if conf.verbose: 
-        print("\t - " + 'Growatt plain data:')
-        print(format_multi_line("\t\t ", result_string))
+        logger.debug("\t - Growatt plain data:")
+        logger.debug("%s", LazyDump(format_multi_line, "\t\t ", result_string))
         #debug only: print(result_string)
 
     # test position : 
@@ -156,14 +340,15 @@ def procdata(conf,data):
 
     # Test length if < 12 it is a data ack record, if novalidrec flag is true it is not a (recognized) data record  
     if ndata < 12 or novalidrec == True: 
-        if conf.verbose : print("\t - " + "Grott data ack record or data record not defined no processing done") 
-        return
+        if conf.verbose : logger.debug("\t - Grott data ack record or data record not defined no processing done") 
+        return None
 
     # Inital flag to detect off real data is processed     
     dataprocessed = False
+    device_defined = False
     
-    # define dictonary for key values. 
-    definedkey = {}
+    # define list for key values (in layout field order). 
+    values = []
 
 
     if conf.compat is False: 
@@ -172,163 +357,76 @@ def procdata(conf,data):
         if (conf.invtype == "default") :
             # Handle systems with mixed invtype
             if (ndata > 50) and not is_smart_meter:
-                # There is enough data for an inverter serial number
-                inverterType = "default"
-
-                inverterSerial = None
-                try:
-                    inverterSerial = codecs.decode(result_string[76:96], "hex").decode('ASCII')
-                    if conf.verbose:
-                        print("\t - Possible Inverter serial", inverterSerial)
-                except UnicodeDecodeError:
-                    # In case of problem (eg: new record type with different serial placement)
-                    pass
-
-                if inverterSerial:
-                    # Lookup inverter type based on inverter serial
-                    try:
-                        inverterType = conf.invtypemap[inverterSerial]
-                        print("\t - Matched inverter serial to inverter type", inverterType)
-                    except:
-                        inverterType = "default"
-                        print("\t - Inverter serial not recognised - using inverter type", inverterType)
-
-                if (inverterType != "default") :
-                    layout = layout + inverterType.upper()
-                    # Update the conf.layout like done earlier
-                    conf.layout = layout
+                # There is enough data for an inverter serial number, layout per serial is cached
+                serialkey = (layout, plaindata[38:48])
+                try: 
+                    invlayout = conf.layoutcache[serialkey]
+                except KeyError: 
+                    invlayout = resolve_invtype(conf, layout, plaindata)
+                    if len(conf.layoutcache) > 1024 : conf.layoutcache.clear()
+                    conf.layoutcache[serialkey] = invlayout
+                layout = invlayout
 
         if conf.verbose: 
-           print("\t - " + 'Growatt new layout processing')
-           print("\t\t - " + "decrypt       : ",conf.decrypt)
-           print("\t\t - " + "offset        : ", conf.offset)
-           print("\t\t - " + "record layout : ", layout)
-           print()
+           logger.debug("\t - Growatt new layout processing")
+           logger.debug("\t\t - decrypt       :  %s", decrypt)
+           logger.debug("\t\t - offset        :  %s", conf.offset)
+           logger.debug("\t\t - record layout :  %s", layout)
+           logger.debug("")
 
-        
-        
-        try:
-            #v270 try if logstart and log fields are defined, if yes prepare log fields 
-            logstart = conf.recorddict[layout]["logstart"]["value"] 
-            logdict = {}
-            logdict = bytes.fromhex(result_string[conf.recorddict[layout]["logstart"]["value"]:len(result_string)-4]).decode("ASCII").split(",")
-        except:
-            pass
 
-        #v270 log data record processing (SDM630 smart monitor with railog 
-        #if rectype == "data" : 
-        for keyword in  conf.recorddict[layout].keys() :
-            
-            if keyword not in ("decrypt","date","logstart","device") :  
-                #try if keyword should be included 
-                include=True
-                try:
-                    #try if key type is specified 
-                    if conf.recorddict[layout][keyword]["incl"] == "no" : 
-                        include=False
-                except: 
-                    #no include statement keyword should be process, set include to prevent except errors
-                    include = True
-                #process only keyword needs to be included (default):     
-                try: 
-                    if ((include) or (conf.includeall)): 
-                        try:
-                            #try if key type is specified  
-                            keytype = conf.recorddict[layout][keyword]["type"]           
-                        except: 
-                            #if not default is num
-                            keytype = "num"               
-                        if keytype == "text" :
-                            definedkey[keyword] = result_string[conf.recorddict[layout][keyword]["value"]:conf.recorddict[layout][keyword]["value"]+(conf.recorddict[layout][keyword]["length"]*2)]
-                            definedkey[keyword] = codecs.decode(definedkey[keyword], "hex").decode('utf-8')
-                            #print(definedkey[keyword])
-                        if keytype == "num" :
-                        #else:                    
-                            definedkey[keyword] = int(result_string[conf.recorddict[layout][keyword]["value"]:conf.recorddict[layout][keyword]["value"]+(conf.recorddict[layout][keyword]["length"]*2)],16)                                     
-                        if keytype == "numx" :
-                            #process signed integer 
-                            keybytes = bytes.fromhex(result_string[conf.recorddict[layout][keyword]["value"]:conf.recorddict[layout][keyword]["value"]+(conf.recorddict[layout][keyword]["length"]*2)])
-                            definedkey[keyword] = int.from_bytes(keybytes, byteorder='big', signed=True)
-                        if keytype == "log" :
-                            # Proces log fields
-                            definedkey[keyword] = logdict[conf.recorddict[layout][keyword]["pos"]-1]
-                        if keytype == "logpos" :
-                        #only display this field if positive    
-                            # Proces log fields
-                            if float(logdict[conf.recorddict[layout][keyword]["pos"]-1]) > 0 : 
-                                definedkey[keyword] = logdict[conf.recorddict[layout][keyword]["pos"]-1]
-                            else : definedkey[keyword] = 0
-                        if keytype == "logneg" :
-                        #only display this field if negative    
-                            # Proces log fields
-                            if float(logdict[conf.recorddict[layout][keyword]["pos"]-1]) < 0 : 
-                                definedkey[keyword] = logdict[conf.recorddict[layout][keyword]["pos"]-1]    
-                            else : definedkey[keyword] = 0
-                except: 
-                    if conf.verbose : print("\t - grottdata - error in keyword processing : ", keyword + " ,data processing stopped") 
-                    return(8) 
+        decoder = conf.decoders.get(layout)
+        if decoder is None: 
+            if conf.verbose : logger.debug("\t - grottdata - record layout not defined :  %s ,data processing stopped", layout) 
+            return None
+
+        #v270 log data record processing (SDM630 smart monitor with railog) is done by the layout decoder
+        try: 
+            values = decoder.decode(plaindata)
+        except Exception as e: 
+            if conf.verbose : logger.debug("\t - grottdata - error in keyword processing :  %s ,data processing stopped", str(e)) 
+            return None
+        fields = decoder.recordfields
+        index = decoder.index
+        serializer = decoder.serializer
+        divide = decoder.recorddivide
                                  
         # test if pvserial was defined, if not take inverterid from config.
         device_defined = False 
-        try:    
-            definedkey["device"] = conf.recorddict[layout]["device"]["value"]
+        if decoder.device is not None:    
+            extravalue = decoder.device
             device_defined = True
-        except:         
+        else:         
             # test if pvserial was defined, if not take inverterid from config.     
-            try: 
-                test = definedkey["pvserial"]
-            except: 
-                definedkey["pvserial"] = conf.inverterid
-                conf.recorddict[layout]["pvserial"] = {"value" : 0, "type" : "text"}
-                if conf.verbose : print("\t - pvserial not found and device not specified used configuration defined invertid:", definedkey["pvserial"] ) 
+            extravalue = conf.inverterid
+            if decoder.extrafield is not None and conf.verbose : logger.debug("\t - pvserial not found and device not specified used configuration defined invertid: %s", extravalue) 
+        if decoder.extrafield is not None: 
+            if len(fields) > len(values) : values.append(extravalue)
+            else : values[index[decoder.extrafield]] = extravalue
      
-        # test if dateoffset is defined, if not take set to 0 (no futher date retrieval processing) . 
-        try: 
-            # test of date is specified in layout
-            dateoffset = int(conf.recorddict[layout]["date"]["value"]) 
-        except:
-            # no date specified, default no date specified
-            dateoffset = 0        
+        # dateoffset is 0 if no date is specified in the layout (no futher date retrieval processing) . 
+        dateoffset = decoder.dateoffset
 
         #proces date value if specifed 
         if dateoffset > 0 and (conf.gtime != "server" or buffered == "yes"):
-            if conf.verbose: print("\t - " + 'Grott data record date/time processing started')
-            #date
-            pvyearI =  int(result_string[dateoffset:dateoffset+2],16)
-            if pvyearI < 10 : pvyear = "200" + str(pvyearI)
-            else: pvyear = "20" + str(pvyearI) 
-            pvmonthI = int(result_string[dateoffset+2:dateoffset+4],16)
-            if pvmonthI < 10 : pvmonth = "0" + str(pvmonthI)
-            else: pvmonth = str(pvmonthI) 
-            pvdayI = int(result_string[dateoffset+4:dateoffset+6],16)
-            if pvdayI < 10 : pvday = "0" + str(pvdayI)
-            else: pvday = str(pvdayI) 
-            #Time
-            pvhourI = int(result_string[dateoffset+6:dateoffset+8],16)
-            if pvhourI < 10 : pvhour = "0" + str(pvhourI)
-            else: pvhour = str(pvhourI) 
-            pvminuteI = int(result_string[dateoffset+8:dateoffset+10],16)
-            if pvminuteI < 10 : pvminute = "0" + str(pvminuteI)
-            else: pvminute = str(pvminuteI) 
-            pvsecondI = int(result_string[dateoffset+10:dateoffset+12],16)
-            if pvsecondI < 10 : pvsecond = "0" + str(pvsecondI)
-            else: pvsecond = str(pvsecondI) 
-            # create date/time is format
-            pvdate = pvyear + "-" + pvmonth + "-" + pvday + "T" + pvhour + ":" + pvminute + ":" + pvsecond
-            # test if valid date/time in data record
+            if conf.verbose: logger.debug("\t - Grott data record date/time processing started")
+            # test if valid date/time in data record (6 bytes: year (20yy), month, day, hour, minute, second)
             try:
-                testdate = datetime.strptime(pvdate, "%Y-%m-%dT%H:%M:%S")
-                jsondate = pvdate
-                if conf.verbose : print("\t - date-time: ", jsondate) 
+                if dateoffset % 2 == 0 : pvdate = plaindata[dateoffset//2:dateoffset//2+6]
+                else : pvdate = bytes.fromhex(result_string[dateoffset:dateoffset+12])
+                if len(pvdate) != 6 or pvdate[0] > 99 : raise ValueError("no valid date")
+                datetime(2000 + pvdate[0], pvdate[1], pvdate[2], pvdate[3], pvdate[4], pvdate[5])
+                jsondate = "20%02d-%02d-%02dT%02d:%02d:%02d" % tuple(pvdate)
+                if conf.verbose : logger.debug("\t - date-time:  %s", jsondate) 
                 timefromserver = False                                              # Indicate of date/time is from server (used for buffered data)           
             except ValueError:
                 # Date could not be parsed - either the format is different or it's not a
                 # valid date
-                if conf.verbose : print("\t - " + "no or no valid time/date found, grott server time will be used (buffer records not sent!)")  
+                if conf.verbose : logger.debug("\t - no or no valid time/date found, grott server time will be used (buffer records not sent!)")  
                 timefromserver = True          
                 jsondate = datetime.now().replace(microsecond=0).isoformat()
         else:
-            if conf.verbose: print("\t - " + "Grott server date/time used") 
+            if conf.verbose: logger.debug("\t - Grott server date/time used") 
             jsondate = datetime.now().replace(microsecond=0).isoformat()   
             timefromserver = True     
 
@@ -345,283 +443,277 @@ def procdata(conf,data):
             jsondate = datetime.now().replace(microsecond=0).isoformat()
             timefromserver = True 
 
-            if conf.verbose: print("\t - " + 'Growatt processing values for: ', bytearray.fromhex(conf.SN).decode())
+            if conf.verbose: logger.debug("\t - Growatt processing values for:  %s", bytearray.fromhex(conf.SN).decode())
             
             #Retrieve values 
             snstart = result_string.find(conf.SN)  
-            definedkey["pvserial"] = result_string[snstart:snstart+20]
-            definedkey["pvstatus"] = int(result_string[snstart+conf.offset*2+15*2:snstart+conf.offset*2+15*2+4],16)
+            pvserial = result_string[snstart:snstart+20]
+            pvstatus = int(result_string[snstart+conf.offset*2+15*2:snstart+conf.offset*2+15*2+4],16)
             #Only process value if pvstatus is oke (this is because unexpected pvstatus of 257)
-            if definedkey["pvstatus"] == 0 or definedkey["pvstatus"] == 1:
-                definedkey["pvpowerin"] = int(result_string[snstart+conf.offset*2+17*2:snstart+conf.offset*2+17*2+8],16)
-                definedkey["pv1voltage"] = int(result_string[snstart+conf.offset*2+21*2:snstart+conf.offset*2+21*2+4],16)
-                definedkey["pv1current"] = int(result_string[snstart+conf.offset*2+23*2:snstart+conf.offset*2+23*2+4],16)
-                definedkey["pv1watt"]    = int(result_string[snstart+conf.offset*2+25*2:snstart+conf.offset*2+25*2+8],16)
-                definedkey["pv2voltage"] = int(result_string[snstart+conf.offset*2+29*2:snstart+conf.offset*2+29*2+4],16)
-                definedkey["pv2current"] = int(result_string[snstart+conf.offset*2+31*2:snstart+conf.offset*2+31*2+4],16)
-                definedkey["pv2watt"]    = int(result_string[snstart+conf.offset*2+33*2:snstart+conf.offset*2+33*2+8],16)
-                definedkey["pvpowerout"] = int(result_string[snstart+conf.offset*2+37*2:snstart+conf.offset*2+37*2+8],16)
-                definedkey["pvfrequentie"] = int(result_string[snstart+conf.offset*2+41*2:snstart+conf.offset*2+41*2+4],16)
-                definedkey["pvgridvoltage"] = int(result_string[snstart+conf.offset*2+43*2:snstart+conf.offset*2+43*2+4],16)
-                definedkey["pvenergytoday"] = int(result_string[snstart+conf.offset*2+67*2:snstart+conf.offset*2+67*2+8],16)
-                definedkey["pvenergytotal"] = int(result_string[snstart+conf.offset*2+71*2:snstart+conf.offset*2+71*2+8],16)
-                definedkey["pvtemperature"] = int(result_string[snstart+conf.offset*2+79*2:snstart+conf.offset*2+79*2+4],16)
-                definedkey["pvipmtemperature"] = int(result_string[snstart+conf.offset*2+97*2:snstart+conf.offset*2+97*2+4],16)
+            if pvstatus == 0 or pvstatus == 1:
+                pvpowerin = int(result_string[snstart+conf.offset*2+17*2:snstart+conf.offset*2+17*2+8],16)
+                pv1voltage = int(result_string[snstart+conf.offset*2+21*2:snstart+conf.offset*2+21*2+4],16)
+                pv1current = int(result_string[snstart+conf.offset*2+23*2:snstart+conf.offset*2+23*2+4],16)
+                pv1watt    = int(result_string[snstart+conf.offset*2+25*2:snstart+conf.offset*2+25*2+8],16)
+                pv2voltage = int(result_string[snstart+conf.offset*2+29*2:snstart+conf.offset*2+29*2+4],16)
+                pv2current = int(result_string[snstart+conf.offset*2+31*2:snstart+conf.offset*2+31*2+4],16)
+                pv2watt    = int(result_string[snstart+conf.offset*2+33*2:snstart+conf.offset*2+33*2+8],16)
+                pvpowerout = int(result_string[snstart+conf.offset*2+37*2:snstart+conf.offset*2+37*2+8],16)
+                pvfrequentie = int(result_string[snstart+conf.offset*2+41*2:snstart+conf.offset*2+41*2+4],16)
+                pvgridvoltage = int(result_string[snstart+conf.offset*2+43*2:snstart+conf.offset*2+43*2+4],16)
+                pvenergytoday = int(result_string[snstart+conf.offset*2+67*2:snstart+conf.offset*2+67*2+8],16)
+                pvenergytotal = int(result_string[snstart+conf.offset*2+71*2:snstart+conf.offset*2+71*2+8],16)
+                pvtemperature = int(result_string[snstart+conf.offset*2+79*2:snstart+conf.offset*2+79*2+4],16)
+                pvipmtemperature = int(result_string[snstart+conf.offset*2+97*2:snstart+conf.offset*2+97*2+4],16)
+                values = [pvserial, pvstatus, pvpowerin, pv1voltage, pv1current, pv1watt, pv2voltage, pv2current, pv2watt, pvpowerout, 
+                          pvfrequentie, pvgridvoltage, pvenergytoday, pvenergytotal, pvtemperature, pvipmtemperature]
+                fields = COMPATFIELDS
+                index = COMPATINDEX
+                serializer = COMPATSERIALIZER
+                divide = None
                 dataprocessed = True
                 
             else:
-                if conf.verbose: print("\t - " + 'No valid monitor data, PV status: :', definedkey["pvstatus"])                            
+                if conf.verbose: logger.debug("\t - No valid monitor data, PV status: : %s", pvstatus)                            
             
         else:   
-            if conf.verbose: print("\t - "+ 'No Growatt data processed or SN not found:')
+            if conf.verbose: logger.debug("\t - No Growatt data processed or SN not found:")
             if conf.trace: 
-                print("\t - "+ 'Growatt unprocessed Data:')
-                print(format_multi_line("\t\t - ", result_string))  
-        
-    if dataprocessed: 
-        # only sendout data to MQTT if it is processed. 
+                logger.log(TRACE, "\t - Growatt unprocessed Data:")
+                logger.log(TRACE, "%s", LazyDump(format_multi_line, "\t\t - ", result_string))  
         
-        # Print values 
-        if conf.verbose: 
-            if conf.compat :
-                #print in compatibility mode
-                definedkey["pvserial"] = codecs.decode(definedkey["pvserial"], "hex").decode('utf-8') 
-                print("\t - " + "Grott values retrieved:")
-                print("\t\t - " + "pvserial:         ", definedkey["pvserial"])
-                print("\t\t - " + "pvstatus:         ", definedkey["pvstatus"]) 
-                print("\t\t - " + "pvpowerin:        ", definedkey["pvpowerin"]/10)
-                print("\t\t - " + "pvpowerout:       ", definedkey["pvpowerout"]/10)
-                print("\t\t - " + "pvenergytoday:    ", definedkey["pvenergytoday"]/10)
-                print("\t\t - " + "pvenergytotal:    ", definedkey["pvenergytotal"]/10)
-                print("\t\t - " + "pv1watt:          ", definedkey["pv1watt"]/10)
-                print("\t\t - " + "pv2watt:          ", definedkey["pv2watt"]/10)
-                print("\t\t - " + "pvfrequentie:     ", definedkey["pvfrequentie"]/100)
-                print("\t\t - " + "pvgridvoltage:    ", definedkey["pvgridvoltage"]/10)
-                print("\t\t - " + "pv1voltage:       ", definedkey["pv1voltage"]/10)
-                print("\t\t - " + "pv1current:       ", definedkey["pv1current"]/10)
-                print("\t\t - " + "pv2voltage:       ", definedkey["pv2voltage"]/10)
-                print("\t\t - " + "pv2current:       ", definedkey["pv2current"]/10)
-                print("\t\t - " + "pvtemperature:    ", definedkey["pvtemperature"]/10)
-                print("\t\t - " + "pvipmtemperature: ", definedkey["pvipmtemperature"]/10)      
-            else: 
-                #dynamic print 
-                print("\t - " + "Grott values retrieved:")
-                for key in definedkey : 
-                    # test if there is an divide factor is specifed 
-                    try:  
-                        #print(keyword)
-                        keydivide =  conf.recorddict[layout][key]["divide"]
-                        #print(keydivide)
-                    except:
-                        #print("error")
-                        keydivide = 1  
-        
-                    if type(definedkey[key]) != type(str()) and keydivide != 1 :
-                        printkey = "{:.1f}".format(definedkey[key]/keydivide)          
-                    else :
-                        printkey = definedkey[key]
-                    print("\t\t - ",key.ljust(20) + " : ",printkey)              
+    if not dataprocessed: 
+        return None
 
-        #create JSON message  (first create obj dict and then convert to a JSON message)                   
+    # device id is set when the record is complete
+    record = DecodedRecord(layout, header, plaindata, buffered, jsondate, timefromserver, None, fields, values, index, serializer, divide)
 
-        
-       
-        # filter invalid 0120 record (0 < voltage_l1 > 500 ) 
-        if header[14:16] == "20" :
-            if (definedkey["voltage_l1"]/10 > 500) or (definedkey["voltage_l1"]/10 < 0) :
-                print("\t - " + "Grott invalid 0120 record processing stopped") 
-                return 
+    # Print values 
+    if conf.verbose: 
+        if conf.compat :
+            #print in compatibility mode
+            values[index["pvserial"]] = codecs.decode(record["pvserial"], "hex").decode('utf-8') 
+            logger.debug("\t - Grott values retrieved:")
+            logger.debug("\t\t - pvserial:          %s", record["pvserial"])
+            logger.debug("\t\t - pvstatus:          %s", record["pvstatus"]) 
+            logger.debug("\t\t - pvpowerin:         %s", record["pvpowerin"]/10)
+            logger.debug("\t\t - pvpowerout:        %s", record["pvpowerout"]/10)
+            logger.debug("\t\t - pvenergytoday:     %s", record["pvenergytoday"]/10)
+            logger.debug("\t\t - pvenergytotal:     %s", record["pvenergytotal"]/10)
+            logger.debug("\t\t - pv1watt:           %s", record["pv1watt"]/10)
+            logger.debug("\t\t - pv2watt:           %s", record["pv2watt"]/10)
+            logger.debug("\t\t - pvfrequentie:      %s", record["pvfrequentie"]/100)
+            logger.debug("\t\t - pvgridvoltage:     %s", record["pvgridvoltage"]/10)
+            logger.debug("\t\t - pv1voltage:        %s", record["pv1voltage"]/10)
+            logger.debug("\t\t - pv1current:        %s", record["pv1current"]/10)
+            logger.debug("\t\t - pv2voltage:        %s", record["pv2voltage"]/10)
+            logger.debug("\t\t - pv2current:        %s", record["pv2current"]/10)
+            logger.debug("\t\t - pvtemperature:     %s", record["pvtemperature"]/10)
+            logger.debug("\t\t - pvipmtemperature:  %s", record["pvipmtemperature"]/10)      
+        else: 
+            #dynamic print 
+            logger.debug("\t - Grott values retrieved:")
+            for key, value in record.items() : 
+                # test if there is an divide factor is specifed 
+                keydivide = decoder.divides.get(key, 1)
+    
+                if type(value) != type(str()) and keydivide != 1 :
+                    printkey = "{:.1f}".format(value/keydivide)          
+                else :
+                    printkey = value
+                logger.debug("\t\t -  %s :  %s", key.ljust(20), printkey)              
+
+    #create JSON message  (first create obj dict and then convert to a JSON message)                   
+
+    
+   
+    # filter invalid 0120 record (0 < voltage_l1 > 500 ) 
+    if header[14:16] == "20" :
+        if (record["voltage_l1"]/10 > 500) or (record["voltage_l1"]/10 < 0) :
+            logger.warning("\t - Grott invalid 0120 record processing stopped") 
+            return None
+
+    #v270
+    #compatibility with prev releases for "20" smart monitor record!
+    #if device is not specified in layout record datalogserial is used as device (to distinguish record from inverter record)
+
+    if device_defined == True:         
+        deviceid = record["device"]
+
+    else : 
+        if header[14:16] not in ("20","1b") :
+            deviceid = record["pvserial"]           
+        else : 
+            deviceid = record["datalogserial"]
+
+    record.device = deviceid
+    return record
+
+def procdata(conf,data):    
+    # decode data record and send it to the enabled outputs (MQTT, PVOutput, InfluxDB and extension)
+    record = decode_record(conf, data)
+    if record is None: 
+        return
 
-        #v270
-        #compatibility with prev releases for "20" smart monitor record!
-        #if device is not specified in layout record datalogserial is used as device (to distinguish record from inverter record)
+    #create JSON message  (first create obj dict and then convert to a JSON message)                   
+    jsonmsg = record.tojson() 
+    
+    if conf.verbose:
+        logger.debug("\t - MQTT jsonmsg: ")        
+        logger.debug("%s", LazyDump(format_multi_line, "\t\t\t ", jsonmsg))   
+
+    #do not process invalid records (e.g. buffered records with time from server) or buffered records if sendbuf = False
+    if (record.buffered == "yes") : 
+        if (conf.sendbuf == False) or (record.timefromserver == True) :
+            if conf.verbose: logger.debug("\t - Buffered record not sent: sendbuf = False or invalid date/time format")  
+            return
 
-        if device_defined == True:         
-            deviceid = definedkey["device"]
+    if conf.dispatcher is not None: 
+        #outputs are processed by their own worker (grottsink), only enabled outputs have a worker
+        conf.dispatcher.put("mqtt", conf, record, jsonmsg)
+        conf.dispatcher.put("pvoutput", conf, record)
+        conf.dispatcher.put("influx", conf, record)
+        for ext in conf.extensions: 
+            conf.dispatcher.put("extension " + ext.name, record, jsonmsg)
+        return
 
+    publish_mqtt(conf, record, jsonmsg)
+    send_pvoutput(conf, record)
+    write_influx(conf, record)
+    run_extension(conf, record, jsonmsg)
+
+def publish_mqtt(conf, record, jsonmsg): 
+    # send record (json message) to MQTT broker
+    if conf.nomqtt != True:
+        #if meter data use mqtttopicname topic
+        if (record.rectype in ("20","1b")) and (conf.mqttmtopic == True) :
+            mqtttopic = conf.mqttmtopicname 
         else : 
-            if header[14:16] not in ("20","1b") :
-                deviceid = definedkey["pvserial"]           
-            else : 
-                deviceid = definedkey["datalogserial"]
-            
-        jsonobj = {
-                        "device" : deviceid,
-                        "time" : jsondate, 
-                        "buffered" : buffered,
-                        "values" : {}
-                    }
-
-        for key in definedkey : 
-
-            #if key != "pvserial" : 
-                #if conf.recorddict[layout][key]["type"] == "num" : 
-                # only add int values to the json object 
-                #print(definedkey[key])
-                #print(type(definedkey[key]))                                 
-                #if type(definedkey[key]) == type(1) :                                                                     
-                #    jsonobj["values"][key] = definedkey[key]
-            jsonobj["values"][key] = definedkey[key]
-                     
-        jsonmsg = json.dumps(jsonobj) 
+            #test if invertid needs to be added to topic
+            if conf.mqttinverterintopic : 
+                mqtttopic = conf.mqtttopic + "/" + record.device    
+            else: mqtttopic = conf.mqtttopic    
+        logger.debug("\t - Grott MQTT topic used : %s", mqtttopic)   
         
-        if conf.verbose:
-            print("\t - " + "MQTT jsonmsg: ")        
-            print(format_multi_line("\t\t\t ", jsonmsg))   
-
-        #do not process invalid records (e.g. buffered records with time from server) or buffered records if sendbuf = False
-        if (buffered == "yes") : 
-            if (conf.sendbuf == False) or (timefromserver == True) :
-                if conf.verbose: print("\t - " + 'Buffered record not sent: sendbuf = False or invalid date/time format')  
-                return
-
-        if conf.nomqtt != True:
-            #if meter data use mqtttopicname topic
-            if (header[14:16] in ("20","1b")) and (conf.mqttmtopic == True) :
-                mqtttopic = conf.mqttmtopicname 
-            else : 
-                #test if invertid needs to be added to topic
-                if conf.mqttinverterintopic : 
-                    mqtttopic = conf.mqtttopic + "/" + deviceid    
-                else: mqtttopic = conf.mqtttopic    
-            print("\t - " + 'Grott MQTT topic used : ' + mqtttopic)   
-            
-            if conf.mqttretain:
-               if conf.verbose: print("\t - " + 'Grott MQTT message retain enabled')  
+        if conf.mqttretain:
+           if conf.verbose: logger.debug("\t - Grott MQTT message retain enabled")  
 
-            try:
-                #v2.7.1 add retrain variable  
-                publish.single(mqtttopic, payload=jsonmsg, qos=0, retain=conf.mqttretain, hostname=conf.mqttip,port=conf.mqttport, client_id=conf.inverterid, keepalive=60, auth=conf.pubauth)
-                if conf.verbose: print("\t - " + 'MQTT message message sent') 
-            except TimeoutError:     
-                if conf.verbose: print("\t - " + 'MQTT connection time out error') 
-            except ConnectionRefusedError:     
-                if conf.verbose: print("\t - " + 'MQTT connection refused by target')     
-            except BaseException as error:     
-                if conf.verbose: print("\t - "+ 'MQTT send failed:', str(error)) 
-        else:
-            if conf.verbose: print("\t - " + 'No MQTT message sent, MQTT disabled') 
+        if conf.mqttclient is not None:
+            #persistent client: message is queued and sent by the client thread
+            conf.mqttclient.publish(mqtttopic, jsonmsg, retain=conf.mqttretain)
+            logger.debug("\t - Grott MQTT message queued, queue depth: %s", conf.mqttclient.queue.qsize())
+            return
+
+        try:
+            #v2.7.1 add retrain variable  
+            publish.single(mqtttopic, payload=jsonmsg, qos=0, retain=conf.mqttretain, hostname=conf.mqttip,port=conf.mqttport, client_id=conf.inverterid, keepalive=60, auth=conf.pubauth)
+            if conf.verbose: logger.debug("\t - MQTT message message sent") 
+        except TimeoutError:     
+            if conf.verbose: logger.debug("\t - MQTT connection time out error") 
+        except ConnectionRefusedError:     
+            if conf.verbose: logger.debug("\t - MQTT connection refused by target")     
+        except BaseException as error:     
+            if conf.verbose: logger.debug("\t - MQTT send failed: %s", str(error)) 
+    else:
+        if conf.verbose: logger.debug("\t - No MQTT message sent, MQTT disabled")
 
-        # process pvoutput if enabled
-        if conf.pvoutput :      
-            import requests
+def send_pvoutput(conf, record): 
+    # process pvoutput if enabled
+    definedkey = record
+    jsondate = record.time
+    if conf.pvoutput :      
  
-            pvidfound = False    
-            if  conf.pvinverters == 1 :  
-                pvssid = conf.pvsystemid[1]
-                pvidfound = True    
-            else:  
-                for pvnum, pvid in conf.pvinverterid.items():  
-                    if pvid == definedkey["pvserial"] :
-                       print(pvid)
-                       pvssid = conf.pvsystemid[pvnum]
-                       pvidfound = True    
+        pvidfound = False    
+        if  conf.pvinverters == 1 :  
+            pvssid = conf.pvsystemid[1]
+            pvidfound = True    
+        else:  
+            for pvnum, pvid in conf.pvinverterid.items():  
+                if pvid == definedkey["pvserial"] :
+                   logger.debug("%s", pvid)
+                   pvssid = conf.pvsystemid[pvnum]
+                   pvidfound = True    
  
-            if not pvidfound:
-                if conf.verbose : print("\t - " + "pvsystemid not found for inverter : ", definedkey["pvserial"])   
-                return
-            if not pvout_limit.ok_send(definedkey["pvserial"], conf):
-                # Will print a line for the refusal in verbose mode (see GrottPvOutLimit at the top)
-                return
-            if conf.verbose : print("\t - " + "Grott send data to PVOutput systemid: ", pvssid, "for inverter: ", definedkey["pvserial"]) 
-            pvheader = { 
-                "X-Pvoutput-Apikey"     : conf.pvapikey,
-                "X-Pvoutput-SystemId"   : pvssid
-            }
+        if not pvidfound:
+            if conf.verbose : logger.debug("\t - pvsystemid not found for inverter :  %s", definedkey["pvserial"])   
+            return
+        if not pvout_limit.ok_send(definedkey["pvserial"], conf):
+            # Will print a line for the refusal in verbose mode (see GrottPvOutLimit at the top)
+            return
+        if conf.verbose : logger.debug("\t - Grott send data to PVOutput systemid:  %s for inverter:  %s", pvssid, definedkey["pvserial"]) 
+        pvodate = jsondate[:4] +jsondate[5:7] + jsondate[8:10]
+        # debug: pvodate = jsondate[:4] +jsondate[5:7] + "16" 
+        pvotime = jsondate[11:16] 
+        # debug: pvotime = "09:05" 
+        # if record is a smart monitor record sent smart monitor data to PVOutput
+        if record.rectype != "20" :
+            pvdata = { 
+                "d"     : pvodate,
+                "t"     : pvotime,
+            #2.7.1    "v1"    : definedkey["pvenergytoday"]*100,
+                "v2"    : definedkey["pvpowerout"]/10,
+                "v6"    : definedkey["pvgridvoltage"]/10
+                }
+            if not conf.pvdisv1 :
+                pvdata["v1"] = definedkey["pvenergytoday"]*100
+            else:   
+                if conf.verbose :  logger.debug("\t - Grott PVOutput send V1 disabled") 
+
+            if conf.pvtemp :
+                pvdata["v5"] = definedkey["pvtemperature"]/10
             
-            pvodate = jsondate[:4] +jsondate[5:7] + jsondate[8:10]
-            # debug: pvodate = jsondate[:4] +jsondate[5:7] + "16" 
-            pvotime = jsondate[11:16] 
-            # debug: pvotime = "09:05" 
-            # if record is a smart monitor record sent smart monitor data to PVOutput
-            if header[14:16] != "20" :
-                pvdata = { 
-                    "d"     : pvodate,
-                    "t"     : pvotime,
-                #2.7.1    "v1"    : definedkey["pvenergytoday"]*100,
-                    "v2"    : definedkey["pvpowerout"]/10,
-                    "v6"    : definedkey["pvgridvoltage"]/10
-                    }
-                if not conf.pvdisv1 :
-                    pvdata["v1"] = definedkey["pvenergytoday"]*100
-                else:   
-                    if conf.verbose :  print("\t - " + "Grott PVOutput send V1 disabled") 
-    
-                if conf.pvtemp :
-                    pvdata["v5"] = definedkey["pvtemperature"]/10
-                
-                #print(pvdata)
-                if conf.verbose : print("\t\t - ", pvheader)
-                if conf.verbose : print("\t\t - ", pvdata)
-                reqret = requests.post(conf.pvurl, data = pvdata, headers = pvheader)
-                if conf.verbose :  print("\t - " + "Grott PVOutput response: ") 
-                if conf.verbose : print("\t\t - ", reqret.text)
-            else: 
-                # send smat monitor data c1 = 3 indiates v3 is lifetime energy (day wil be calculated), n=1 indicates is net data (import /export)
-                # value seprated because it is not allowed to sent combination at once
-                pvdata1 = { 
-                    "d"     : pvodate,
-                    "t"     : pvotime,
-                    "v3"    : definedkey["pos_act_energy"]*100,
-                    "c1"    : 3, 
-                    "v6"    : definedkey["voltage_l1"]/10
-                    }          
-                    
-                pvdata2 = { 
-                   "d"     : pvodate,
-                   "t"     : pvotime,
-                   "v4"    : definedkey["pos_rev_act_power"]/10,
-                   "v6"    : definedkey["voltage_l1"]/10,
-                   "n"     : 1
-                   }                       
-                    #"v4"    : definedkey["pos_act_power"]/10,
-                #print(pvheader)
-                if conf.verbose : print("\t\t - ", pvheader)
-                if conf.verbose : print("\t\t - ", pvdata1)
-                if conf.verbose : print("\t\t - ", pvdata2)
-                reqret = requests.post(conf.pvurl, data = pvdata1, headers = pvheader)
-                if conf.verbose :  print("\t - " + "Grott PVOutput response SM1: ") 
-                if conf.verbose : print("\t\t - ", reqret.text)
-                reqret = requests.post(conf.pvurl, data = pvdata2, headers = pvheader)
-                if conf.verbose :  print("\t - " + "Grott PVOutput response SM2: ") 
-                if conf.verbose : print("\t\t - ", reqret.text)
+            #print(pvdata)
+            if conf.verbose : logger.debug("\t\t -  %s", pvdata)
+            #status is sent by the batch uploader (grottpvout)
+            conf.pvuploader.add(pvssid, pvdata)
         else: 
-            if conf.verbose : print("\t - " + "Grott Send data to PVOutput disabled ") 
+            # send smat monitor data c1 = 3 indiates v3 is lifetime energy (day wil be calculated), n=1 indicates is net data (import /export)
+            # value seprated because it is not allowed to sent combination at once
+            pvdata1 = { 
+                "d"     : pvodate,
+                "t"     : pvotime,
+                "v3"    : definedkey["pos_act_energy"]*100,
+                "c1"    : 3, 
+                "v6"    : definedkey["voltage_l1"]/10
+                }          
+                
+            pvdata2 = { 
+               "d"     : pvodate,
+               "t"     : pvotime,
+               "v4"    : definedkey["pos_rev_act_power"]/10,
+               "v6"    : definedkey["voltage_l1"]/10,
+               "n"     : 1
+               }                       
+                #"v4"    : definedkey["pos_act_power"]/10,
+            if conf.verbose : logger.debug("\t\t -  %s", pvdata1)
+            if conf.verbose : logger.debug("\t\t -  %s", pvdata2)
+            conf.pvuploader.add(pvssid, pvdata1)
+            conf.pvuploader.add(pvssid, pvdata2)
+    else: 
+        if conf.verbose : logger.debug("\t - Grott Send data to PVOutput disabled ")
 
+def write_influx(conf, record): 
     # influxDB processing 
+    definedkey = record
+    jsondate = record.time
     if conf.influx:      
-        if conf.verbose :  print("\t - " + "Grott InfluxDB publihing started")
-        try:  
-            import  pytz             
-        except: 
-            if conf.verbose :  print("\t - " + "Grott PYTZ Library not installed in Python, influx processing disabled")    
-            conf.inlyx = False
+        if conf.verbose :  logger.debug("\t - Grott InfluxDB publihing started")
+        #timezone is resolved once (normally at startup in grottconf)
+        if conf.utcconv is None : conf.utcconv = UtcConverter(conf.tmzone, conf.verbose)
+        if conf.utcconv.pytz is None: 
+            if conf.verbose :  logger.debug("\t - Grott PYTZ Library not installed in Python, influx processing disabled")    
             return
-        try: 
-            local = pytz.timezone(conf.tmzone) 
-        except : 
-            if conf.verbose :  
-                if conf.tmzone ==  "local":  print("\t - " + "Timezone local specified default timezone used")
-                else : print("\t - " + "Grott unknown timezone : ",conf.tmzone,", default timezone used")
-            conf.tmzone = "local"
-            local = int(time.timezone/3600)
-            #print(local)
-
-        if conf.tmzone == "local": 
-           curtz = time.timezone 
-           utc_dt = datetime.strptime (jsondate, "%Y-%m-%dT%H:%M:%S") + timedelta(seconds=curtz) 
-        else :      
-            naive = datetime.strptime (jsondate, "%Y-%m-%dT%H:%M:%S")
-            local_dt = local.localize(naive, is_dst=None)
-            utc_dt = local_dt.astimezone(pytz.utc)
-        
-        ifdt = utc_dt.strftime ("%Y-%m-%dT%H:%M:%S")
-        if conf.verbose :  print("\t - " + "Grott original time : ",jsondate,"adjusted UTC time for influx : ",ifdt)
-    
-        # prepare influx jsonmsg dictionary    
 
+        ifdt = conf.utcconv.utc(jsondate)
+        if conf.verbose :  logger.debug("\t - Grott original time :  %s adjusted UTC time for influx :  %s", jsondate, ifdt)
+    
         # if record is a smart monitor record use datalogserial as measurement (to distinguish from solar record) 
-        if header[14:16] != "20" :
+        if conf.ifnative: 
+            # native writer: line protocol (same series as written by the influxdb client libraries) 
+            measurement = definedkey["pvserial"] if record.rectype != "20" else definedkey["datalogserial"]
+            ifobj = conf.ifencoder.encode(measurement, record.fields, record.values, ifdt)
+            if conf.verbose: logger.debug("\t - Grott influxdb line: %s", ifobj)
+        elif record.rectype != "20" :
             ifobj = {
                         "measurement" : definedkey["pvserial"],
                         "time" : ifdt,
@@ -634,61 +726,44 @@ def procdata(conf,data):
                                "fields" : {}
                     }    
 
-        for key in definedkey : 
-            if key != "date" : 
-                ifobj["fields"][key] = definedkey[key]
+        if not conf.ifnative: 
+            # prepare influx jsonmsg dictionary    
+            for key, value in record.items() : 
+                if key != "date" : 
+                    ifobj["fields"][key] = value
         
         #Create list for influx
         ifjson = [ifobj]
 
-        print("\t - " + "Grott influxdb jsonmsg: ")        
-        print(format_multi_line("\t\t\t ", str(ifjson)))   
+        if conf.verbose and not conf.ifnative: 
+            logger.debug("\t - Grott influxdb jsonmsg: ")        
+            logger.debug("%s", LazyDump(format_multi_line, "\t\t\t ", str(ifjson)))   
         #if conf.verbose :  print("\t - " + "Grott InfluxDB publihing started")
   
-        try: 
-            if (conf.influx2):
-                if conf.verbose :  print("\t - " + "Grott write to influxdb v2") 
-                ifresult = conf.ifwrite_api.write(conf.ifbucket,conf.iforg,ifjson)   
-                #print(ifresult)
-            else: 
-                if conf.verbose :  print("\t - " + "Grott write to influxdb v1") 
-                ifresult = conf.influxclient.write_points(ifjson)
-        #except : 
-        except Exception as e:
-            # if  conf.verbose: 
-                print("\t - " + "Grott InfluxDB error ")
-                print(e) 
-                raise SystemExit("Grott Influxdb write error, grott will be stopped") 
+        #point is written by the batch writer (write errors are retried, points are dropped if they can not be written)
+        if (conf.influx2):
+            conf.ifwriter.add(conf.ifbucket, ifobj)
+        else: 
+            conf.ifwriter.add(conf.ifdbname, ifobj)
+        logger.debug("\t - Grott InfluxDB point queued, points pending: %s", conf.ifwriter.pending)
             
     else: 
-            if conf.verbose : print("\t - " + "Grott Send data to Influx disabled ")      
+            if conf.verbose : logger.debug("\t - Grott Send data to Influx disabled ")
 
+def run_extension(conf, record, jsonmsg): 
+    # run grott extensions (conf.extensions, imported at startup, see grottextension) one after the other
     if conf.extension : 
-        
-        if conf.verbose :  print("\t - " + "Grott extension processing started : ", conf.extname)
-        import importlib
-        try: 
-            module = importlib.import_module(conf.extname, package=None)
-        except :
-            if conf.verbose : print("\t - " + "Grott import extension failed:", conf.extname)      
-            return
-
-        try:
-            ext_result = module.grottext(conf,result_string,jsonmsg) 
-            if conf.verbose :  
-                print("\t - " + "Grott extension processing ended : ", ext_result)
-        except Exception as e:
-            print("\t - " + "Grott extension processing error:", repr(e))
-            if conf.verbose:
-                import traceback
-                print("\t - " + traceback.format_exc())
-            #print("\t - " + "Grott extension processing error ")
-            #print(e) 
-            #return
-
-        #if conf.verbose :  
-            #print("\t - " + "Grott extension processing ended : ", ext_result)
-            ##print("\t -", ext_result)
+        for ext in conf.extensions: 
+            if conf.verbose :  logger.debug("\t - Grott extension processing started :  %s", ext.name)
+            try:
+                ext_result = ext.run(conf, [(record, jsonmsg)]) 
+                if conf.verbose :  
+                    logger.debug("\t - Grott extension processing ended :  %s", ext_result)
+            except Exception as e:
+                logger.error("\t - Grott extension processing error: %s", repr(e))
+                if conf.verbose:
+                    import traceback
+                    logger.debug("\t - %s", traceback.format_exc())
     else: 
-            if conf.verbose : print("\t - " + "Grott extension processing disabled ")      
+            if conf.verbose : logger.debug("\t - Grott extension processing disabled ")      
 
@@ -0,0 +1,284 @@
+# grottdecoder.py precompiled record layout decoders
+# A layout (conf.recorddict entry) is compiled once into a LayoutDecoder with a precomputed
+# offset/width/signedness/divide table, records are decoded with struct.unpack_from over the plain bytes.
+# Many records of one layout (replay, buffered data, backfill) can be decoded at once with decode_batch (needs numpy).
+# Every layout gets a precompiled JSON (MQTT) message serializer (grottdata.JsonSerializer).
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import struct
+
+from grottdata import str2bool, JsonSerializer
+from grottcodec import MASK, HEADER_LENGTH
+
+#numpy is optional, only needed for batch decoding
+try:
+    import numpy
+except:
+    numpy = None
+
+# layout keywords that are no data fields
+SKIPKEYS = ("decrypt", "date", "logstart", "device")
+
+# fields that are always decoded (record routing, device id and record filtering)
+ROUTINGFIELDS = ("pvserial", "datalogserial", "voltage_l1")
+
+# struct formats for the standard field widths (big endian)
+_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+# field kinds
+_NUM, _HEXNUM, _TEXT, _HEXTEXT, _LOG, _LOGPOS, _LOGNEG, _BAD = range(8)
+
+class LayoutDecodeError(Exception):
+    # raised when a record can not be decoded with the layout, the message is the keyword that failed
+    pass
+
+class LayoutDecoder:
+
+    def __init__(self, name, layout, includeall=False, subscribed=None):
+        # subscribed: field names needed by the outputs (ROUTINGFIELDS are added), None = all fields
+        self.name = name
+        self.layout = layout
+        if subscribed is not None:
+            subscribed = set(subscribed).union(ROUTINGFIELDS)
+
+        #decrypt default is True
+        try:
+            self.decrypt = str2bool(layout["decrypt"]["value"])
+        except:
+            self.decrypt = True
+        #date offset (0 = no date in record)
+        try:
+            self.dateoffset = int(layout["date"]["value"])
+        except:
+            self.dateoffset = 0
+        #fixed device name (e.g. SDM630), None if not specified
+        try:
+            self.device = layout["device"]["value"]
+        except:
+            self.device = None
+        #start of log fields (smart meter with raillog)
+        try:
+            self.logstart = layout["logstart"]["value"]
+        except:
+            self.logstart = None
+
+        names = []
+        divides = []
+        fields = []
+        for keyword, spec in layout.items():
+            if keyword in SKIPKEYS or not isinstance(spec, dict):
+                continue
+            if subscribed is not None and keyword not in subscribed:
+                continue
+            if spec.get("incl") == "no" and not includeall and subscribed is None:
+                #incl = no fields are only decoded if specified in an output field list
+                continue
+            keytype = spec.get("type", "num")
+            if keytype not in ("num", "numx", "text", "log", "logpos", "logneg"):
+                #other types (e.g. def) are not part of the record values
+                continue
+            idx = len(names)
+            names.append(keyword)
+            divides.append(spec.get("divide", 1))
+            fields.append(self._compile_field(idx, keyword, keytype, spec))
+
+        self.fields = tuple(names)
+        self.divide = tuple(divides)
+        self.divides = dict(zip(names, divides))
+        #field names of a decoded record (shared by all records of the layout): fields + device (if specified) or pvserial (if not in layout)
+        if self.device is not None:
+            self.extrafield = "device"
+        elif "pvserial" not in self.fields:
+            self.extrafield = "pvserial"
+        else:
+            self.extrafield = None
+        if self.extrafield is not None and self.extrafield not in self.fields:
+            self.recordfields = self.fields + (self.extrafield,)
+            self.recorddivide = self.divide + (1,)
+        else:
+            self.recordfields = self.fields
+            self.recorddivide = self.divide
+        self.index = {name: idx for idx, name in enumerate(self.recordfields)}
+        #numeric fields are always int (the device field can be replaced by the layout device name)
+        intfields = [field[5] for field in fields if field[1] in (_NUM, _HEXNUM) and field[5] != self.extrafield]
+        self.serializer = JsonSerializer(self.recordfields, intfields)
+        self.haslog = any(field[1] in (_LOG, _LOGPOS, _LOGNEG) for field in fields)
+        self._slow = tuple(fields)
+
+        # create one struct for all (non overlapping) standard width numeric fields
+        fmt = ">"
+        end = 0
+        fastidx = []
+        rest = []
+        for field in sorted(fields, key=lambda f: f[2] if f[1] == _NUM else -1):
+            idx, kind, start, length, signed = field[:5]
+            if kind == _NUM and length in _FORMATS and start >= end:
+                code = _FORMATS[length]
+                fmt += ("{}x".format(start - end) if start > end else "") + (code.lower() if signed else code)
+                end = start + length
+                fastidx.append(idx)
+            else:
+                rest.append(field)
+        rest.sort(key=lambda f: f[0])
+        self._struct = struct.Struct(fmt) if fastidx else None
+        self._fastidx = tuple(fastidx)
+        self._rest = tuple(rest)
+        #minimal plain record length needed for the fast path
+        self.size = end
+
+    def _compile_field(self, idx, keyword, keytype, spec):
+        # return field tuple: (idx, kind, start, length, signed, keyword), start / length in bytes (in nibbles for _HEX kinds)
+        if keytype in ("log", "logpos", "logneg"):
+            if not isinstance(spec.get("pos"), int):
+                return (idx, _BAD, 0, 0, False, keyword)
+            kind = {"log": _LOG, "logpos": _LOGPOS, "logneg": _LOGNEG}[keytype]
+            return (idx, kind, spec["pos"] - 1, 0, False, keyword)
+        value = spec.get("value")
+        length = spec.get("length")
+        if not isinstance(value, int) or not isinstance(length, int):
+            return (idx, _BAD, 0, 0, False, keyword)
+        if value % 2:
+            #offset not on a byte boundary, use hex string processing
+            kind = _HEXTEXT if keytype == "text" else _HEXNUM
+            return (idx, kind, value, length * 2, keytype == "numx", keyword)
+        kind = _TEXT if keytype == "text" else _NUM
+        return (idx, kind, value // 2, length, keytype == "numx", keyword)
+
+    def _logfields(self, hexdata):
+        # split raillog fields (ascii, comma separated, crc excluded)
+        if self.logstart is None:
+            return None
+        try:
+            return bytes.fromhex(hexdata[self.logstart:len(hexdata)-4]).decode("ASCII").split(",")
+        except:
+            return None
+
+    def decode(self, data):
+        # decode plain (decrypted) record bytes, returns list of values in self.fields order
+        values = [None] * len(self.fields)
+        if self._struct is not None and len(data) >= self.size:
+            for idx, value in zip(self._fastidx, self._struct.unpack_from(data)):
+                values[idx] = value
+            fields = self._rest
+        else:
+            #record shorter than layout: decode field by field (fields partly in the record are truncated)
+            fields = self._slow
+
+        if not fields:
+            return values
+
+        hexdata = None
+        if self.haslog or any(field[1] in (_HEXNUM, _HEXTEXT) for field in fields):
+            hexdata = bytes(data).hex()
+        logfields = self._logfields(hexdata) if self.haslog else None
+
+        keyword = None
+        try:
+            for idx, kind, start, length, signed, keyword in fields:
+                if kind == _NUM:
+                    chunk = data[start:start+length]
+                    if not chunk and not signed: raise LayoutDecodeError(keyword)
+                    values[idx] = int.from_bytes(chunk, "big", signed=signed)
+                elif kind == _TEXT:
+                    values[idx] = bytes(data[start:start+length]).decode("utf-8")
+                elif kind == _HEXNUM:
+                    chunk = bytes.fromhex(hexdata[start:start+length]) if signed else hexdata[start:start+length]
+                    values[idx] = int.from_bytes(chunk, "big", signed=True) if signed else int(chunk, 16)
+                elif kind == _HEXTEXT:
+                    values[idx] = bytes.fromhex(hexdata[start:start+length]).decode("utf-8")
+                elif kind == _LOG:
+                    values[idx] = logfields[start]
+                elif kind == _LOGPOS:
+                    #only display this field if positive
+                    values[idx] = logfields[start] if float(logfields[start]) > 0 else 0
+                elif kind == _LOGNEG:
+                    #only display this field if negative
+                    values[idx] = logfields[start] if float(logfields[start]) < 0 else 0
+                else:
+                    raise LayoutDecodeError(keyword)
+        except LayoutDecodeError:
+            raise
+        except Exception as e:
+            raise LayoutDecodeError(keyword) from e
+        return values
+
+    def decode_batch(self, frames, divide=True):
+        # decode a list of raw (scrambled as received) records of this layout in one go (numpy vectorized)
+        # returns columns: dict keyword : numpy array (one row per record), numeric columns are divided if divide = True.
+        # numeric fields not (completely) in a record are 0, other fields that can not be decoded are None for that record.
+        if numpy is None:
+            raise ImportError("numpy is needed for batch decoding")
+        nrec = len(frames)
+        lengths = numpy.fromiter((len(frame) for frame in frames), dtype=numpy.int64, count=nrec)
+        width = int(lengths.max()) if nrec else 0
+        width = max(width, self.size)
+        #copy records in one zero padded matrix (row = record)
+        matrix = numpy.zeros((nrec, width), dtype=numpy.uint8)
+        for row, frame in enumerate(frames):
+            matrix[row, :len(frame)] = numpy.frombuffer(bytes(frame), dtype=numpy.uint8)
+        if self.decrypt and width > HEADER_LENGTH:
+            nbody = width - HEADER_LENGTH
+            mask = numpy.frombuffer(MASK * (nbody // len(MASK) + 1), dtype=numpy.uint8)[:nbody]
+            matrix[:, HEADER_LENGTH:] ^= mask
+
+        columns = {}
+        numeric = [field for field in self._slow if field[1] == _NUM and 0 < field[3] <= 8]
+        #gather all numeric fields with the same width at once: (records, fields, bytes)
+        for length in sorted(set(field[3] for field in numeric)):
+            group = [field for field in numeric if field[3] == length]
+            starts = numpy.array([field[2] for field in group], dtype=numpy.int64)
+            chunks = matrix[:, starts[:, None] + numpy.arange(length)].astype(numpy.uint64)
+            values = numpy.zeros(chunks.shape[:2], dtype=numpy.uint64)
+            for byte in range(length):
+                values = (values << numpy.uint64(8)) | chunks[:, :, byte]
+            complete = lengths[:, None] >= starts + length
+            for col, field in enumerate(group):
+                idx, kind, start, length, signed, keyword = field
+                column = values[:, col]
+                if signed:
+                    column = column.view(numpy.int64)
+                    if length < 8:
+                        column = column - ((column >> (8 * length - 1)) << (8 * length))
+                elif length < 8:
+                    column = column.astype(numpy.int64)
+                column = numpy.where(complete[:, col], column, 0)
+                if divide and self.divide[idx] != 1:
+                    column = column / self.divide[idx]
+                columns[keyword] = column
+
+        #text fields (serials) per record
+        def text(row, start, length):
+            try:
+                return matrix[row, start:start+length].tobytes()[:max(0, lengths[row]-start)].decode("utf-8")
+            except UnicodeDecodeError:
+                return None
+        for idx, kind, start, length, signed, keyword in self._slow:
+            if kind == _TEXT:
+                columns[keyword] = numpy.array([text(row, start, length) for row in range(nrec)])
+
+        #other fields (hex offset, log fields): record by record
+        other = [field for field in self._slow if field[5] not in columns]
+        if other:
+            rows = []
+            nodata = [None] * len(self.fields)
+            for row in range(nrec):
+                try:
+                    rows.append(self.decode(matrix[row, :lengths[row]].tobytes()))
+                except LayoutDecodeError:
+                    rows.append(nodata)
+            for idx, kind, start, length, signed, keyword in other:
+                column = numpy.array([values[idx] for values in rows])
+                if divide and self.divide[idx] != 1 and kind == _HEXNUM and column.dtype != object:
+                    column = column / self.divide[idx]
+                columns[keyword] = column
+
+        return {keyword: columns[keyword] for keyword in self.fields}
+
+def compile_layouts(recorddict, includeall=False, subscribed=None):
+    # compile all layouts from recorddict, returns dict layout name : LayoutDecoder
+    # subscribed: only decode these fields (plus ROUTINGFIELDS), None = all fields
+    decoders = {}
+    for name, layout in recorddict.items():
+        decoders[name] = LayoutDecoder(name, layout, includeall, subscribed)
+    return decoders
@@ -0,0 +1,86 @@
+# grottextension.py grott extension loading and API
+# Extensions are imported once at startup. An extension module implements one of:
+#   grottext_batch(conf, records)   v2: list of ExtensionRecord (all records waiting in the extension queue)
+#   grottext_record(conf, record)   v2: one ExtensionRecord
+#   grottext(conf, data, jsonmsg)   v1: hex string of the plain record and the JSON (MQTT) message, called via an adapter
+# ExtensionRecord values have the layout divide factor applied (no json.loads or recorddict lookups needed).
+# Optional: grottext_stop(conf) is called at shutdown after the last record is processed (e.g. to close files).
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import importlib
+
+from grottlog import logger
+
+class ExtensionRecord:
+    # decoded record as passed to v2 extensions
+    __slots__ = ("layout", "rectype", "device", "time", "buffered", "values", "record")
+
+    def __init__(self, record):
+        self.layout = record.layout                     # record layout used (None in compat mode)
+        self.rectype = record.rectype                   # record type (e.g. "04", "50", "20")
+        self.device = record.device                     # device id
+        self.time = record.time                         # record date/time (%Y-%m-%dT%H:%M:%S)
+        self.buffered = record.buffered                 # "yes", "no" or "nodetect"
+        self.values = record.scaled()                   # field name : value (divided)
+        self.record = record                            # grottdata.DecodedRecord (raw values, plain data)
+
+class LayoutConf:
+    # conf as passed to v1 extensions: layout of the record, all other attributes are read from the shared conf
+    # (the shared conf.layout is not changed, extensions and decode workers run concurrently)
+
+    def __init__(self, conf, layout):
+        self.conf = conf
+        self.layout = layout
+
+    def __getattr__(self, name):
+        return getattr(self.conf, name)
+
+class Extension:
+    # loaded extension, run(conf, items) processes a list of (DecodedRecord, jsonmsg)
+
+    def __init__(self, name, module):
+        self.name = name
+        self.module = module
+        self.batch = getattr(module, "grottext_batch", None)
+        self.single = getattr(module, "grottext_record", None)
+        self.v1 = getattr(module, "grottext", None)
+        if self.batch is not None: self.api = "v2 batch"
+        elif self.single is not None: self.api = "v2"
+        elif self.v1 is not None: self.api = "v1"
+        else: raise ImportError("no grottext, grottext_record or grottext_batch function in " + name)
+        self.stophook = getattr(module, "grottext_stop", None)
+
+    def run(self, conf, items):
+        # returns extension result (last result if called per record)
+        if self.batch is not None:
+            return self.batch(conf, [ExtensionRecord(record) for record, jsonmsg in items])
+        result = None
+        for record, jsonmsg in items:
+            if self.single is not None:
+                result = self.single(conf, ExtensionRecord(record))
+            else:
+                #v1 adapter: v1 extensions use conf.layout, every call gets a conf view with the layout of the record
+                layout = record.layout if record.layout is not None else getattr(conf, "layout", None)
+                result = self.v1(LayoutConf(conf, layout), record.hexdata, jsonmsg)
+        return result
+
+    def stop(self, conf):
+        # call the extension stop function (if defined)
+        if self.stophook is None:
+            return
+        try:
+            self.stophook(conf)
+        except Exception as e:
+            logger.error("\t - Grott extension stop error: %s %s", self.name, repr(e))
+
+def load_extensions(names, verbose=False):
+    # import extension modules, returns list of Extension (modules that can not be imported are skipped)
+    extensions = []
+    for name in names:
+        try:
+            extensions.append(Extension(name, importlib.import_module(name, package=None)))
+            if verbose: logger.info("\t - Grott extension loaded: %s (%s)", name, extensions[-1].api)
+        except Exception as e:
+            logger.error("\t - Grott import extension failed: %s %s", name, e)
+    return extensions
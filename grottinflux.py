@@ -0,0 +1,331 @@
+# grottinflux.py batched InfluxDB writer
+# Points are collected per bucket (v2) / database (v1) and written by a background thread when a batch is full
+# (batchsize points) or the oldest point waits longer than the flush interval. Failed writes are retried with
+# exponential backoff, points that can not be written are dropped and counted (grott keeps running).
+# InfluxLineWriter writes line protocol over pooled keep-alive http.client connections (no influxdb / influxdb_client
+# library needed): v1 /write and v2 /api/v2/write, optional gzip.
+# With a spool (grottspool) points that can not be written are saved on disk and written (spoolrate points per second)
+# when InfluxDB is available again.
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import time
+import gzip
+import json
+import base64
+import atexit
+import calendar
+import threading
+import http.client
+from queue import LifoQueue, Empty, Full
+from urllib.parse import urlencode
+
+from grottlog import logger
+
+# timestamp multiplier per precision (line protocol time is an integer)
+PRECISIONS = {"s": 1, "ms": 1000, "us": 1000000, "ns": 1000000000}
+
+def escape_key(key):
+    # escape measurement / field key (same as the influxdb client libraries)
+    return key.replace("\\", "\\\\").replace(" ", "\\ ").replace(",", "\\,").replace("=", "\\=").replace("\n", "\\n")
+
+def field_value(value):
+    # line protocol field value: integer (i), float, boolean or (quoted) string, None = no value
+    if value is None:
+        return None
+    if value is True or value is False:
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return "%di" % value
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+def epoch(isotime, precision="s"):
+    # %Y-%m-%dT%H:%M:%S UTC time to line protocol timestamp
+    seconds = calendar.timegm((int(isotime[0:4]), int(isotime[5:7]), int(isotime[8:10]), int(isotime[11:13]), int(isotime[14:16]), int(isotime[17:19])))
+    return seconds * PRECISIONS[precision]
+
+class LineEncoder:
+    # encode records as line protocol, fields are sorted by key (like the client libraries)
+    # the sort order and escaped keys are computed once per field names tuple (owned by the record layout)
+
+    def __init__(self, precision="s", exclude=("date",)):
+        self.precision = precision
+        self.exclude = exclude
+        self.keys = {}
+
+    def fieldkeys(self, fields):
+        try:
+            return self.keys[fields]
+        except KeyError:
+            order = sorted((key, idx) for idx, key in enumerate(fields) if key not in self.exclude)
+            keys = tuple((idx, escape_key(key) + "=") for key, idx in order)
+            if len(self.keys) > 256: self.keys.clear()
+            self.keys[fields] = keys
+            return keys
+
+    def encode(self, measurement, fields, values, isotime):
+        # measurement, field names, values (same order), UTC time -> line
+        parts = []
+        for idx, key in self.fieldkeys(fields):
+            value = field_value(values[idx])
+            if value is not None:
+                parts.append(key + value)
+        return "%s %s %d" % (escape_key(measurement), ",".join(parts), epoch(isotime, self.precision))
+
+class HttpPool:
+    # pool of persistent (keep alive) http.client connections to one server
+
+    def __init__(self, host, port, https=False, timeout=5, size=2):
+        self.host = host
+        self.port = port
+        self.https = https
+        self.timeout = timeout
+        self.pool = LifoQueue(size)
+
+    def connect(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers={}):
+        # returns (status, response body), a stale keep alive connection is retried once with a new connection
+        for attempt in (0, 1):
+            try:
+                conn = self.pool.get_nowait()
+                reused = True
+            except Empty:
+                conn = self.connect()
+                reused = False
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    self.pool.put_nowait(conn)
+                except Full:
+                    conn.close()
+            return response.status, data
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except Empty:
+                return
+
+class InfluxLineWriter:
+    # write line protocol to InfluxDB v1 (/write, database) or v2 (/api/v2/write, org / bucket)
+
+    def __init__(self, host, port, v2=False, org=None, token=None, user=None, password=None, precision="s", compress=False, https=False, timeout=5):
+        self.v2 = v2
+        self.org = org
+        self.precision = precision
+        self.compress = compress
+        self.http = HttpPool(host, port, https=https, timeout=timeout)
+        self.headers = {"Content-Type": "text/plain; charset=utf-8"}
+        if v2:
+            self.headers["Authorization"] = "Token " + token
+        elif user:
+            self.headers["Authorization"] = "Basic " + base64.b64encode("{}:{}".format(user, password).encode("utf-8")).decode("ascii")
+        if compress:
+            self.headers["Content-Encoding"] = "gzip"
+
+    def path(self, target):
+        if self.v2:
+            return "/api/v2/write?" + urlencode({"org": self.org, "bucket": target, "precision": self.precision})
+        return "/write?" + urlencode({"db": target, "precision": self.precision})
+
+    def write(self, target, lines):
+        # write lines to bucket / database target, raises OSError if not written
+        body = "\n".join(lines).encode("utf-8")
+        if self.compress:
+            body = gzip.compress(body)
+        status, data = self.http.request("POST", self.path(target), body, self.headers)
+        if status != 204:
+            raise OSError("InfluxDB write status {}: {}".format(status, data[:200].decode("utf-8", "replace")))
+
+    def query(self, query):
+        # v1 query (e.g. CREATE DATABASE), returns response body
+        headers = dict(self.headers)
+        headers.pop("Content-Encoding", None)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+        status, data = self.http.request("POST", "/query", urlencode({"q": query}).encode("utf-8"), headers)
+        if status != 200:
+            raise OSError("InfluxDB query status {}: {}".format(status, data[:200].decode("utf-8", "replace")))
+        return data
+
+    def bucket_exists(self, bucket):
+        # v2: True if the bucket list response holds a bucket with this name (bucket defined and readable with the token)
+        headers = {"Authorization": self.headers["Authorization"]}
+        status, data = self.http.request("GET", "/api/v2/buckets?" + urlencode({"name": bucket, "org": self.org}), None, headers)
+        if status != 200:
+            raise OSError("InfluxDB buckets status {}: {}".format(status, data[:200].decode("utf-8", "replace")))
+        try:
+            buckets = json.loads(data.decode("utf-8")).get("buckets") or []
+        except (ValueError, AttributeError):
+            raise OSError("InfluxDB buckets invalid response: {}".format(data[:200].decode("utf-8", "replace")))
+        return any(isinstance(item, dict) and item.get("name") == bucket for item in buckets)
+
+class InfluxBatchWriter:
+
+    def __init__(self, write, batchsize=100, interval=1000, retries=5, mindelay=1, maxdelay=60, maxpending=10000, spool=None, spoolrate=500):
+        # write(target, points): function that writes a list of points to target (bucket / database), raises on error
+        # interval: max time (ms) a point waits before it is written
+        self.write = write
+        self.batchsize = max(1, batchsize)
+        self.interval = max(1, interval) / 1000
+        self.retries = retries
+        self.mindelay = mindelay
+        self.maxdelay = maxdelay
+        self.maxpending = maxpending
+        self.spool = spool
+        self.spoolrate = spoolrate
+        self.batches = {}                                           #target : [first point time, points]
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = True
+
+        #counters
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retried = 0
+        self.pending = 0
+
+        self.flusher = threading.Thread(target=self.run, name="grottinflux", daemon=True)
+        self.flusher.start()
+        atexit.register(self.stop)
+
+    def add(self, target, point):
+        # add point to the batch of target, the oldest point is dropped if too many points are waiting
+        with self.lock:
+            batch = self.batches.get(target)
+            if batch is None:
+                batch = self.batches[target] = [time.monotonic(), []]
+            if self.pending >= self.maxpending:
+                for other in self.batches.values():
+                    if other[1]:
+                        other[1].pop(0)
+                        self.pending -= 1
+                        self.dropped += 1
+                        break
+            batch[1].append(point)
+            self.pending += 1
+            full = len(batch[1]) >= self.batchsize
+        if full:
+            self.wakeup.set()
+
+    def take(self, force=False):
+        # remove and return the batches that have to be written: [(target, points)]
+        now = time.monotonic()
+        ready = []
+        with self.lock:
+            for target, (first, points) in list(self.batches.items()):
+                if points and (force or len(points) >= self.batchsize or now - first >= self.interval):
+                    del self.batches[target]
+                    self.pending -= len(points)
+                    ready.append((target, points))
+        return ready
+
+    def run(self):
+        # flush thread: write batches that are full or waiting longer than interval
+        while self.running:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            for target, points in self.take():
+                if self.spool is not None and not self.spool.empty():
+                    #InfluxDB was not available: spool new points after the older points
+                    self.tospool(target, points)
+                else:
+                    self.flush(target, points)
+            if self.spool is not None and not self.spool.empty():
+                self.drain()
+
+    def tospool(self, target, points):
+        for point in points:
+            self.spool.append([target, point])
+
+    def drain(self):
+        # write spooled points (max spoolrate per second), stop at the first write error (tried again next interval)
+        start = time.monotonic()
+        items = self.spool.read(self.spoolrate)
+        done = 0
+        while done < len(items):
+            #points for the same target in one write
+            target = items[done][0][0]
+            end = done
+            while end < len(items) and end - done < self.batchsize and items[end][0][0] == target:
+                end += 1
+            try:
+                self.write(target, [item[0][1] for item in items[done:end]])
+            except Exception as e:
+                self.failed += 1
+                logger.debug("\t - Grott InfluxDB spooled points not written: %s", e)
+                break
+            self.written += end - done
+            self.spool.commit(items[end-1][1], end - done)
+            done = end
+        if done:
+            logger.debug("\t - Grott InfluxDB %s spooled points written", done)
+            elapsed = time.monotonic() - start
+            if elapsed < 1 and self.running:
+                time.sleep(1 - elapsed)
+
+    def flush(self, target, points):
+        # write points (in batches of max batchsize), retry with exponential backoff
+        for start in range(0, len(points), self.batchsize):
+            chunk = points[start:start+self.batchsize]
+            delay = self.mindelay
+            for attempt in range(self.retries + 1):
+                try:
+                    self.write(target, chunk)
+                    self.written += len(chunk)
+                    logger.debug("\t - Grott InfluxDB %s points written to %s", len(chunk), target)
+                    break
+                except Exception as e:
+                    self.failed += 1
+                    if attempt >= self.retries or not self.running:
+                        if self.spool is not None:
+                            self.tospool(target, chunk)
+                            logger.error("\t - Grott InfluxDB write error, %s points spooled: %s", len(chunk), e)
+                        else:
+                            self.dropped += len(chunk)
+                            logger.error("\t - Grott InfluxDB write error, %s points dropped: %s", len(chunk), e)
+                        break
+                    self.retried += 1
+                    logger.warning("\t - Grott InfluxDB write error, retry in %s sec: %s", delay, e)
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.maxdelay)
+
+    def stats(self):
+        # counters: points pending / written / dropped, failed writes, retries
+        return {
+                    "pending" : self.pending,
+                    "written" : self.written,
+                    "dropped" : self.dropped,
+                    "failed" : self.failed,
+                    "retried" : self.retried,
+                    "spool" : self.spool.stats() if self.spool is not None else None
+                }
+
+    def stop(self):
+        # write all pending points (no retry, spooled if not written) and stop the flush thread
+        if not self.running:
+            return
+        self.running = False
+        self.wakeup.set()
+        self.flusher.join(self.maxdelay)
+        for target, points in self.take(force=True):
+            self.flush(target, points)
+        if self.spool is not None:
+            self.spool.close()
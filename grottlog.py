@@ -0,0 +1,139 @@
+# grottlog.py grott logging
+# Messages are logged with levels (TRACE, DEBUG = verbose, INFO) and lazy formatting (arguments are only formatted when written).
+# Records are put on a queue and written to stdout by a listener thread, so writing output never blocks record processing / forwarding.
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import sys
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+
+#trace level (below debug = verbose)
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+#logger used by all grott modules
+logger = logging.getLogger("grott")
+logger.propagate = False
+
+_listener = None
+
+class LazyDump:
+    # lazy hex dump (or other expensive formatting): func(*args) is only called when the message is written
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+class StdoutHandler(logging.StreamHandler):
+    # write to the current sys.stdout (can be redirected by grott -o after the handler is created)
+    def __init__(self):
+        logging.StreamHandler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class RateLimitFilter(logging.Filter):
+    # allow maximal <rate> messages per message (format string) per <period> seconds, suppressed messages are counted
+    def __init__(self, rate, period=1.0):
+        logging.Filter.__init__(self)
+        self.rate = rate
+        self.period = period
+        self.windows = {}
+        self.suppressed = 0
+
+    def filter(self, record):
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        start, count = self.windows.get(record.msg, (now, 0))
+        if now - start >= self.period:
+            start, count = now, 0
+        if count >= self.rate:
+            self.windows[record.msg] = (start, count)
+            self.suppressed += 1
+            return False
+        if len(self.windows) > 1024: self.windows.clear()
+        self.windows[record.msg] = (start, count + 1)
+        return True
+
+class SampleFilter(logging.Filter):
+    # only log every <sample>th message with a hex dump (LazyDump argument)
+    def __init__(self, sample):
+        logging.Filter.__init__(self)
+        self.sample = sample
+        self.count = 0
+        self.skipped = 0
+
+    def filter(self, record):
+        if self.sample <= 1 or not record.args:
+            return True
+        if not any(isinstance(arg, LazyDump) for arg in record.args):
+            return True
+        self.count += 1
+        if self.count % self.sample == 1:
+            return True
+        self.skipped += 1
+        return False
+
+class GrottQueueHandler(logging.handlers.QueueHandler):
+    # queue handler that does not format the message (done in the listener thread) and drops records if the queue is full
+    def __init__(self, logqueue):
+        logging.handlers.QueueHandler.__init__(self, logqueue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup(verbose=False, trace=False, usequeue=True, rate=0, tracesample=1, queuesize=10000):
+    # (re)configure grott logging, returns the handler used by the logger (with filters)
+    global _listener
+    stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    if trace: logger.setLevel(TRACE)
+    elif verbose: logger.setLevel(logging.DEBUG)
+    else: logger.setLevel(logging.INFO)
+
+    output = StdoutHandler()
+    output.setFormatter(logging.Formatter("%(message)s"))
+    if usequeue:
+        handler = GrottQueueHandler(queue.Queue(queuesize))
+        _listener = logging.handlers.QueueListener(handler.queue, output)
+        _listener.start()
+    else:
+        handler = output
+    handler.addFilter(RateLimitFilter(rate))
+    handler.addFilter(SampleFilter(tracesample))
+    logger.addHandler(handler)
+    return handler
+
+def stop():
+    # write queued messages and stop the listener thread
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+        _listener = None
+
+atexit.register(stop)
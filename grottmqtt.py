@@ -0,0 +1,223 @@
+# grottmqtt.py persistent MQTT publisher
+# One long lived paho client with a background network loop. Messages are put on a bounded queue and published
+# by a sender thread, so publishing a record is a queue append instead of a connect / publish / disconnect.
+# With a spool (grottspool) messages are written to disk while the broker is not reachable and sent (spoolrate messages
+# per second) after reconnect.
+# A message that can not be published because the connection is lost is published again first after reconnect
+# (at stop it is written to the spool).
+# subscribe(topic, callback) subscriptions are renewed after every (re)connect.
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import time
+import queue
+import atexit
+import threading
+
+import paho.mqtt.client as mqtt
+
+from grottlog import logger
+
+# publish results for which the message is published again after reconnect (other errors drop the message)
+RETRY_RC = (mqtt.MQTT_ERR_NO_CONN, mqtt.MQTT_ERR_CONN_LOST, mqtt.MQTT_ERR_QUEUE_SIZE)
+
+class MqttPublisher:
+
+    def __init__(self, host, port=1883, client_id="grott", auth=None, keepalive=60, queuesize=1000, mindelay=1, maxdelay=120, spool=None, spoolrate=50):
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.queue = queue.Queue(queuesize)
+        self.connected = threading.Event()
+        self.running = True
+        self.spool = spool
+        self.spoolrate = spoolrate
+        self.subscriptions = {}                                     #topic : callback(topic, payload)
+
+        #counters
+        self.published = 0
+        self.replayed = 0                                           #spooled messages sent
+        self.dropped = 0
+        self.failed = 0
+        self.reconnects = 0
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+        self.latency_total = 0.0
+
+        #paho >= 2.0 needs the callback api version
+        try:
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=client_id)
+        except AttributeError:
+            self.client = mqtt.Client(client_id=client_id)
+        if auth is not None:
+            self.client.username_pw_set(auth.get("username"), auth.get("password"))
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+        #reconnect with exponential backoff (mindelay, 2*mindelay, .. maxdelay seconds), done by the paho network loop
+        self.client.reconnect_delay_set(min_delay=mindelay, max_delay=maxdelay)
+        self.client.connect_async(host, port, keepalive)
+        self.client.loop_start()
+
+        self.sender = threading.Thread(target=self.run, name="grottmqtt", daemon=True)
+        self.sender.start()
+        atexit.register(self.stop)
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            logger.info("\t - Grott MQTT connected to %s:%s", self.host, self.port)
+            for topic in list(self.subscriptions):
+                client.subscribe(topic)
+            self.connected.set()
+        else:
+            logger.warning("\t - Grott MQTT connection refused : %s", mqtt.connack_string(rc))
+
+    def on_disconnect(self, client, userdata, rc):
+        self.connected.clear()
+        if rc != 0 and self.running:
+            self.reconnects += 1
+            logger.warning("\t - Grott MQTT connection lost (%s), reconnecting", rc)
+
+    def on_message(self, client, userdata, message):
+        callback = self.subscriptions.get(message.topic)
+        if callback is None:
+            return
+        try:
+            callback(message.topic, message.payload)
+        except Exception as e:
+            logger.error("\t - Grott MQTT subscription %s callback error: %s", message.topic, e)
+
+    def subscribe(self, topic, callback):
+        # call callback(topic, payload) for messages received on topic (no wildcards), also subscribed after reconnect
+        self.subscriptions[topic] = callback
+        if self.connected.is_set():
+            self.client.subscribe(topic)
+
+    def publish(self, topic, payload, retain=False, qos=0):
+        # put message on the publish queue, if the queue is full the oldest message is dropped
+        # with spool: spool the message if the broker is not connected or older messages are spooled (keep order)
+        if self.spool is not None and (not self.connected.is_set() or not self.spool.empty()):
+            self.spool.append([topic, payload, retain, qos])
+            return True
+        item = (topic, payload, retain, qos, time.monotonic())
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        return True
+
+    def run(self):
+        # sender thread: publish queued messages when connected
+        item = None                                                 #message not published (connection lost), sent again first
+        while self.running:
+            if item is None:
+                if self.spool is not None and self.connected.is_set() and self.queue.empty() and not self.spool.empty():
+                    self.drain()
+                    continue
+                try:
+                    item = self.queue.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+            topic, payload, retain, qos, queued = item
+            while self.running and not self.connected.wait(1):
+                pass
+            if not self.running:
+                break
+            try:
+                info = self.client.publish(topic, payload=payload, qos=qos, retain=retain)
+                if info.rc in RETRY_RC:
+                    #keep the message, publish again after reconnect
+                    logger.debug("\t - Grott MQTT send failed: %s, retry after reconnect", mqtt.error_string(info.rc))
+                    time.sleep(0.1)
+                    continue
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    raise OSError(mqtt.error_string(info.rc))
+            except Exception as e:
+                item = None
+                self.failed += 1
+                logger.debug("\t - Grott MQTT send failed: %s", e)
+                continue
+            item = None
+            self.published += 1
+            latency = time.monotonic() - queued
+            self.latency_last = latency
+            self.latency_total += latency
+            if latency > self.latency_max: self.latency_max = latency
+            logger.debug("\t - MQTT message message sent")
+        if item is not None and self.spool is not None:
+            #stopped before the message was published
+            self.spool.append(list(item[:4]))
+
+    def drain(self):
+        # send spooled messages (max spoolrate per second) while connected
+        start = time.monotonic()
+        sent = 0
+        done = None
+        for (topic, payload, retain, qos), position in self.spool.read(self.spoolrate):
+            if not self.connected.is_set():
+                break
+            info = self.client.publish(topic, payload=payload, qos=qos, retain=retain)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                break
+            sent += 1
+            done = position
+        if sent:
+            self.spool.commit(done, sent)
+            self.replayed += sent
+            logger.debug("\t - Grott MQTT %s spooled messages sent", sent)
+        elapsed = time.monotonic() - start
+        if elapsed < 1:
+            time.sleep(1 - elapsed)
+
+    def stats(self):
+        # queue depth and latency counters (latency in ms)
+        return {
+                    "connected" : self.connected.is_set(),
+                    "queue" : self.queue.qsize(),
+                    "published" : self.published,
+                    "replayed" : self.replayed,
+                    "dropped" : self.dropped,
+                    "failed" : self.failed,
+                    "reconnects" : self.reconnects,
+                    "latency_last" : round(self.latency_last * 1000, 1),
+                    "latency_max" : round(self.latency_max * 1000, 1),
+                    "latency_avg" : round(self.latency_total / self.published * 1000, 1) if self.published else 0.0,
+                    "spool" : self.spool.stats() if self.spool is not None else None
+                }
+
+    def stop(self, timeout=5):
+        # publish queued messages (wait max timeout seconds) and disconnect
+        if not self.running:
+            return
+        end = time.monotonic() + timeout
+        while not self.queue.empty() and self.connected.is_set() and time.monotonic() < end:
+            time.sleep(0.05)
+        self.running = False
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.sender.join(2)
+        self.client.disconnect()
+        self.client.loop_stop()
+        if self.spool is not None:
+            #messages not published are saved in the spool (sent after the next start)
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    self.spool.append(list(item[:4]))
+            self.spool.close()
@@ -1,10 +1,23 @@
 #Grott Growatt monitor :  Proxy 
 #       
-# Updated: 2022-08-07
-# Version 2.7.5
+# The proxy runs one selectors event loop (epoll on Linux): every datalogger connection and its forward connection
+# to the Growatt server is a Channel (socket, peer channel, output buffer), registration and removal are O(1) and
+# the loop only wakes up when a socket is ready (no polling delay). Sockets are non blocking, data that can not be
+# sent at once is buffered and sent when the socket is writable.
+# Records are forwarded first and then handed to a pool of decode workers (bounded queue, oldest record dropped when
+# full), so slow outputs never delay the relaying of other connections.
+# Every channel has a grottcodec.FrameReader: records are forwarded and processed one by one, also if a read holds
+# several records (buffered records burst) or only a part of a record.
+# The connection to the Growatt server is non blocking (connecttimeout), the server address comes from a Resolver
+# cache (dnsttl, refreshed in a background thread): a reconnect storm of dataloggers never stops the event loop.
+# Updated: 2026-10-18
+# Version 2.8.4
 
 import socket
-import select
+import selectors
+import threading
+import ipaddress
+import errno
 import time
 import sys
 import struct
@@ -15,91 +28,141 @@ import time, json, datetime, codecs
 if sys.platform != 'win32' :
    from signal import signal, SIGPIPE, SIG_DFL
 
-from grottdata import procdata, decrypt, format_multi_line
+from grottdata import procdata, format_multi_line
+from grottlog import logger, LazyDump
+from grottsink import SinkWorker
+import grottcodec
 
 #import mqtt                       
 import paho.mqtt.publish as publish
 
-#import libscrc for additional crc checking                        
-# for compat reason (generate a message in the log) also done in proxy _init_
-try:     
-    import libscrc
-except:
-    print("\t **********************************************************************************")
-    print("\t - Grott - libscrc not installed, no CRC checking only record validation on length!") 
-    print("\t **********************************************************************************")
-
-
-# Changing the buffer_size and delay, you can improve the speed and bandwidth.
-# But when buffer get to high or delay go too down, you can broke things
+# Changing the buffer_size, you can improve the speed and bandwidth.
+# But when buffer get to high, you can broke things
 buffer_size = 4096
 #buffer_size = 65535
-delay = 0.0002
-
-def validate_record(xdata): 
-    # validata data record on length and CRC (for "05" and "06" records)
-    
-    data = bytes.fromhex(xdata)
-    ldata = len(data)
-    len_orgpayload = int.from_bytes(data[4:6],"big")
-    header = "".join("{:02x}".format(n) for n in data[0:8])
-    protocol = header[6:8]
-
-    if protocol in ("05","06"):
-        lcrc = 4
-        crc = int.from_bytes(data[ldata-2:ldata],"big")
-    else: 
-        lcrc = 0
-
-    len_realpayload = (ldata*2 - 12 -lcrc) / 2
-
-    if protocol != "02" :
+# max pending connections (accept backlog)
+backlog = 1024
+
+def validate_record(data): 
+    # validata data record on length and CRC (for "05" and "06" records), see grottcodec
+    return grottcodec.validate_record(data)
+
+
+def filter_record(conf, data):
+    # returns True if data can be forwarded: valid record and not blocked (blockcmd, recwl)
+    #test if record is not corrupted
+    validatecc = validate_record(data)
+    if validatecc != 0 : 
+        logger.warning("\t - Grott - grottproxy - Invalid data record received, processing stopped for this record")
+        #Create response if needed? 
+        #self.send_queuereg[qname].put(response)
+        return False
+
+    # FILTER!!!!!!!! Detect if configure data is sent!
+    header = data[0:8].hex()
+    if conf.blockcmd : 
+        #standard everything is blocked!
+        logger.debug("\t - Growatt command block checking started") 
+        blockflag = True 
+        #partly block configure Shine commands                   
+        if header[14:16] == "18" :         
+            if conf.blockcmd : 
+                if header[6:8] == "05" or header[6:8] == "06" : confdata = grottcodec.decrypt(data).hex() 
+                else :  confdata = data.hex()
+
+                #get conf command (location depends on record type), maybe later more flexibility is needed
+                if header[6:8] == "06" : confcmd = confdata[76:80]
+                else: confcmd = confdata[36:40]
                 
-        try: 
-            crc_calc = libscrc.modbus(data[0:ldata-2])
-        except: 
-            #liscrc is not installed yet
-            #print("\t - Grott - Validate datarecord - libscrc not installed, only validation on record length")  
-            crc_calc = crc = 0 
+                if header[14:16] == "18" : 
+                    #do not block if configure time command of configure IP (if noipf flag set)
+                    if conf.verbose : logger.debug("\t - Grott: Shine Configure command detected")                                                    
+                    if confcmd == "001f" or (confcmd == "0011" and conf.noipf) : 
+                        blockflag = False
+                        if confcmd == "001f": confcmd = "Time"
+                        if confcmd == "0011": confcmd = "Change IP"
+                        if conf.verbose : logger.debug("\t - Grott: Configure command not blocked :  %s", confcmd)    
+                else : 
+                    #All configure inverter commands will be blocked
+                    if conf.verbose : logger.debug("\t - Grott: Inverter Configure command detected")
+        
+        #allow records: 
+        if header[12:16] in conf.recwl : blockflag = False     
 
-    if len_realpayload == len_orgpayload :
-        returncc = 0
-        if protocol != "02" and crc != crc_calc:     
-            returncc = 8    
-    else : 
-        returncc = 8
+        if blockflag : 
+            logger.info("\t - Grott: Record blocked:  %s", header[12:16])
+            if header[6:8] == "05" or header[6:8] == "06" : blockeddata = grottcodec.decrypt(data).hex() 
+            else :  blockeddata = data
+            logger.info("%s", LazyDump(format_multi_line, "\t\t ", blockeddata))
+            return False
 
-    return(returncc)
+    return True
 
 
-class Forward:
-    def __init__(self):
-        self.forward = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+class Resolver:
+    # cached (IPv4) address lookup: resolve() never blocks, expired or missing addresses are looked up in a background thread
+    # (the expired address is used until the new one is known)
 
-    def start(self, host, port):
+    def __init__(self, ttl=300, retry=30):
+        self.ttl = ttl
+        self.retry = retry                                          #seconds to the next lookup after a failure
+        self.cache = {}                                             #(host, port) : (address, expires)
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def lookup(self, host, port):
+        # blocking lookup, returns (ip, port)
+        return socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)[0][4]
+
+    def refresh(self, host, port):
+        key = (host, port)
+        try:
+            address = self.lookup(host, port)
+            expires = time.monotonic() + self.ttl
+        except OSError as e:
+            logger.warning("\t - Grott - grottproxy can not resolve %s :  %s", host, e)
+            address = self.cache[key][0] if key in self.cache else None
+            expires = time.monotonic() + self.retry
+        with self.lock:
+            self.cache[key] = (address, expires)
+            self.pending.discard(key)
+
+    def resolve(self, host, port):
+        # returns cached (ip, port) or None if not resolved yet
         try:
-            self.forward.connect((host, port))
-            return self.forward
-        except Exception as e:
-            print("\t - Grott - grottproxy forward error : ", e) 
-            #print(e)
-            return False  
+            #ip address: no lookup needed
+            return (str(ipaddress.IPv4Address(host)), port)
+        except ValueError:
+            pass
+        key = (host, port)
+        entry = self.cache.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            with self.lock:
+                start = key not in self.pending
+                self.pending.add(key)
+            if start:
+                threading.Thread(target=self.refresh, args=key, name="grottresolve", daemon=True).start()
+        return entry[0] if entry is not None else None
+
+class Channel:
+    # one side of a proxied connection (datalogger or Growatt server)
+    __slots__ = ("sock", "addr", "peer", "outbuf", "events", "closed", "framer", "deadline")
+
+    def __init__(self, sock, addr):
+        sock.setblocking(False)
+        self.sock = sock
+        self.addr = addr
+        self.peer = None                                #channel of the other side
+        self.outbuf = bytearray()                       #data waiting to be sent (socket not writable)
+        self.events = selectors.EVENT_READ
+        self.closed = False
+        self.framer = grottcodec.FrameReader()          #records received from this side
+        self.deadline = 0                               #connect timeout (time.monotonic), 0 = connected
 
 class Proxy:
-    input_list = []
-    channel = {}
 
     def __init__(self, conf):
-        print("\nGrott proxy mode started")
-
-        # for compatibility reasons test if libscrc is installed and send error message
-        # if not installed processing wil continue but records will only be validated on length and not on crc. 
-        try:     
-            import libscrc
-        except:
-            print("\t **********************************************************************************")
-            print("\t - Grott - libscrc not installed, no CRC checking only record validation on length!") 
-            print("\t **********************************************************************************")
+        logger.info("\nGrott proxy mode started")
 
         ## to resolve errno 32: broken pipe issue (Linux only)
         if sys.platform != 'win32':
@@ -113,129 +176,209 @@ class Proxy:
         #socket.gethostbyname(socket.gethostname())
         try: 
             hostname = (socket.gethostname())    
-            print("Hostname :", hostname)
-            print("IP : ", socket.gethostbyname(hostname), ", port : ", conf.grottport, "\n")
+            logger.info("Hostname : %s", hostname)
+            logger.info("IP :  %s , port :  %s \n", socket.gethostbyname(hostname), conf.grottport)
         except:  
-            print("IP and port information not available") 
+            logger.info("IP and port information not available") 
 
-        self.server.listen(200)
+        self.server.listen(backlog)
+        self.server.setblocking(False)
         self.forward_to = (conf.growattip, conf.growattport)
+        self.connecttimeout = conf.connecttimeout
+        self.resolver = Resolver(conf.dnsttl)
+        self.resolver.refresh(conf.growattip, conf.growattport)
+        self.selector = selectors.DefaultSelector()
+        self.connections = 0                                    #open datalogger connections
+        self.connecting = {}                                    #Growatt server channel : connect deadline
+        #decode / dispatch workers (stats: queue depth, dropped records)
+        self.decoder = SinkWorker("decode", procdata, conf.decodequeue, "dropoldest", workers=conf.decodeworkers)
         
     def main(self,conf):
-        self.input_list.append(self.server)
+        self.selector.register(self.server, selectors.EVENT_READ, None)
         while 1:
-            time.sleep(delay)
-            ss = select.select
-            inputready, outputready, exceptready = ss(self.input_list, [], [])
-            for self.s in inputready:
-                if self.s == self.server:
+            #wake up every second while connects are pending (connect timeout)
+            for key, mask in self.selector.select(1 if self.connecting else None):
+                channel = key.data
+                if channel is None:
                     self.on_accept(conf)
-                    break
-                try: 
-                    self.data, self.addr = self.s.recvfrom(buffer_size)
-                except: 
-                    if conf.verbose : print("\t - Grott connection error") 
-                    self.on_close(conf)   
-                    break
-                if len(self.data) == 0:
-                    self.on_close(conf)
-                    break
-                else:
-                    self.on_recv(conf)
+                    continue
+                if channel.closed:
+                    #closed by an earlier event of this select
+                    continue
+                if mask & selectors.EVENT_WRITE:
+                    self.on_write(conf, channel)
+                if mask & selectors.EVENT_READ and not channel.closed:
+                    try: 
+                        data = channel.sock.recv(buffer_size)
+                    except (BlockingIOError, InterruptedError):
+                        continue
+                    except OSError: 
+                        if conf.verbose : logger.debug("\t - Grott connection error") 
+                        self.on_close(conf, channel)   
+                        continue
+                    if len(data) == 0:
+                        self.on_close(conf, channel)
+                        continue
+                    for record in channel.framer.feed(data):
+                        if channel.closed:
+                            break
+                        self.on_recv(conf, channel, record)
+            if self.connecting:
+                self.check_connecting(conf)
 
     def on_accept(self,conf):
-        forward = Forward().start(self.forward_to[0], self.forward_to[1])
-        clientsock, clientaddr = self.server.accept()
-        if forward:
-            if conf.verbose: print("\t -", clientaddr, "has connected")
-            self.input_list.append(clientsock)
-            self.input_list.append(forward)
-            self.channel[clientsock] = forward
-            self.channel[forward] = clientsock
-        else:
-            if conf.verbose: 
-                print("\t - Can't establish connection with remote server."),
-                print("\t - Closing connection with client side", clientaddr)
-            clientsock.close()
-
-    def on_close(self,conf):
+        #accept all waiting connections
+        while True:
+            try:
+                clientsock, clientaddr = self.server.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.error("\t - Grott - grottproxy accept error :  %s", e)
+                return
+            forward = self.connect_forward()
+            if forward:
+                if conf.verbose: logger.debug("\t - %s has connected", clientaddr)
+                client = Channel(clientsock, clientaddr)
+                server = Channel(forward, self.forward_to)
+                client.peer = server
+                server.peer = client
+                #data from the datalogger is buffered (server.outbuf) until the Growatt server is connected
+                server.deadline = time.monotonic() + self.connecttimeout
+                server.events = selectors.EVENT_WRITE
+                self.connecting[server] = server.deadline
+                self.selector.register(clientsock, selectors.EVENT_READ, client)
+                self.selector.register(forward, selectors.EVENT_WRITE, server)
+                self.connections += 1
+            else:
+                if conf.verbose: 
+                    logger.debug("\t - Can't establish connection with remote server."),
+                    logger.debug("\t - Closing connection with client side %s", clientaddr)
+                clientsock.close()
+
+    def connect_forward(self):
+        # start non blocking connect to the Growatt server, returns socket or False
+        address = self.resolver.resolve(self.forward_to[0], self.forward_to[1])
+        if address is None:
+            logger.error("\t - Grott - grottproxy forward error :  %s not resolved", self.forward_to[0])
+            return False
+        forward = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        forward.setblocking(False)
+        rc = forward.connect_ex(address)
+        if rc not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+            logger.error("\t - Grott - grottproxy forward error :  %s", errno.errorcode.get(rc, rc))
+            forward.close()
+            return False
+        return forward
+
+    def on_connect(self, conf, channel):
+        # non blocking connect to the Growatt server finished
+        self.connecting.pop(channel, None)
+        rc = channel.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if rc != 0:
+            logger.error("\t - Grott - grottproxy forward error :  %s", errno.errorcode.get(rc, rc))
+            if conf.verbose: logger.debug("\t - Closing connection with client side %s", channel.peer.addr)
+            self.on_close(conf, channel)
+            return False
+        channel.deadline = 0
+        return True
+
+    def check_connecting(self, conf):
+        # close connections that are not connected to the Growatt server within connecttimeout
+        now = time.monotonic()
+        for channel, deadline in list(self.connecting.items()):
+            if deadline <= now:
+                logger.error("\t - Grott - grottproxy forward error :  connect timeout (%s sec)", self.connecttimeout)
+                if conf.verbose: logger.debug("\t - Closing connection with client side %s", channel.peer.addr)
+                self.on_close(conf, channel)
+
+    def on_close(self, conf, channel):
+        if channel.closed:
+            return
         if conf.verbose: 
-            #try / except to resolve errno 107: Transport endpoint is not connected 
-            try: 
-                print("\t -", self.s.getpeername(), "has disconnected")
-            except:  
-                print("\t -", "peer has disconnected")
-
-        #remove objects from input_list
-        self.input_list.remove(self.s)
-        self.input_list.remove(self.channel[self.s])
-        out = self.channel[self.s]
-        # close the connection with client
-        self.channel[out].close()  # equivalent to do self.s.close()
-        # close the connection with remote server
-        self.channel[self.s].close()
-        # delete both objects from channel dict
-        del self.channel[out]
-        del self.channel[self.s]
-
-    def on_recv(self,conf):
-        data = self.data      
-        print("")
-        print("\t - " + "Growatt packet received:") 
-        print("\t\t ", self.channel[self.s])
-        
-        #test if record is not corrupted
-        vdata = "".join("{:02x}".format(n) for n in data)
-        validatecc = validate_record(vdata)
-        if validatecc != 0 : 
-            print(f"\t - Grott - grottproxy - Invalid data record received, processing stopped for this record")
-            #Create response if needed? 
-            #self.send_queuereg[qname].put(response)
-            return  
-
-        # FILTER!!!!!!!! Detect if configure data is sent!
-        header = "".join("{:02x}".format(n) for n in data[0:8])
-        if conf.blockcmd : 
-            #standard everything is blocked!
-            print("\t - " + "Growatt command block checking started") 
-            blockflag = True 
-            #partly block configure Shine commands                   
-            if header[14:16] == "18" :         
-                if conf.blockcmd : 
-                    if header[6:8] == "05" or header[6:8] == "06" : confdata = decrypt(data) 
-                    else :  confdata = data
-
-                    #get conf command (location depends on record type), maybe later more flexibility is needed
-                    if header[6:8] == "06" : confcmd = confdata[76:80]
-                    else: confcmd = confdata[36:40]
-                    
-                    if header[14:16] == "18" : 
-                        #do not block if configure time command of configure IP (if noipf flag set)
-                        if conf.verbose : print("\t - Grott: Shine Configure command detected")                                                    
-                        if confcmd == "001f" or (confcmd == "0011" and conf.noipf) : 
-                            blockflag = False
-                            if confcmd == "001f": confcmd = "Time"
-                            if confcmd == "0011": confcmd = "Change IP"
-                            if conf.verbose : print("\t - Grott: Configure command not blocked : ", confcmd)    
-                    else : 
-                        #All configure inverter commands will be blocked
-                        if conf.verbose : print("\t - Grott: Inverter Configure command detected")
-            
-            #allow records: 
-            if header[12:16] in conf.recwl : blockflag = False     
-
-            if blockflag : 
-                print("\t - Grott: Record blocked: ", header[12:16])
-                if header[6:8] == "05" or header[6:8] == "06" : blockeddata = decrypt(data) 
-                else :  blockeddata = data
-                print(format_multi_line("\t\t ",blockeddata))
+            logger.debug("\t - %s has disconnected", channel.addr)
+        #close both sides of the connection
+        for side in (channel, channel.peer):
+            if side.closed:
+                continue
+            side.closed = True
+            self.connecting.pop(side, None)
+            try:
+                self.selector.unregister(side.sock)
+            except (KeyError, ValueError):
+                pass
+            side.sock.close()
+        self.connections -= 1
+
+    def close(self, conf):
+        # close all connections and the listening socket
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None and not key.data.closed:
+                self.on_close(conf, key.data)
+        self.selector.close()
+        self.server.close()
+        self.decoder.stop()
+
+    def set_events(self, channel, events):
+        if channel.events != events:
+            channel.events = events
+            self.selector.modify(channel.sock, events, channel)
+
+    def send(self, conf, channel, data):
+        # send data to channel, data that can not be sent now is buffered (sent by on_write)
+        if channel.closed:
+            return
+        if channel.deadline:
+            #not connected yet
+            channel.outbuf += data
+            return
+        if not channel.outbuf:
+            try:
+                sent = channel.sock.send(data)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                self.on_close(conf, channel)
+                return
+            if sent == len(data):
+                return
+            data = data[sent:]
+        channel.outbuf += data
+        self.set_events(channel, selectors.EVENT_READ | selectors.EVENT_WRITE)
+
+    def on_write(self, conf, channel):
+        # socket writable: connected (Growatt server) and / or send buffered data
+        if channel.deadline:
+            if not self.on_connect(conf, channel):
                 return
+            if not channel.outbuf:
+                self.set_events(channel, selectors.EVENT_READ)
+                return
+            self.set_events(channel, selectors.EVENT_READ | selectors.EVENT_WRITE)
+        try:
+            sent = channel.sock.send(channel.outbuf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self.on_close(conf, channel)
+            return
+        del channel.outbuf[:sent]
+        if not channel.outbuf:
+            self.set_events(channel, selectors.EVENT_READ)
+
+    def on_recv(self, conf, channel, data):
+        logger.debug("")
+        logger.debug("\t - Growatt packet received:") 
+        logger.debug("\t\t  %s", channel.peer.addr)
+        
+        if not filter_record(conf, data):
+            return
 
         # send data to destination
-        self.channel[self.s].send(data)
+        self.send(conf, channel.peer, data)
         if len(data) > conf.minrecl :
-            #process received data
-            procdata(conf,data)    
+            #process received data (in a decode worker)
+            self.decoder.put(conf, data)
         else:     
-            if conf.verbose: print("\t - " + 'Data less then minimum record length, data not processed') 
+            if conf.verbose: logger.debug("\t - Data less then minimum record length, data not processed") 
                 
\ No newline at end of file
@@ -0,0 +1,157 @@
+# grottpvout.py PVOutput batch uploader
+# Status points are queued per system id and sent by a background thread with the addbatchstatus service
+# (max batchsize statuses per request) over a keep-alive https connection. Sending never delays record processing.
+# If PVOutput refuses requests (403 / 429: request limit reached) or can not be reached, sending is paused (exponential backoff).
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import time
+import atexit
+import threading
+from urllib.parse import urlsplit, urlencode
+
+from grottinflux import HttpPool
+from grottlog import logger
+
+# status values in addbatchstatus order (date, time, v1 .. v12), other keys (c1, n) are request parameters
+STATUSKEYS = ("d", "t", "v1", "v2", "v3", "v4", "v5", "v6", "v7", "v8", "v9", "v10", "v11", "v12")
+
+class PvOutputUploader:
+
+    def __init__(self, apikey, url="https://pvoutput.org/service/r2/addbatchstatus.jsp", batchsize=30, interval=10, timeout=10,
+                 mindelay=60, maxdelay=3600, maxpending=5000):
+        # batchsize: max statuses per request (30, 100 with PVOutput donation), interval: seconds to collect statuses
+        self.apikey = apikey
+        parts = urlsplit(url)
+        self.path = parts.path
+        self.http = HttpPool(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80), https=parts.scheme == "https", timeout=timeout, size=1)
+        self.batchsize = batchsize
+        self.interval = interval
+        self.mindelay = mindelay
+        self.maxdelay = maxdelay
+        self.maxpending = maxpending
+        self.batches = {}                                           #(system id, parameters) : [statuses]
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = True
+        self.delay = 0                                              #current backoff delay (0 = not refused)
+        self.resume = 0                                             #time.time() sending is allowed again
+
+        #counters
+        self.pending = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.refused = 0
+
+        self.sender = threading.Thread(target=self.run, name="grottpvout", daemon=True)
+        self.sender.start()
+        atexit.register(self.stop)
+
+    def add(self, systemid, pvdata):
+        # queue status (pvdata: dict d, t, v1 .. v12 and request parameters like c1, n) for systemid
+        status = ",".join(str(pvdata.get(key, "")) for key in STATUSKEYS).rstrip(",")
+        params = tuple(sorted((key, str(value)) for key, value in pvdata.items() if key not in STATUSKEYS))
+        with self.lock:
+            if self.pending >= self.maxpending:
+                self.dropped += 1
+                return False
+            batch = self.batches.setdefault((systemid, params), [])
+            batch.append(status)
+            self.pending += 1
+            full = len(batch) >= self.batchsize
+        if full:
+            self.wakeup.set()
+        return True
+
+    def take(self):
+        # remove and return one batch per key: [(key, statuses)]
+        ready = []
+        with self.lock:
+            for key, statuses in list(self.batches.items()):
+                ready.append((key, statuses[:self.batchsize]))
+                del statuses[:self.batchsize]
+                if not statuses: del self.batches[key]
+                self.pending -= len(ready[-1][1])
+        return ready
+
+    def putback(self, key, statuses):
+        # requeue statuses that could not be sent (in front of newer statuses)
+        with self.lock:
+            self.batches[key] = statuses + self.batches.get(key, [])
+            self.pending += len(statuses)
+
+    def run(self):
+        # sender thread: send collected statuses every interval (or when a batch is full)
+        while self.running:
+            self.wakeup.wait(max(self.interval, self.resume - time.time()))
+            self.wakeup.clear()
+            if time.time() < self.resume:
+                continue
+            self.send_all()
+
+    def send_all(self):
+        # send one batch per key, if sending is paused the batches not sent are requeued
+        ready = self.take()
+        for pos, (key, statuses) in enumerate(ready):
+            if not self.send(key, statuses):
+                for key, statuses in ready[pos+1:]:
+                    self.putback(key, statuses)
+                return
+
+    def send(self, key, statuses):
+        # send one batch, returns False if sending has to be paused (statuses are requeued)
+        systemid, params = key
+        headers = {
+            "X-Pvoutput-Apikey" : self.apikey,
+            "X-Pvoutput-SystemId" : systemid,
+            "Content-Type" : "application/x-www-form-urlencoded"
+        }
+        body = urlencode((("data", ";".join(statuses)),) + params)
+        try:
+            status, data = self.http.request("POST", self.path, body, headers)
+        except Exception as e:
+            self.failed += 1
+            self.backoff(key, statuses, "\t - Grott PVOutput send failed: {}".format(e))
+            return False
+        if status in (403, 429):
+            self.refused += 1
+            self.backoff(key, statuses, "\t - Grott PVOutput request refused ({}): {}".format(status, data[:100].decode("utf-8", "replace")))
+            return False
+        self.delay = 0
+        if status != 200:
+            self.failed += 1
+            self.dropped += len(statuses)
+            logger.warning("\t - Grott PVOutput error %s, %s statuses dropped: %s", status, len(statuses), data[:100].decode("utf-8", "replace"))
+            return True
+        self.sent += len(statuses)
+        logger.debug("\t - Grott PVOutput %s statuses sent for systemid %s, response: %s", len(statuses), systemid, data.decode("utf-8", "replace"))
+        return True
+
+    def backoff(self, key, statuses, message):
+        # requeue and pause sending: exponential delay (mindelay, 2*mindelay, .. maxdelay seconds)
+        self.putback(key, statuses)
+        self.delay = min(self.delay * 2, self.maxdelay) if self.delay else self.mindelay
+        self.resume = time.time() + self.delay
+        logger.warning("%s, retry in %s sec", message, self.delay)
+
+    def stats(self):
+        # counters: statuses pending / sent / dropped, failed and refused requests
+        return {
+                    "pending" : self.pending,
+                    "sent" : self.sent,
+                    "dropped" : self.dropped,
+                    "failed" : self.failed,
+                    "refused" : self.refused
+                }
+
+    def stop(self):
+        # stop the sender thread (send pending statuses if sending is not paused)
+        if not self.running:
+            return
+        self.running = False
+        self.wakeup.set()
+        self.sender.join(5)
+        if time.time() >= self.resume:
+            self.send_all()
+        self.http.close()
@@ -2,21 +2,24 @@ import select
 import socket
 import queue
 import textwrap
-import libscrc
 import threading
 import time
 import http.server
 import json, codecs 
-from itertools import cycle
 from io import BytesIO
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs, parse_qsl  
 from collections import defaultdict
 
+import grottcodec
+from grottcodec import validate_record
+import grottlog
+from grottlog import logger, LazyDump
+
 # grottserver.py emulates the server.growatt.com website and is initial developed for debugging and testing grott.
-# Updated: 2023-09-19
+# Updated: 2026-10-18
 # Version:
-verrel = "0.0.14e"
+verrel = "0.0.15"
 
 # Declare Variables (to be moved to config file later)
 serverhost = "0.0.0.0"
@@ -44,63 +47,13 @@ def format_multi_line(prefix, string, size=80):
     return '\n'.join([prefix + line for line in textwrap.wrap(string, size)])
 
 
-# encrypt / decrypt data.
-def decrypt(decdata):
-
-    ndecdata = len(decdata)
-
-    # Create mask and convert to hexadecimal
-    mask = "Growatt"
-    hex_mask = ['{:02x}'.format(ord(x)) for x in mask]
-    nmask = len(hex_mask)
-
-    # start decrypt routine
-    unscrambled = list(decdata[0:8])  # take unscramble header
-
-    for i, j in zip(range(0, ndecdata-8), cycle(range(0, nmask))):
-        unscrambled = unscrambled + [decdata[i+8] ^ int(hex_mask[j], 16)]
-
-    result_string = "".join("{:02x}".format(n) for n in unscrambled)
-
-    print("\t - " + "Grott - data decrypted V2")
-    return result_string
-
-def validate_record(xdata): 
-    # validata data record on length and CRC (for "05" and "06" records)
-    
-    data = bytes.fromhex(xdata)
-    ldata = len(data)
-    len_orgpayload = int.from_bytes(data[4:6],"big")
-    header = "".join("{:02x}".format(n) for n in data[0:8])
-    protocol = header[6:8]
-
-    if protocol in ("05","06"):
-        lcrc = 4
-        crc = int.from_bytes(data[ldata-2:ldata],"big")
-    else: 
-        lcrc = 0
-
-    len_realpayload = (ldata*2 - 12 -lcrc) / 2
-
-    if protocol != "02" :
-                crc_calc = libscrc.modbus(data[0:ldata-2])
-
-    if len_realpayload == len_orgpayload :
-        returncc = 0
-        if protocol != "02" and crc != crc_calc:     
-            returncc = 8    
-    else : 
-        returncc = 8
-
-    return(returncc)
-
 def htmlsendresp(self, responserc, responseheader,  responsetxt) : 
         #send response
         self.send_response(responserc)
         self.send_header('Content-type', responseheader)
         self.end_headers()
         self.wfile.write(responsetxt) 
-        if verbose: print("\t - Grotthttpserver - http response send: ", responserc, responseheader, responsetxt)
+        if verbose: logger.debug("\t - Grotthttpserver - http response send:  %s %s %s", responserc, responseheader, responsetxt)
 
 def createtimecommand(protocol,loggerid,sequenceno) : 
         protocol = protocol
@@ -125,18 +78,16 @@ def createtimecommand(protocol,loggerid,sequenceno) :
         body = header + body 
         body = bytes.fromhex(body)
         if verbose: 
-            print("\t - Grottserver - Time plain body : ")
-            print(format_multi_line("\t\t ",body))
+            logger.debug("\t - Grottserver - Time plain body : ")
+            logger.debug("%s", LazyDump(format_multi_line, "\t\t ", body))
 
         if protocol != "02" :
             #encrypt message 
-            body = decrypt(body) 
-            crc16 = libscrc.modbus(bytes.fromhex(body))
-            body = bytes.fromhex(body) + crc16.to_bytes(2, "big")
+            body = grottcodec.add_crc(grottcodec.encrypt(body))
         
         if verbose:
-            print("\t - Grottserver - Time command created :")
-            print(format_multi_line("\t\t ",body))
+            logger.debug("\t - Grottserver - Time command created :")
+            logger.debug("%s", LazyDump(format_multi_line, "\t\t ", body))
 
         #just to be sure delete register info     
         try: 
@@ -153,7 +104,7 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
     
     def do_GET(self):
         try: 
-            if verbose: print("\t - Grotthttpserver - Get received ")
+            if verbose: logger.debug("\t - Grotthttpserver - Get received ")
             #parse url
             url = urlparse(self.path)
             urlquery = parse_qs(url.query)
@@ -187,25 +138,25 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                 
             elif self.path.startswith("info"):
                     #retrieve grottserver status                 
-                    if verbose: print("\t - Grotthttpserver - Status requested")
+                    if verbose: logger.debug("\t - Grotthttpserver - Status requested")
                     
                     
-                    print("\t - Grottserver #active threads count: ", threading.active_count())
+                    logger.info("\t - Grottserver #active threads count:  %s", threading.active_count())
                     activethreads = threading.enumerate()
                     for idx, item in enumerate(activethreads):
-                        print("\t - ", item)
+                        logger.info("\t -  %s", item)
                     
                     try: 
                         import os, psutil
                         #print(os.getpid())
-                        print("\t - Grottserver memory in use : ", psutil.Process(os.getpid()).memory_info().rss/1024**2)   
+                        logger.info("\t - Grottserver memory in use :  %s", psutil.Process(os.getpid()).memory_info().rss/1024**2)   
                     
                     except: 
-                        print("\t - Grottserver PSUTIL not available no process information can be printed")
+                        logger.info("\t - Grottserver PSUTIL not available no process information can be printed")
 
                     #retrieve grottserver status               
-                    print("\t - Grottserver connection queue : ")
-                    print("\t - ", list(send_queuereg.keys()))
+                    logger.info("\t - Grottserver connection queue : ")
+                    logger.info("\t -  %s", list(send_queuereg.keys()))
                     #responsetxt = json.dumps(list(send_queuereg.keys())).encode('utf-8') 
                     responsetxt = b"<h2>Grottserver info generated, see log for details</h2>" 
                     responserc = 200 
@@ -215,10 +166,10 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
 
             elif self.path.startswith("datalogger") or self.path.startswith("inverter") :
                 if self.path.startswith("datalogger"):
-                    if verbose: print("\t - " + "Grotthttpserver - datalogger get received : ", urlquery)     
+                    if verbose: logger.debug("\t - Grotthttpserver - datalogger get received :  %s", urlquery)     
                     sendcommand = "19"
                 else:
-                    if verbose: print("\t - " + "Grotthttpserver - inverter get received : ", urlquery)     
+                    if verbose: logger.debug("\t - Grotthttpserver - inverter get received :  %s", urlquery)     
                     sendcommand = "05"        
                 
                 #validcommand = False
@@ -237,7 +188,7 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                         command = urlquery["command"][0] 
                         #print(command)
                         if command in ("register", "regall") :
-                            if verbose: print("\t - " + "Grotthttpserver: get command: ", command)     
+                            if verbose: logger.debug("\t - Grotthttpserver: get command:  %s", command)     
                         else :
                             #no valid command entered
                             responsetxt = b'no valid command entered'
@@ -353,26 +304,24 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                 # test if it is inverter command and set 
                 if sendcommand == "05":
                     deviceid = (loggerreg[dataloggerid][inverterid]["inverterno"])
-                    print("\t - Grotthttpserver: selected deviceid :", deviceid)
+                    logger.info("\t - Grotthttpserver: selected deviceid : %s", deviceid)
 
                 header = "{:04x}".format(sendseq) + "00" + loggerreg[dataloggerid]["protocol"] + "{:04x}".format(bodylen) + deviceid + sendcommand
                 body = header + body 
                 body = bytes.fromhex(body)
 
                 if verbose:
-                    print("\t - Grotthttpserver - unencrypted get command:")
-                    print(format_multi_line("\t\t ",body))
+                    logger.debug("\t - Grotthttpserver - unencrypted get command:")
+                    logger.debug("%s", LazyDump(format_multi_line, "\t\t ", body))
 
                 if loggerreg[dataloggerid]["protocol"] != "02" :
                     #encrypt message 
-                    body = decrypt(body) 
-                    crc16 = libscrc.modbus(bytes.fromhex(body))
-                    body = bytes.fromhex(body) + crc16.to_bytes(2, "big")
+                    body = grottcodec.add_crc(grottcodec.encrypt(body))
 
                 # add header
                 if verbose:
-                    print("\t - Grotthttpserver: Get command created :")
-                    print(format_multi_line("\t\t ",body))
+                    logger.debug("\t - Grotthttpserver: Get command created :")
+                    logger.debug("%s", LazyDump(format_multi_line, "\t\t ", body))
 
                 # queue command 
                 qname = loggerreg[dataloggerid]["ip"] + "_" + str(loggerreg[dataloggerid]["port"])
@@ -395,7 +344,7 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                     #if verbose: print("\t - Grotthttpserver - wait Cycles:", wait )
 
                 for x in range(wait):
-                    if verbose: print("\t - Grotthttpserver - wait for GET response")
+                    if verbose: logger.debug("\t - Grotthttpserver - wait for GET response")
                     try: 
                         comresp = commandresponse[sendcommand][regkey]
                         
@@ -435,7 +384,7 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                 responsetxt = b'OK'
                 responserc = 200 
                 responseheader = "text/body"
-                if verbose: print("\t - " + "Grott: datalogger command response :", responserc, responsetxt, responseheader)     
+                if verbose: logger.debug("\t - Grott: datalogger command response : %s %s %s", responserc, responsetxt, responseheader)     
                 htmlsendresp(self,responserc,responseheader,responsetxt)
                 return
 
@@ -449,7 +398,7 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                 self.send_error(400, "Bad request")
         
         except Exception as e:
-            print("\t - Grottserver - exception in httpserver thread - get occured : ", e)    
+            logger.error("\t - Grottserver - exception in httpserver thread - get occured :  %s", e)    
 
     def do_PUT(self):
         try: 
@@ -464,10 +413,10 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
             
             if self.path.startswith("datalogger") or self.path.startswith("inverter") :
                 if self.path.startswith("datalogger"):
-                    if verbose: print("\t - Grotthttpserver - datalogger PUT received : ", urlquery)     
+                    if verbose: logger.debug("\t - Grotthttpserver - datalogger PUT received :  %s", urlquery)     
                     sendcommand = "18"
                 else:
-                    if verbose: print("\t - Grotthttpserver - inverter PUT received : ", urlquery)     
+                    if verbose: logger.debug("\t - Grotthttpserver - inverter PUT received :  %s", urlquery)     
                     # Must be an inverter. Use 06 for now. May change to 10 later.
                     sendcommand = "06"        
                 
@@ -485,7 +434,7 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                         #is valid command specified? 
                         command = urlquery["command"][0] 
                         if command in ("register", "multiregister", "datetime") :
-                            if verbose: print("\t - Grotthttpserver - PUT command: ", command)     
+                            if verbose: logger.debug("\t - Grotthttpserver - PUT command:  %s", command)     
                         else :
                             responsetxt = b'no valid command entered'
                             responserc = 400 
@@ -706,7 +655,7 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                 # test if it is inverter command and set deviceid
                 if sendcommand in ("06","10") :
                     deviceid = (loggerreg[dataloggerid][inverterid]["inverterno"])
-                print("\t - Grotthttpserver: selected deviceid :", deviceid)
+                logger.info("\t - Grotthttpserver: selected deviceid : %s", deviceid)
 
                 #create header
                 header = "{:04x}".format(sendseq) + "00" + loggerreg[dataloggerid]["protocol"] + "{:04x}".format(bodylen) + deviceid + sendcommand
@@ -714,14 +663,12 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                 body = bytes.fromhex(body)
 
                 if verbose:
-                    print("\t - Grotthttpserver - unencrypted put command:")
-                    print(format_multi_line("\t\t ",body))
+                    logger.debug("\t - Grotthttpserver - unencrypted put command:")
+                    logger.debug("%s", LazyDump(format_multi_line, "\t\t ", body))
                 
                 if loggerreg[dataloggerid]["protocol"] != "02" :
                     #encrypt message 
-                    body = decrypt(body) 
-                    crc16 = libscrc.modbus(bytes.fromhex(body))
-                    body = bytes.fromhex(body) + crc16.to_bytes(2, "big")
+                    body = grottcodec.add_crc(grottcodec.encrypt(body))
 
                 # queue command 
                 qname = loggerreg[dataloggerid]["ip"] + "_" + str(loggerreg[dataloggerid]["port"])
@@ -751,14 +698,14 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                    #if verbose: print("\t - Grotthttpserver - wait Cycles:", wait )
 
                 for x in range(wait):
-                    if verbose: print("\t - Grotthttpserver - wait for PUT response")
+                    if verbose: logger.debug("\t - Grotthttpserver - wait for PUT response")
                     try: 
                         #read response: be aware a 18 command give 19 response, 06 send command gives 06 response in differnt format! 
                         if sendcommand == "18" :
                             comresp = commandresponse["18"][regkey]
                         else: 
                             comresp = commandresponse[sendcommand][regkey]
-                        if verbose: print("\t - " + "Grotthttperver - Commandresponse ", responseno, register, commandresponse[sendcommand][regkey]) 
+                        if verbose: logger.debug("\t - Grotthttperver - Commandresponse  %s %s %s", responseno, register, commandresponse[sendcommand][regkey]) 
                         break
                     except: 
                         #wait for second and try again
@@ -783,12 +730,12 @@ class GrottHttpRequestHandler(http.server.BaseHTTPRequestHandler):
                 responsetxt = b'OK'
                 responserc = 200 
                 responseheader = "text/body"
-                if verbose: print("\t - " + "Grott: datalogger command response :", responserc, responsetxt, responseheader)     
+                if verbose: logger.debug("\t - Grott: datalogger command response : %s %s %s", responserc, responsetxt, responseheader)     
                 htmlsendresp(self,responserc,responseheader,responsetxt)
                 return
 
         except Exception as e:
-            print("\t - Grottserver - exception in httpserver thread - put occured : ", e)    
+            logger.error("\t - Grottserver - exception in httpserver thread - put occured :  %s", e)    
         
 
 class GrottHttpServer:
@@ -801,13 +748,13 @@ class GrottHttpServer:
 
         self.server = http.server.HTTPServer((httphost, httpport), handler_factory)
         self.server.allow_reuse_address = True
-        print(f"\t - GrottHttpserver - Ready to listen at: {httphost}:{httpport}")
+        logger.info("\t - GrottHttpserver - Ready to listen at: %s:%s", httphost, httpport)
 
     def run(self):
-        print("\t - GrottHttpserver - server listening")
-        print("\t - GrottHttpserver - Response interval wait time: ", ResponseWaitInterval)
-        print("\t - GrottHttpserver - Datalogger ResponseWait: ", MaxDataloggerResponseWait)
-        print("\t - GrottHttpserver - Inverter ResponseWait: ", MaxInverterResponseWait)
+        logger.info("\t - GrottHttpserver - server listening")
+        logger.info("\t - GrottHttpserver - Response interval wait time:  %s", ResponseWaitInterval)
+        logger.info("\t - GrottHttpserver - Datalogger ResponseWait:  %s", MaxDataloggerResponseWait)
+        logger.info("\t - GrottHttpserver - Inverter ResponseWait:  %s", MaxInverterResponseWait)
         self.server.serve_forever()
 
 
@@ -821,12 +768,13 @@ class sendrecvserver:
 
         self.inputs = [self.server]
         self.outputs = []
+        self.framers = {}                                       #socket : grottcodec.FrameReader (records can be split or coalesced)
         self.send_queuereg = send_queuereg
         
-        print(f"\t - Grottserver - Ready to listen at: {host}:{port}")
+        logger.info("\t - Grottserver - Ready to listen at: %s:%s", host, port)
 
     def run(self):
-        print("\t - Grottserver - server listening")
+        logger.info("\t - Grottserver - server listening")
         while self.inputs:
             readable, writable, exceptional = select.select(
                 self.inputs, self.outputs, self.inputs)
@@ -844,13 +792,14 @@ class sendrecvserver:
         try:
             if s is self.server:
                 self.handle_new_connection(s)
-                if verbose: print("\t - " + "Grottserver - input received: ", self.server)
+                if verbose: logger.debug("\t - Grottserver - input received:  %s", self.server)
             else:
                 # Existing connection
                 try:
-                    data = s.recv(1024)
+                    data = s.recv(4096)
                     if data:
-                        self.process_data(s, data)
+                        for record in self.framers[s].feed(data):
+                            self.process_data(s, record)
                     else:
                         # Empty read means connection is closed, perform cleanup
                         self.close_connection(s)
@@ -859,7 +808,7 @@ class sendrecvserver:
                     self.close_connection(s) 
             
         except Exception as e:
-            print("\t - Grottserver - exception in server thread - handle_readable_socket : ", e)
+            logger.error("\t - Grottserver - exception in server thread - handle_readable_socket :  %s", e)
             #print("\t - socket: ",s)    
 
 
@@ -869,13 +818,13 @@ class sendrecvserver:
             time.sleep(0.1)
             
             if s.fileno() == -1 : 
-                print("\t - Grottserver - socket closed")
+                logger.info("\t - Grottserver - socket closed")
                 return
             try: 
                 #try for debug 007
                 client_address, client_port = s.getpeername()
             except: 
-                print("\t - Grottserver - socket closed :")
+                logger.info("\t - Grottserver - socket closed :")
                 #print("\t\t ", s )
                 #s.close
                 pass
@@ -884,21 +833,21 @@ class sendrecvserver:
                 qname = client_address + "_" + str(client_port)
                 next_msg = self.send_queuereg[qname].get_nowait()
                 if verbose:
-                    print("\t - " + "Grottserver - get response from queue: ", qname + " msg: ")
-                    print(format_multi_line("\t\t ",next_msg))
+                    logger.debug("\t - Grottserver - get response from queue:  %s msg: ", qname)
+                    logger.debug("%s", LazyDump(format_multi_line, "\t\t ", next_msg))
                 s.send(next_msg)
                 
             except queue.Empty:
                 pass
 
         except Exception as e:
-            print("\t - Grottserver - exception in server thread - handle_writable_socket : ", e)
+            logger.error("\t - Grottserver - exception in server thread - handle_writable_socket :  %s", e)
             #print("\t\t ", s)
             #self.close_connection(s)
             #print(s)
 
     def handle_exceptional_socket(self, s):
-        if verbose: print("\t - " + "Grottserver - Encountered an exception")
+        if verbose: logger.debug("\t - Grottserver - Encountered an exception")
         self.close_connection(s)
 
     def handle_new_connection(self, s):
@@ -907,27 +856,29 @@ class sendrecvserver:
             connection.setblocking(0)
             self.inputs.append(connection)
             self.outputs.append(connection)
-            print(f"\t - Grottserver - Socket connection received from {client_address}")
+            self.framers[connection] = grottcodec.FrameReader()
+            logger.info("\t - Grottserver - Socket connection received from %s", client_address)
             client_address, client_port = connection.getpeername()
             qname = client_address + "_" + str(client_port)
 
             #create queue
             send_queuereg[qname] = queue.Queue()
             #print(send_queuereg)
-            if verbose: print(f"\t - Grottserver - Send queue created for : {qname}")
+            if verbose: logger.debug("\t - Grottserver - Send queue created for : %s", qname)
         except Exception as e:
-            print("\t - Grottserver - exception in server thread - handle_new_connection : ", e) 
+            logger.error("\t - Grottserver - exception in server thread - handle_new_connection :  %s", e) 
             #self.close_connection(s)   
 
 
     def close_connection(self, s):
         try: 
             #client_address, client_port = s.getpeername() 
-            print("\t - Grottserver - Close connection : ", s)
+            logger.info("\t - Grottserver - Close connection :  %s", s)
             #print(client_address, client_port)
             if s in self.outputs:
                 self.outputs.remove(s)
             self.inputs.remove(s)
+            self.framers.pop(s, None)
             client_address, client_port = s.getpeername() 
             qname = client_address + "_" + str(client_port)
             del send_queuereg[qname]
@@ -937,13 +888,13 @@ class sendrecvserver:
                 #print(key, loggerreg[key]["ip"], loggerreg[key]["port"])
                 if loggerreg[key]["ip"] == client_address and loggerreg[key]["port"] == client_port :
                     del loggerreg[key] 
-                    print("\t - Grottserver - config information deleted for datalogger and connected inverters : ", key)
+                    logger.info("\t - Grottserver - config information deleted for datalogger and connected inverters :  %s", key)
                     # to be developed delete also register information for this datalogger (and  connected inverters).  Be aware this need redef of commandresp!
                     break     
             s.close()
         
         except Exception as e:
-            print("\t - Grottserver - exception in server thread - close connection :", e)   
+            logger.error("\t - Grottserver - exception in server thread - close connection : %s", e)   
             #print("\t\t ", s )  
 
             # try: 
@@ -954,7 +905,7 @@ class sendrecvserver:
     def check_connections(self):
         #""" Check if the client(s) are/is still connected """
         for i, connection in enumerate(self.all_connections):
-            print(self.all_connections)
+            logger.debug("%s", self.all_connections)
             try:
                 connection.send(b'PING')
                 data = connection.recv(1024)
@@ -978,36 +929,35 @@ class sendrecvserver:
             response = None
 
             # Display data
-            print(f"\t - Grottserver - Data received from : {client_address}:{client_port}")
+            logger.debug("\t - Grottserver - Data received from : %s:%s", client_address, client_port)
             if verbose:
-                print("\t - " + "Grottserver - Original Data:")
-                print(format_multi_line("\t\t ", data))
+                logger.debug("\t - Grottserver - Original Data:")
+                logger.debug("%s", LazyDump(format_multi_line, "\t\t ", data))
             
             #validate data (Length + CRC for 05/06)
-            #join gebeurt nu meerdere keren! Stroomlijnen!!!! 
-            vdata = "".join("{:02x}".format(n) for n in data)
-            #validatecc = validate_record(vdata)
+            #validatecc = validate_record(data)
             validatecc = 0
             if validatecc != 0 : 
-                print(f"\t - Grottserver - Invalid data record received, processing stopped for this record")
+                logger.warning("\t - Grottserver - Invalid data record received, processing stopped for this record")
                 #Create response if needed? 
                 #self.send_queuereg[qname].put(response)
                 return  
 
             # Create header
-            header = "".join("{:02x}".format(n) for n in data[0:8])
+            header = data[0:8].hex()
             protocol = header[6:8]
             sequencenumber = header[0:4]
             protocol = header[6:8]
             #command = header[14:16]
             rectype = header[14:16]
             if protocol in ("05","06") :
-                result_string = decrypt(data) 
+                plaindata = grottcodec.decrypt(data) 
             else :         
-                result_string = "".join("{:02x}".format(n) for n in data)
+                plaindata = data
+            result_string = plaindata.hex()
             if verbose:
-                print("\t - Grottserver - Plain record: ")
-                print(format_multi_line("\t\t ", result_string))
+                logger.debug("\t - Grottserver - Plain record: ")
+                logger.debug("%s", LazyDump(format_multi_line, "\t\t ", result_string))
             loggerid = result_string[16:36]
             loggerid = codecs.decode(loggerid, "hex").decode('utf-8') 
 
@@ -1016,8 +966,8 @@ class sendrecvserver:
                 # if ping send data as reply
                 response = data
                 if verbose:
-                    print("\t - Grottserver - 16 - Ping response: ")
-                    print(format_multi_line("\t\t ", response))
+                    logger.debug("\t - Grottserver - 16 - Ping response: ")
+                    logger.debug("%s", LazyDump(format_multi_line, "\t\t ", response))
                 
                     #v0.0.14a: create temporary also logger record at ping (to support shinelink without inverters)
 
@@ -1025,13 +975,13 @@ class sendrecvserver:
                     loggerreg[loggerid].update({"ip" : client_address, "port" : client_port, "protocol" : header[6:8]})
                 except: 
                     loggerreg[loggerid] = {"ip" : client_address, "port" : client_port, "protocol" : header[6:8]}
-                    print("\t - Grottserver - Datalogger id added by Ping: ", loggerreg[loggerid] ) 
+                    logger.info("\t - Grottserver - Datalogger id added by Ping:  %s", loggerreg[loggerid]) 
             
 
             #v0.0.14: remove "29" (no response will be sent for this record!)          
             elif rectype in ("03", "04", "50", "1b", "20"):
                 # if datarecord send ack.
-                print("\t - Grottserver - " + header[12:16] + " data record received")
+                logger.debug("\t - Grottserver - %s data record received", header[12:16])
                 
                 # create ack response
                 if header[6:8] == '02': 
@@ -1041,22 +991,16 @@ class sendrecvserver:
                     # protocol 05/06, encrypted ack
                     headerackx = bytes.fromhex(header[0:8] + '0003' + header[12:16] + '47')
                     # Create CRC 16 Modbus
-                    crc16 = libscrc.modbus(headerackx)
+                    crc16 = grottcodec.modbus_crc(headerackx)
                     # create response
                     response = headerackx + crc16.to_bytes(2, "big")
                 if verbose:
-                    print("\t - Grottserver - Response: ")
-                    print(format_multi_line("\t\t", response))
+                    logger.debug("\t - Grottserver - Response: ")
+                    logger.debug("%s", LazyDump(format_multi_line, "\t\t", response))
 
                 if rectype in ("03") : 
                 # init record register logger/inverter id (including sessionid?)
-                # decrypt body. 
-                    if header[6:8] in ("05","06") :
-                        #print("header1 : ", header[6:8])
-                        result_string = decrypt(data) 
-                    else :         
-                        result_string = data.hex()   
-            
+                # body already decrypted (result_string) 
                     loggerid = result_string[16:36]
                     loggerid = codecs.decode(loggerid, "hex").decode('utf-8')
                     if header[6:8] in ("02","05") :                    
@@ -1078,10 +1022,10 @@ class sendrecvserver:
                     time.sleep(1)
                     # Create time command en put on queue
                     response = createtimecommand(protocol,loggerid,"0001")
-                    if verbose: print("\t - Grottserver 03 announce data record processed") 
+                    if verbose: logger.debug("\t - Grottserver 03 announce data record processed") 
 
             elif rectype in ("19","05","06","18"):
-                if verbose: print("\t - Grottserver - " + header[12:16] + " Command Response record received, no response needed")
+                if verbose: logger.debug("\t - Grottserver - %s Command Response record received, no response needed", header[12:16])
                 
                 offset = 0
                 if protocol in ("06") : 
@@ -1094,7 +1038,7 @@ class sendrecvserver:
                     #print("length resultstring:", len(result_string))
                     #print("result starts on:", 48+offset) 
                     if len(result_string) == 48+offset :
-                        if verbose: print("\t - Grottserver - empty register get response recieved, response ignored")  
+                        if verbose: logger.debug("\t - Grottserver - empty register get response recieved, response ignored")  
                     else: 
                         value = result_string[44+offset:48+offset]
                 elif rectype == "06" : 
@@ -1124,7 +1068,7 @@ class sendrecvserver:
                 response = None
 
             elif rectype in ("10") :
-                if verbose: print("\t - Grottserver - " + header[12:16] + " record received, no response needed")
+                if verbose: logger.debug("\t - Grottserver - %s record received, no response needed", header[12:16])
 
                 startregister = int(result_string[76:80],16)
                 endregister = int(result_string[80:84],16)
@@ -1136,7 +1080,7 @@ class sendrecvserver:
                 response = None
             
             elif rectype in ("29") :
-                if verbose: print("\t - Grottserver - " + header[12:16] + " record received, no response needed")
+                if verbose: logger.debug("\t - Grottserver - %s record received, no response needed", header[12:16])
                 response = None
 
             #elif rectype in ("99") :
@@ -1147,23 +1091,24 @@ class sendrecvserver:
             #    response = None
 
             else:
-                if verbose: print("\t - Grottserver - Unknown record received:")
+                if verbose: logger.debug("\t - Grottserver - Unknown record received:")
                     
                 response = None
 
             if response is not None:
                 #qname = client_address + "_" + str(client_port)
                 if verbose:
-                    print("\t - Grottserver - Put response on queue: ", qname, " msg: ")
-                    print(format_multi_line("\t\t ", response))
+                    logger.debug("\t - Grottserver - Put response on queue:  %s  msg: ", qname)
+                    logger.debug("%s", LazyDump(format_multi_line, "\t\t ", response))
                 self.send_queuereg[qname].put(response) 
         except Exception as e:
-            print("\t - Grottserver - exception in main server thread occured : ", e)        
+            logger.error("\t - Grottserver - exception in main server thread occured :  %s", e)        
 
 
 if __name__ == "__main__":
 
-    print("\t - Grottserver - Version: " + verrel)
+    grottlog.setup(verbose=verbose)
+    logger.info("\t - Grottserver - Version: %s", verrel)
 
     send_queuereg = {} 
     loggerreg = {}
@@ -0,0 +1,198 @@
+# grottsink.py output (sink) dispatcher
+# Every output (MQTT, PVOutput, InfluxDB, extension) gets its own bounded queue and worker thread, so a slow output
+# never delays record processing or the other outputs. If a queue is full the overflow policy of the sink is applied:
+# dropoldest (default), dropnewest or block (wait for free space = back pressure on record processing).
+# A sink can have a timeout (extensions): a call that takes longer is counted and abandoned, the worker continues.
+# A batch sink (batch > 1) gets all waiting items (max batch) in one call: func([args, ...]).
+# A sink can have more worker threads (workers > 1, e.g. the proxy decode pool), items are then processed in parallel.
+# onstop() is called when the sink is stopped, after the queued items are processed (e.g. extension stop).
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import time
+import queue
+import atexit
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from grottlog import logger
+
+POLICIES = ("dropoldest", "dropnewest", "block")
+
+class SinkTimeout(Exception):
+    # sink call took longer than the sink timeout (not raised for timeouts of the output itself, e.g. a socket timeout)
+    pass
+
+class SinkWorker:
+
+    def __init__(self, name, func, queuesize=1000, policy="dropoldest", timeout=None, batch=0, workers=1, onstop=None):
+        # func(*args) is called in a worker thread for every queued item, max timeout seconds (None = no timeout)
+        if policy not in POLICIES:
+            raise ValueError("invalid overflow policy {} for {}, use {}".format(policy, name, ", ".join(POLICIES)))
+        if batch > 1 and workers > 1:
+            raise ValueError("batch sink {} can only have one worker".format(name))
+        self.name = name
+        self.func = func
+        self.policy = policy
+        self.queue = queue.Queue(queuesize)
+        self.timeout = timeout
+        self.batch = batch
+        self.onstop = onstop
+        self.local = threading.local()                              #timeout executor per worker thread
+        self.lock = threading.Lock()                                #counters (put and workers run in different threads)
+        self.running = True
+
+        #counters
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+        self.latency_total = 0.0
+
+        self.workers = [threading.Thread(target=self.run, name="grottsink-" + name, daemon=True) for _ in range(max(1, workers))]
+        for worker in self.workers:
+            worker.start()
+
+    def put(self, *args):
+        # queue item, returns False if the item is dropped
+        item = (time.monotonic(), args)
+        if self.policy == "block":
+            self.queue.put(item)
+            self.count("enqueued")
+            return True
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.count("dropped")
+            if self.policy == "dropnewest":
+                logger.debug("\t - Grott %s queue full, record dropped", self.name)
+                return False
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            logger.debug("\t - Grott %s queue full, oldest record dropped", self.name)
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.count("dropped")
+                return False
+        self.count("enqueued")
+        return True
+
+    def count(self, counter, n=1):
+        # add n to counter
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def run(self):
+        # worker thread: process queued items in order
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            if item is None:
+                break
+            queued, args = item
+            count = 1
+            if self.batch > 1:
+                #batch sink: add the other waiting items
+                batch = [args]
+                while len(batch) < self.batch:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item[1])
+                args = (batch,)
+                count = len(batch)
+            try:
+                self.call(args)
+            except SinkTimeout:
+                self.count("timeouts", count)
+                logger.warning("\t - Grott %s output timeout (%s sec), call abandoned", self.name, self.timeout)
+                continue
+            except Exception as e:
+                self.count("failed", count)
+                logger.error("\t - Grott %s output error: %s", self.name, repr(e))
+                if logger.isEnabledFor(logging.DEBUG): logger.debug("\t - %s", traceback.format_exc())
+                continue
+            latency = time.monotonic() - queued
+            with self.lock:
+                self.sent += count
+                self.latency_last = latency
+                self.latency_total += latency * count
+                if latency > self.latency_max: self.latency_max = latency
+
+    def call(self, args):
+        # call func, with timeout: in an executor thread (a timed out call keeps its thread, a new executor is used)
+        if not self.timeout:
+            return self.func(*args)
+        executor = getattr(self.local, "executor", None)
+        if executor is None:
+            executor = self.local.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grottsink-" + self.name)
+        future = executor.submit(self.func, *args)
+        # only the wait is limited by the timeout, errors of func (also TimeoutError) are raised by future.result()
+        if not wait([future], self.timeout).done:
+            executor.shutdown(wait=False)
+            self.local.executor = None
+            raise SinkTimeout(self.name)
+        return future.result()
+
+    def stats(self):
+        # queue depth and counters (latency in ms: queued until processed)
+        return {
+                    "queue" : self.queue.qsize(),
+                    "enqueued" : self.enqueued,
+                    "sent" : self.sent,
+                    "dropped" : self.dropped,
+                    "failed" : self.failed,
+                    "timeouts" : self.timeouts,
+                    "latency_last" : round(self.latency_last * 1000, 1),
+                    "latency_max" : round(self.latency_max * 1000, 1),
+                    "latency_avg" : round(self.latency_total / self.sent * 1000, 1) if self.sent else 0.0
+                }
+
+    def stop(self, timeout=5):
+        # process queued items (wait max timeout seconds) and stop the worker
+        if not self.running:
+            return
+        self.running = False
+        for worker in self.workers:
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        for worker in self.workers:
+            worker.join(timeout)
+        if self.onstop is not None:
+            self.onstop()
+
+class Dispatcher:
+
+    def __init__(self):
+        self.sinks = {}
+        atexit.register(self.stop)
+
+    def add(self, name, func, queuesize=1000, policy="dropoldest", timeout=None, batch=0, workers=1, onstop=None):
+        self.sinks[name] = SinkWorker(name, func, queuesize, policy, timeout, batch, workers, onstop)
+
+    def put(self, name, *args):
+        # queue item for sink name (no action if the sink is not defined = output disabled)
+        sink = self.sinks.get(name)
+        if sink is not None:
+            sink.put(*args)
+
+    def stats(self):
+        return {name: sink.stats() for name, sink in self.sinks.items()}
+
+    def stop(self):
+        for sink in self.sinks.values():
+            sink.stop()
@@ -8,14 +8,51 @@ import struct
 #import time, json, datetime, codecs
 
 from grottdata import procdata
+from grottlog import logger, TRACE
+import grottcodec
+
+# max tracked TCP connections (flows), the oldest flow is removed
+maxflows = 1024
 
 class Sniff:
     def __init__(self,conf):
         self.conn = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(3))
         # if conf.verbose: print("\nGrott monitoring started\n")
         if conf.verbose: 
-            print("")
-            print("\nGrott sniff mode started\n")
+            logger.debug("")
+            logger.debug("\nGrott sniff mode started\n")
+        #(source ip, source port) : [next TCP sequence number, grottcodec.FrameReader], records can be split over segments
+        self.flows = {}
+
+    def reassemble(self, conf):
+        # add TCP segment data to the flow, returns the complete records
+        key = (self.ipv4.src, self.tcp.src_port)
+        if self.tcp.flag_rst or self.tcp.flag_fin:
+            flow = self.flows.pop(key, None)
+            if flow is None or not self.tcp.data:
+                return []
+        else:
+            flow = self.flows.get(key)
+        data = self.tcp.data
+        if flow is None or self.tcp.flag_syn:
+            if len(self.flows) >= maxflows:
+                del self.flows[next(iter(self.flows))]
+            flow = self.flows[key] = [(self.tcp.sequence + self.tcp.flag_syn) & 0xffffffff, grottcodec.FrameReader()]
+        start = self.tcp.sequence
+        diff = (start - flow[0]) & 0xffffffff
+        if diff >= 0x80000000:
+            #retransmission: skip data already received
+            overlap = 0x100000000 - diff
+            if overlap >= len(data):
+                return []
+            data = data[overlap:]
+            start = flow[0]
+        elif diff:
+            #segment(s) missed: drop the incomplete record
+            if conf.verbose: logger.debug("\t - TCP segment missed, incomplete record dropped")
+            flow[1] = grottcodec.FrameReader()
+        flow[0] = (start + len(data)) & 0xffffffff
+        return flow[1].feed(data)
 
 
     def main(self,conf):        
@@ -23,50 +60,51 @@ class Sniff:
             self.raw_data, self.addr = self.conn.recvfrom(65535)
             self.eth = Ethernet(self.raw_data)
             if conf.trace:     
-                print("\n" + "\t - " + 'Ethernet Frame:')
-                print("\t - " + 'Destination: {}, Source: {}, Protocol: {}'.format(self.eth.dest_mac, self.eth.src_mac, self.eth.proto))    
+                logger.log(TRACE, "\n\t - Ethernet Frame:")
+                logger.log(TRACE, "\t - Destination: %s, Source: %s, Protocol: %s", self.eth.dest_mac, self.eth.src_mac, self.eth.proto)    
             # IPv4
             if self.eth.proto == 8:
                 self.ipv4 = IPv4(self.eth.data)
                 if conf.trace:     
-                    print("\t - " + 'IPv4 Packet protocol 8 :')
-                    print("\t\t - " + 'Version: {}, Header Length: {}, TTL: {},'.format(self.ipv4.version, self.ipv4.header_length, self.ipv4.ttl))
-                    print("\t\t - " + 'Protocol: {}, Source: {}, Target: {}'.format(self.ipv4.proto, self.ipv4.src, self.ipv4.target))
+                    logger.log(TRACE, "\t - IPv4 Packet protocol 8 :")
+                    logger.log(TRACE, "\t\t - Version: %s, Header Length: %s, TTL: %s,", self.ipv4.version, self.ipv4.header_length, self.ipv4.ttl)
+                    logger.log(TRACE, "\t\t - Protocol: %s, Source: %s, Target: %s", self.ipv4.proto, self.ipv4.src, self.ipv4.target)
 
 # TCP
                 #elif self.ipv4.proto == 6:
                 if self.ipv4.proto == 6:
                     self.tcp = TCP(self.ipv4.data)
                     if conf.trace:
-                            print("\t - " + 'TCP Segment protocol 6 found')
-                            print("\t\t - " + 'Source Port: {}, Destination Port: {}'.format(self.tcp.src_port, self.tcp.dest_port))
-                            print("\t\t - " + 'Source IP: {}, Destination IP: {}'.format(self.ipv4.src, self.ipv4.target))
+                            logger.log(TRACE, "\t - TCP Segment protocol 6 found")
+                            logger.log(TRACE, "\t\t - Source Port: %s, Destination Port: %s", self.tcp.src_port, self.tcp.dest_port)
+                            logger.log(TRACE, "\t\t - Source IP: %s, Destination IP: %s", self.ipv4.src, self.ipv4.target)
                             
                     if self.tcp.dest_port == conf.growattport and self.ipv4.target == conf.growattip:
                         if conf.verbose:
-                            print("\t - "+ 'TCP Segment Growatt:')
-                            print("\t\t - " + 'Source Port: {}, Destination Port: {}'.format(self.tcp.src_port, self.tcp.dest_port))
-                            print("\t\t - " + 'Source IP: {}, Destination IP: {}'.format(self.ipv4.src, self.ipv4.target))
-                            print("\t\t - " + 'Sequence: {}, Acknowledgment: {}'.format(self.tcp.sequence, self.tcp.acknowledgment))
-                            print("\t\t - " + 'Flags:')
-                            print("\t\t\t - " + 'URG: {}, ACK: {}, PSH: {}'.format(self.tcp.flag_urg, self.tcp.flag_ack, self.tcp.flag_psh))
-                            print("\t\t\t - " + 'RST: {}, SYN: {}, FIN:{}'.format(self.tcp.flag_rst, self.tcp.flag_syn, self.tcp.flag_fin))
-
-                        if len(self.tcp.data) > conf.minrecl :
-                            procdata(conf,self.tcp.data)    
-                        else:     
-                            if conf.verbose: print("\t - " + 'Data less then minimum record length, data not processed') 
+                            logger.debug("\t - TCP Segment Growatt:")
+                            logger.debug("\t\t - Source Port: %s, Destination Port: %s", self.tcp.src_port, self.tcp.dest_port)
+                            logger.debug("\t\t - Source IP: %s, Destination IP: %s", self.ipv4.src, self.ipv4.target)
+                            logger.debug("\t\t - Sequence: %s, Acknowledgment: %s", self.tcp.sequence, self.tcp.acknowledgment)
+                            logger.debug("\t\t - Flags:")
+                            logger.debug("\t\t\t - URG: %s, ACK: %s, PSH: %s", self.tcp.flag_urg, self.tcp.flag_ack, self.tcp.flag_psh)
+                            logger.debug("\t\t\t - RST: %s, SYN: %s, FIN:%s", self.tcp.flag_rst, self.tcp.flag_syn, self.tcp.flag_fin)
+
+                        for record in self.reassemble(conf):
+                            if len(record) > conf.minrecl :
+                                procdata(conf,record)    
+                            else:     
+                                if conf.verbose: logger.debug("\t - Data less then minimum record length, data not processed") 
                             
                         
     # Other IPv4 Not used 
                 else:
                     if conf.trace:
-                        print("\t - " + 'Other IPv4 Data')
+                        logger.log(TRACE, "\t - Other IPv4 Data")
                         #print(format_multi_line(DATA_TAB_2, self.ipv4.data))
 
             else: 
                 if conf.trace: 
-                    print("\t - " + 'No IPV4 Ethernet Data')
+                    logger.log(TRACE, "\t - No IPV4 Ethernet Data")
                     #print(TAB_1 + format_multi_line(DATA_TAB_1, self.eth.data))
 
 # Returns MAC as string from bytes (ie AA:BB:CC:DD:EE:FF)
@@ -93,10 +131,11 @@ class IPv4:
         version_header_length = raw_data[0]
         self.version = version_header_length >> 4
         self.header_length = (version_header_length & 15) * 4
-        self.ttl, self.proto, src, target = struct.unpack('! 8x B B 2x 4s 4s', raw_data[:20])
+        total_length, self.ttl, self.proto, src, target = struct.unpack('! 2x H 4x B B 2x 4s 4s', raw_data[:20])
         self.src = self.ipv4addr(src)
         self.target = self.ipv4addr(target)
-        self.data = raw_data[self.header_length:]
+        #total length: without ethernet padding
+        self.data = raw_data[self.header_length:total_length or None]
 
 # Returns properly formatted IPv4 address
     def ipv4addr(self, addr):
@@ -0,0 +1,240 @@
+# grottspool.py disk backed spool for output messages
+# Messages that can not be sent (MQTT broker / InfluxDB not reachable) are appended to segment files in the spool directory
+# and are read back in order when the output is available again. Writes are fsynced in batches, the spool size is capped
+# (the oldest segment is deleted when the cap is reached). The read position is kept in <name>.pos.
+# A damaged (torn) entry at the end of the write segment (power loss while writing) is truncated at startup,
+# the rest of an older segment after a damaged entry is skipped (counted once).
+# Updated: 2026-10-18
+# Version 2.8.4
+
+import os
+import json
+import time
+import zlib
+import struct
+import threading
+
+from grottlog import logger
+
+# entry header: payload length, crc32 of payload
+_HEADER = struct.Struct(">II")
+
+class Spool:
+
+    def __init__(self, directory, name, maxsize=100*1024*1024, segmentsize=1024*1024, syncevery=100, syncinterval=1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.prefix = os.path.join(directory, name)
+        self.maxsize = maxsize
+        self.segmentsize = min(segmentsize, max(4096, maxsize // 4))
+        self.syncevery = syncevery
+        self.syncinterval = syncinterval
+        self.lock = threading.Lock()
+
+        #counters
+        self.appended = 0
+        self.drained = 0
+        self.dropped = 0                                            #entries lost because the size cap was reached
+        self.corrupt = 0                                            #segments with an incomplete or damaged entry
+        self.skipped = set()                                        #segments with a damaged entry (rest of segment skipped)
+
+        self.segments = self.find_segments()
+        self.size = sum(os.path.getsize(self.segment(seq)) for seq in self.segments)
+        self.rseq, self.roff = self.load_pos()
+        for seq in [seq for seq in self.segments if seq < self.rseq]:
+            self.remove(seq)
+        if self.segments and self.rseq < self.segments[0]:
+            self.rseq, self.roff = self.segments[0], 0
+        self.wseq = self.segments[-1] if self.segments else self.rseq
+        if self.wseq in self.segments:
+            self.truncate(self.wseq)
+        self.file = open(self.segment(self.wseq), "ab")
+        if self.wseq not in self.segments: self.segments.append(self.wseq)
+        self.woff = self.file.tell()
+        self.unsynced = 0
+        self.lastsync = time.monotonic()
+        if not self.empty():
+            logger.info("\t - Grott spool %s: %s bytes waiting to be sent", name, self.size - self.roff)
+
+    def segment(self, seq):
+        return "{}-{:010d}.spool".format(self.prefix, seq)
+
+    def find_segments(self):
+        directory, name = os.path.split(self.prefix)
+        segments = []
+        for filename in os.listdir(directory):
+            if filename.startswith(name + "-") and filename.endswith(".spool"):
+                try:
+                    segments.append(int(filename[len(name)+1:-6]))
+                except ValueError:
+                    pass
+        return sorted(segments)
+
+    def load_pos(self):
+        try:
+            with open(self.prefix + ".pos") as posfile:
+                seq, off = json.load(posfile)
+                return int(seq), int(off)
+        except (OSError, ValueError, TypeError):
+            return (self.segments[0] if self.segments else 0), 0
+
+    def save_pos(self):
+        tmpname = self.prefix + ".pos.tmp"
+        with open(tmpname, "w") as posfile:
+            json.dump([self.rseq, self.roff], posfile)
+        os.replace(tmpname, self.prefix + ".pos")
+
+    def remove(self, seq):
+        try:
+            self.size -= os.path.getsize(self.segment(seq))
+            os.remove(self.segment(seq))
+        except OSError:
+            pass
+        self.segments.remove(seq)
+        self.skipped.discard(seq)
+
+    def truncate(self, seq):
+        # cut segment seq after the last complete entry (new entries are not appended after a torn entry)
+        filename = self.segment(seq)
+        valid = 0
+        with open(filename, "rb") as segfile:
+            while True:
+                header = segfile.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                length, crc = _HEADER.unpack(header)
+                data = segfile.read(length)
+                if len(data) < length or zlib.crc32(data) != crc:
+                    break
+                valid += _HEADER.size + length
+        size = os.path.getsize(filename)
+        if valid < size:
+            with open(filename, "r+b") as segfile:
+                segfile.truncate(valid)
+            self.size -= size - valid
+            self.corrupt += 1
+            logger.warning("\t - Grott spool %s: damaged entry at the end of %s removed", os.path.basename(self.prefix), filename)
+
+    def empty(self):
+        return self.rseq == self.wseq and self.roff >= self.woff
+
+    def append(self, item):
+        # append item (JSON serializable) at the end of the spool
+        data = json.dumps(item, separators=(",", ":")).encode("utf-8")
+        with self.lock:
+            if self.woff >= self.segmentsize:
+                self.rotate()
+            self.file.write(_HEADER.pack(len(data), zlib.crc32(data)) + data)
+            self.woff += _HEADER.size + len(data)
+            self.size += _HEADER.size + len(data)
+            self.appended += 1
+            self.unsynced += 1
+            if self.unsynced >= self.syncevery or time.monotonic() - self.lastsync >= self.syncinterval:
+                self.sync()
+            while self.size > self.maxsize and len(self.segments) > 1:
+                self.drop_oldest()
+
+    def rotate(self):
+        # close the write segment and start a new one
+        self.sync()
+        self.file.close()
+        self.wseq += 1
+        self.file = open(self.segment(self.wseq), "ab")
+        self.segments.append(self.wseq)
+        self.woff = 0
+
+    def drop_oldest(self):
+        # size cap reached: delete the oldest segment (count the unread entries)
+        seq = self.segments[0]
+        if seq >= self.rseq:
+            self.dropped += len(self.entries(seq, self.roff if seq == self.rseq else 0, None)[0])
+            if seq == self.rseq:
+                self.rseq, self.roff = self.segments[1], 0
+        self.remove(seq)
+        logger.warning("\t - Grott spool %s size limit reached, oldest messages dropped", os.path.basename(self.prefix))
+
+    def sync(self):
+        # write buffered entries to disk (fsync)
+        if self.unsynced:
+            self.file.flush()
+            try:
+                os.fsync(self.file.fileno())
+            except OSError:
+                pass
+        self.unsynced = 0
+        self.lastsync = time.monotonic()
+
+    def entries(self, seq, offset, limit):
+        # read entries from segment seq starting at offset, returns ([(item, position after item)], offset after the last item read)
+        items = []
+        try:
+            with open(self.segment(seq), "rb") as segfile:
+                segfile.seek(offset)
+                while limit is None or len(items) < limit:
+                    header = segfile.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        break
+                    length, crc = _HEADER.unpack(header)
+                    data = segfile.read(length)
+                    if len(data) < length or zlib.crc32(data) != crc:
+                        #incomplete / damaged entry: skip the rest of the segment (counted once)
+                        if seq not in self.skipped:
+                            self.skipped.add(seq)
+                            self.corrupt += 1
+                        offset = self.woff if seq == self.wseq else os.path.getsize(self.segment(seq))
+                        break
+                    offset += _HEADER.size + length
+                    items.append((json.loads(data.decode("utf-8")), (seq, offset)))
+        except OSError:
+            offset = self.segmentsize
+        return items, offset
+
+    def read(self, limit):
+        # return max limit [(item, position)] from the read position (one segment), call commit(position, count) for the items sent
+        with self.lock:
+            if self.unsynced:
+                self.file.flush()
+            seq, offset = self.rseq, self.roff
+            while True:
+                items, offset = self.entries(seq, offset, limit)
+                if items:
+                    return items
+                #nothing to send up to here (end of segment or damaged entries skipped): move the read position
+                if (seq, offset) > (self.rseq, self.roff):
+                    self.rseq, self.roff = seq, offset
+                nextseqs = [s for s in self.segments if s > seq]
+                if seq >= self.wseq or not nextseqs:
+                    return items
+                #continue with the next segment
+                seq, offset = nextseqs[0], 0
+
+    def commit(self, position, count):
+        # count items up to position are sent: move the read position, delete segments that are completely read
+        with self.lock:
+            seq, offset = position
+            if seq < self.rseq or (seq == self.rseq and offset <= self.roff):
+                #position already passed (already committed or segment dropped by the size cap)
+                return
+            self.drained += count
+            self.rseq, self.roff = seq, offset
+            for old in [s for s in self.segments if s < seq]:
+                self.remove(old)
+            if self.rseq == self.wseq and self.roff >= self.woff and self.woff >= self.segmentsize:
+                self.rotate()
+                self.remove(self.rseq)
+                self.rseq, self.roff = self.wseq, 0
+            self.save_pos()
+
+    def stats(self):
+        return {
+                    "size" : self.size,
+                    "appended" : self.appended,
+                    "drained" : self.drained,
+                    "dropped" : self.dropped,
+                    "corrupt" : self.corrupt
+                }
+
+    def close(self):
+        with self.lock:
+            self.sync()
+            self.file.close()
+            self.save_pos()
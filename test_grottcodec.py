@@ -0,0 +1,115 @@
+import sys, os
+
+# Required to import the grott modules from the root
+sys.path.append(os.path.dirname(__file__))
+
+
+import random
+from itertools import cycle
+
+import pytest
+import grottcodec
+from grottcodec import FrameReader, add_crc, check_crc, decrypt, encrypt, modbus_crc, validate_record
+
+
+def make_record(protocol, payload, sequence=1):
+    "Build a Growatt record with the payload length in the header (and crc for 05 / 06)"
+    record = sequence.to_bytes(2, "big") + bytes([0, protocol]) + (len(payload) + 2).to_bytes(2, "big") + bytes([1, 0x04]) + payload
+    if protocol in (5, 6):
+        record = add_crc(record)
+    return record
+
+
+def legacy_decrypt(data):
+    "Byte by byte XOR with the Growatt mask (the grott 2.8.3 routine), header not scrambled"
+    return bytes(data[:8]) + bytes(byte ^ mask for byte, mask in zip(data[8:], cycle(b"Growatt")))
+
+
+@pytest.mark.parametrize("length", [0, 7, 8, 9, 15, 16, 100, 579])
+def test_decrypt(length):
+    "Test that decrypt gives the same result as the byte by byte routine and that encrypt restores the record"
+
+    data = bytes(random.Random(length).getrandbits(8) for _ in range(length))
+    assert decrypt(data) == legacy_decrypt(data)
+    assert decrypt(bytearray(data)) == decrypt(memoryview(data))
+    assert encrypt(decrypt(data)) == data
+
+
+def test_crc():
+    "Test the modbus crc (known check value) and the crc trailer helpers"
+
+    assert modbus_crc(b"123456789") == 0x4B37
+    record = make_record(6, bytes(range(50)))
+    assert check_crc(record)
+    assert validate_record(record) == 0
+    # changed byte, changed crc or wrong length
+    assert not check_crc(record[:10] + b"\x00" + record[11:])
+    assert validate_record(record[:-1] + bytes([record[-1] ^ 1])) == 8
+    assert validate_record(record + b"\x00") == 8
+    # 02 records have no crc
+    assert validate_record(make_record(2, bytes(range(30)))) == 0
+
+
+def test_crc_without_libscrc(monkeypatch):
+    "Test that the built-in crc table gives the same crc as libscrc"
+
+    data = bytes(random.Random(1).getrandbits(8) for _ in range(200))
+    crc = modbus_crc(data)
+    monkeypatch.setattr(grottcodec, "libscrc", None)
+    assert modbus_crc(data) == crc
+    assert modbus_crc(b"123456789") == 0x4B37
+
+
+records = [make_record(6, bytes(range(40)), 1), make_record(5, bytes(range(100, 120)), 2), make_record(2, bytes(range(30)), 3)]
+
+
+def test_frame_coalesced():
+    "Test that several records in one read are split in records"
+
+    framer = FrameReader()
+    assert framer.feed(b"".join(records)) == records
+    assert framer.pending() == 0
+
+
+def test_frame_split():
+    "Test that a record received in parts is returned when complete"
+
+    framer = FrameReader()
+    data = b"".join(records)
+    frames = []
+    for pos in range(0, len(data), 7):
+        frames += framer.feed(data[pos:pos + 7])
+    assert frames == records
+    assert framer.pending() == 0
+
+
+def test_frame_not_growatt():
+    "Test that data without a Growatt header is returned unchanged"
+
+    framer = FrameReader()
+    assert framer.feed(b"GET / HTTP/1.1\r\n") == [b"GET / HTTP/1.1\r\n"]
+
+
+def test_frame_corrupt_length():
+    "Test that a record with a corrupt length field does not stall the stream"
+
+    corrupt = bytearray(records[0])
+    corrupt[4:6] = (0x7000).to_bytes(2, "big")
+    framer = FrameReader()
+    assert framer.feed(bytes(corrupt)) == []
+    # the records after the corrupt record are returned
+    assert framer.feed(b"".join(records)) == records
+    assert framer.pending() == 0
+    assert framer.dropped == len(corrupt)
+
+
+def test_frame_corrupt_crc():
+    "Test that a 05 / 06 record with an invalid crc is dropped and the next record is found"
+
+    corrupt = bytearray(records[0])
+    corrupt[20] ^= 0xFF
+    framer = FrameReader()
+    assert framer.feed(bytes(corrupt) + records[1]) == [records[1]]
+    assert framer.pending() == 0
+    # valid records are returned after the resync
+    assert framer.feed(records[2]) == [records[2]]
@@ -0,0 +1,88 @@
+import sys, os
+
+# Required to import the grott modules from the root
+sys.path.append(os.path.dirname(__file__))
+
+
+import random
+
+import pytest
+from grottconf import Conf
+from grottdecoder import LayoutDecoder, LayoutDecodeError
+
+
+conf = Conf("2.8.4")
+
+
+def legacy_decode(layout, hexdata):
+    "Decode a record hex string keyword by keyword (the grott 2.8.3 procdata routine), None if a keyword fails"
+    values = {}
+    try:
+        logfields = bytes.fromhex(hexdata[layout["logstart"]["value"]:len(hexdata) - 4]).decode("ASCII").split(",")
+    except:
+        logfields = []
+    for keyword, spec in layout.items():
+        if keyword in ("decrypt", "date", "logstart", "device"):
+            continue
+        try:
+            keytype = spec.get("type", "num")
+            if keytype in ("num", "numx", "text"):
+                chunk = hexdata[spec["value"]:spec["value"] + spec["length"] * 2]
+            if keytype == "text":
+                values[keyword] = bytes.fromhex(chunk).decode("utf-8")
+            elif keytype == "num":
+                values[keyword] = int(chunk, 16)
+            elif keytype == "numx":
+                values[keyword] = int.from_bytes(bytes.fromhex(chunk), "big", signed=True)
+            elif keytype == "log":
+                values[keyword] = logfields[spec["pos"] - 1]
+            elif keytype == "logpos":
+                values[keyword] = logfields[spec["pos"] - 1] if float(logfields[spec["pos"] - 1]) > 0 else 0
+            elif keytype == "logneg":
+                values[keyword] = logfields[spec["pos"] - 1] if float(logfields[spec["pos"] - 1]) < 0 else 0
+        except:
+            return None
+    return values
+
+
+def make_plain(layout, seed):
+    "Random plain record long enough for all fields of the layout (ascii bytes: text fields can be decoded)"
+    end = max([spec["value"] + spec["length"] * 2 for spec in layout.values()
+               if isinstance(spec, dict) and isinstance(spec.get("value"), int) and isinstance(spec.get("length"), int)] + [0])
+    rnd = random.Random(seed)
+    plain = bytes(rnd.choice(b"0123456789ABCDEFGHJKLMNPQRSTUVWXYZ") for _ in range(end // 2 + 8))
+    if "logstart" in layout:
+        # smart meter raillog: comma separated values after logstart, followed by the crc
+        npos = max(spec.get("pos", 0) for spec in layout.values() if isinstance(spec, dict))
+        log = ",".join("{:.1f}".format(rnd.uniform(-500, 500)) for _ in range(npos))
+        plain = plain[:layout["logstart"]["value"] // 2].ljust(layout["logstart"]["value"] // 2, b"0") + log.encode("ascii") + b"\x12\x34"
+    return plain
+
+
+@pytest.mark.parametrize("name", sorted(conf.recorddict))
+def test_decode_layout(name):
+    "Test that the compiled decoder gives the same values as the keyword by keyword decode for every layout"
+
+    layout = conf.recorddict[name]
+    decoder = LayoutDecoder(name, layout, includeall=True)
+    for seed in range(3):
+        plain = make_plain(layout, seed)
+        expected = legacy_decode(layout, plain.hex())
+        if expected is None:
+            # the keyword by keyword decode stops on this record, the compiled decoder raises an error
+            with pytest.raises(LayoutDecodeError):
+                decoder.decode(plain)
+            continue
+        values = dict(zip(decoder.fields, decoder.decode(plain)))
+        assert values == {key: expected[key] for key in decoder.fields}
+
+
+def test_decode_short_record():
+    "Test that a field after the end of the record is an error and fields before it are decoded"
+
+    layout = {"pvserial": {"value": 36, "length": 10, "type": "text"}, "pvpowerout": {"value": 60, "length": 4, "type": "num"}}
+    decoder = LayoutDecoder("test", layout, includeall=True)
+    plain = make_plain(layout, 1)
+    assert dict(zip(decoder.fields, decoder.decode(plain))) == legacy_decode(layout, plain.hex())
+    with pytest.raises(LayoutDecodeError):
+        decoder.decode(plain[:30])
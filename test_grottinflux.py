@@ -0,0 +1,130 @@
+import sys, os
+
+# Required to import the grott modules from the root
+sys.path.append(os.path.dirname(__file__))
+
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+from grottinflux import InfluxLineWriter, LineEncoder, escape_key, field_value, epoch
+
+
+class InfluxStandIn(BaseHTTPRequestHandler):
+    "InfluxDB stand-in: saves the write requests, answers bucket queries with the response of the test"
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        self.server.requests.append((self.path, dict(self.headers), body.decode("utf-8")))
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers), None))
+        body = json.dumps(self.server.buckets).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), InfluxStandIn)
+    server.requests = []
+    server.buckets = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_write_v1(server):
+    "Test a v1 write: database and precision in the url, lines in the body, keep-alive connection reused"
+
+    writer = InfluxLineWriter("127.0.0.1", server.server_address[1], user="grott", password="growatt")
+    writer.write("grottdb", ["NCO7410 pvpowerout=1234i 1700000000"])
+    writer.write("grottdb", ["NCO7410 pvpowerout=1235i 1700000060", "NCO7410 pvpowerout=1236i 1700000120"])
+
+    assert len(server.requests) == 2
+    path, headers, body = server.requests[1]
+    assert urlparse(path).path == "/write"
+    assert parse_qs(urlparse(path).query) == {"db": ["grottdb"], "precision": ["s"]}
+    assert headers["Authorization"].startswith("Basic ")
+    assert body == "NCO7410 pvpowerout=1235i 1700000060\nNCO7410 pvpowerout=1236i 1700000120"
+    assert writer.http.pool.qsize() == 1
+
+
+def test_write_v2_gzip(server):
+    "Test a v2 write: org, bucket and token, gzip compressed body"
+
+    writer = InfluxLineWriter("127.0.0.1", server.server_address[1], v2=True, org="home", token="secret", compress=True)
+    writer.write("grott", ["NCO7410 pvpowerout=1234i 1700000000"])
+
+    path, headers, body = server.requests[0]
+    assert urlparse(path).path == "/api/v2/write"
+    assert parse_qs(urlparse(path).query) == {"org": ["home"], "bucket": ["grott"], "precision": ["s"]}
+    assert headers["Authorization"] == "Token secret"
+    assert body == "NCO7410 pvpowerout=1234i 1700000000"
+
+
+def test_bucket_exists(server):
+    "Test that only a bucket with the same name in the buckets list is found"
+
+    writer = InfluxLineWriter("127.0.0.1", server.server_address[1], v2=True, org="home", token="secret")
+    server.buckets = {"buckets": [{"id": "1", "name": "other"}, {"id": "2", "name": "grott"}]}
+    assert writer.bucket_exists("grott")
+
+    server.buckets = {"buckets": [{"id": "1", "name": "other"}]}
+    assert not writer.bucket_exists("grott")
+
+    # an error body or an org object with a name is not a bucket
+    server.buckets = {"code": "not found", "name": "grott"}
+    assert not writer.bucket_exists("grott")
+    server.buckets = {"buckets": [], "orgs": [{"name": "grott"}]}
+    assert not writer.bucket_exists("grott")
+
+
+def test_escape_key():
+    "Test that spaces, commas, equal signs, backslashes and newlines in keys are escaped"
+
+    assert escape_key("pvpowerout") == "pvpowerout"
+    assert escape_key("my inverter") == "my\\ inverter"
+    assert escape_key("a,b=c") == "a\\,b\\=c"
+    assert escape_key("back\\slash") == "back\\\\slash"
+    assert escape_key("new\nline") == "new\\nline"
+
+
+def test_field_value():
+    "Test the line protocol field value types"
+
+    assert field_value(1234) == "1234i"
+    assert field_value(-5) == "-5i"
+    assert field_value(12.5) == "12.5"
+    assert field_value(True) == "true"
+    assert field_value(None) is None
+    assert field_value('say "hi"\\') == '"say \\"hi\\"\\\\"'
+    assert field_value("NCO7410") == '"NCO7410"'
+
+
+def test_encode_line():
+    "Test that fields are sorted, excluded fields skipped, None values left out and the time is in the precision"
+
+    encoder = LineEncoder(precision="ms")
+    fields = ("pvserial", "date", "pvpowerout", "my field", "empty")
+    line = encoder.encode("NCO 7410", fields, ("NCO7410", "x", 1234, 1.5, None), "2023-11-14T22:13:20")
+    assert line == 'NCO\\ 7410 my\\ field=1.5,pvpowerout=1234i,pvserial="NCO7410" 1700000000000'
+    assert epoch("2023-11-14T22:13:20") == 1700000000
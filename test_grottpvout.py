@@ -0,0 +1,56 @@
+import sys, os
+
+# Required to import the grott modules from the root
+sys.path.append(os.path.dirname(__file__))
+
+
+import pytest
+from grottpvout import PvOutputUploader
+
+
+@pytest.fixture
+def uploader():
+    uploader = PvOutputUploader("apikey", "http://127.0.0.1:1/service/r2/addbatchstatus.jsp", interval=3600)
+    yield uploader
+    uploader.running = False
+
+
+def test_refused_batches_kept(uploader):
+    "Test that no statuses are lost if PVOutput refuses a request: the batches not sent are requeued"
+
+    requests = []
+    def request(method, path, body, headers):
+        requests.append(body)
+        return 429, b"Forbidden 429: Exceeded 60 requests per hour"
+    uploader.http.request = request
+
+    # smart meter record: consumption (c1=3) and net (n=1) statuses are two batches
+    uploader.add("1234", {"d": "20231114", "t": "22:13", "v2": 1500})
+    uploader.add("1234", {"d": "20231114", "t": "22:13", "v4": 300, "c1": 3})
+    uploader.add("1234", {"d": "20231114", "t": "22:13", "v4": -200, "n": 1})
+    uploader.send_all()
+
+    assert len(requests) == 1
+    assert uploader.pending == 3
+    assert sum(len(statuses) for statuses in uploader.batches.values()) == 3
+    assert uploader.stats()["refused"] == 1
+
+
+def test_send_all(uploader):
+    "Test that one request per system id and parameters is sent"
+
+    requests = []
+    def request(method, path, body, headers):
+        requests.append((headers["X-Pvoutput-SystemId"], body))
+        return 200, b"OK 200: Added Status"
+    uploader.http.request = request
+
+    uploader.add("1234", {"d": "20231114", "t": "22:13", "v2": 1500})
+    uploader.add("1234", {"d": "20231114", "t": "22:18", "v2": 1600})
+    uploader.add("5678", {"d": "20231114", "t": "22:18", "v4": 300, "c1": 3})
+    uploader.send_all()
+
+    assert sorted(requests) == [("1234", "data=20231114%2C22%3A13%2C%2C1500%3B20231114%2C22%3A18%2C%2C1600"),
+                                ("5678", "data=20231114%2C22%3A18%2C%2C%2C%2C300&c1=3")]
+    assert uploader.pending == 0
+    assert uploader.stats()["sent"] == 3
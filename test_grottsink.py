@@ -0,0 +1,115 @@
+import sys, os
+
+# Required to import the grott modules from the root
+sys.path.append(os.path.dirname(__file__))
+
+
+import time
+import threading
+
+import pytest
+from grottsink import SinkWorker
+
+
+class BlockedOutput:
+    "Output that waits until released, the items it received are saved"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.items = []
+
+    def __call__(self, item):
+        self.started.set()
+        self.release.wait(5)
+        self.items.append(item)
+
+
+def fill(policy):
+    "Block the worker with item 0, then queue items 1 - 5 in a queue of 3"
+    output = BlockedOutput()
+    sink = SinkWorker("test", output, queuesize=3, policy=policy)
+    sink.put(0)
+    assert output.started.wait(5)
+    results = [sink.put(item) for item in range(1, 6)]
+    return output, sink, results
+
+
+def finish(output, sink):
+    output.release.set()
+    sink.stop()
+    return output.items
+
+
+def test_dropoldest():
+    "Test that a full queue drops the oldest item"
+
+    output, sink, results = fill("dropoldest")
+    assert results == [True] * 5
+    assert finish(output, sink) == [0, 3, 4, 5]
+    assert sink.stats()["dropped"] == 2
+
+
+def test_dropnewest():
+    "Test that a full queue refuses the new item"
+
+    output, sink, results = fill("dropnewest")
+    assert results == [True, True, True, False, False]
+    assert finish(output, sink) == [0, 1, 2, 3]
+    assert sink.stats()["dropped"] == 2
+
+
+def test_block():
+    "Test that put waits for free space in a full queue (no items dropped)"
+
+    output = BlockedOutput()
+    sink = SinkWorker("test", output, queuesize=3, policy="block")
+    sink.put(0)
+    assert output.started.wait(5)
+    for item in range(1, 4):
+        sink.put(item)
+    producer = threading.Thread(target=sink.put, args=(4,))
+    producer.start()
+    producer.join(0.2)
+    assert producer.is_alive()
+    output.release.set()
+    producer.join(5)
+    assert finish(output, sink) == [0, 1, 2, 3, 4]
+    assert sink.stats()["dropped"] == 0
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        SinkWorker("test", print, policy="dropall")
+
+
+def test_timeout_and_errors():
+    "Test that a call timeout is counted as timeout and an error of the output (also TimeoutError) as failed"
+
+    def output(item):
+        if item == "slow":
+            time.sleep(1)
+        elif item == "error":
+            raise TimeoutError("socket timeout")
+
+    sink = SinkWorker("test", output, timeout=0.2)
+    for item in ("error", "slow", "ok"):
+        sink.put(item)
+    sink.stop()
+    stats = sink.stats()
+    assert (stats["sent"], stats["failed"], stats["timeouts"]) == (1, 1, 1)
+
+
+def test_batch_and_onstop():
+    "Test that a batch sink gets the waiting items in one call and onstop is called after the last item"
+
+    calls = []
+    output = BlockedOutput()
+    sink = SinkWorker("test", lambda items: (output(items[0]), calls.append(items)), batch=10, onstop=lambda: calls.append("stop"))
+    sink.put("first")
+    assert output.started.wait(5)
+    for item in range(5):
+        sink.put(item)
+    output.release.set()
+    sink.stop()
+    assert calls == [[("first",)], [(0,), (1,), (2,), (3,), (4,)], "stop"]
@@ -0,0 +1,118 @@
+import sys, os
+
+# Required to import the grott modules from the root
+sys.path.append(os.path.dirname(__file__))
+
+
+import pytest
+from grottspool import Spool
+
+
+def read_all(spool, limit=10):
+    "Read and commit all spooled items"
+    items = []
+    while True:
+        batch = spool.read(limit)
+        if not batch:
+            return items
+        items += [item for item, position in batch]
+        spool.commit(batch[-1][1], len(batch))
+
+
+def test_spool_order(tmp_path):
+    "Test that items are read in order over several segments and that read segments are removed"
+
+    spool = Spool(str(tmp_path), "mqtt", maxsize=1024 * 1024, segmentsize=4096)
+    for i in range(500):
+        spool.append(["grott/NCO7410", "message %d" % i, False, 0])
+    assert len(spool.segments) > 1
+    assert [item[1] for item in read_all(spool)] == ["message %d" % i for i in range(500)]
+    assert spool.empty()
+    assert len(spool.segments) == 1
+    spool.close()
+
+
+def test_spool_restart(tmp_path):
+    "Test that after a restart the items not committed are read again, in order, followed by new items"
+
+    spool = Spool(str(tmp_path), "influx", segmentsize=4096)
+    for i in range(300):
+        spool.append({"point": i})
+    # send (commit) the first 100 items, read 50 more without commit (e.g. write failed)
+    sent = 0
+    while sent < 100:
+        batch = spool.read(100 - sent)
+        spool.commit(batch[-1][1], len(batch))
+        sent += len(batch)
+    spool.read(50)
+    spool.close()
+
+    spool = Spool(str(tmp_path), "influx", segmentsize=4096)
+    assert not spool.empty()
+    spool.append({"point": 300})
+    assert [item["point"] for item in read_all(spool)] == list(range(100, 301))
+    spool.close()
+
+    # nothing left after the next restart
+    spool = Spool(str(tmp_path), "influx", segmentsize=4096)
+    assert spool.empty()
+    spool.close()
+
+
+def test_spool_size_cap(tmp_path):
+    "Test that the oldest segment is dropped when the size cap is reached and the newest items are kept"
+
+    spool = Spool(str(tmp_path), "mqtt", maxsize=16 * 1024, segmentsize=4096)
+    for i in range(2000):
+        spool.append(["grott/NCO7410", "message %d" % i, False, 0])
+    assert spool.size <= 16 * 1024
+    items = [int(item[1].split()[1]) for item in read_all(spool)]
+    assert items == list(range(items[0], 2000))
+    assert spool.stats()["dropped"] == items[0]
+    spool.close()
+
+
+def test_spool_torn_tail(tmp_path):
+    "Test that a torn entry at the end of the spool (power loss while writing) is removed at restart"
+
+    spool = Spool(str(tmp_path), "mqtt")
+    for i in range(10):
+        spool.append({"point": i})
+    spool.close()
+    # last entry partly written
+    segment = spool.segment(spool.wseq)
+    with open(segment, "r+b") as segfile:
+        segfile.truncate(os.path.getsize(segment) - 3)
+
+    spool = Spool(str(tmp_path), "mqtt")
+    assert spool.stats()["corrupt"] == 1
+    spool.append({"point": 10})
+    assert [item["point"] for item in read_all(spool)] == list(range(9)) + [10]
+    spool.close()
+
+
+def test_spool_damaged_segment(tmp_path):
+    "Test that the rest of an older segment after a damaged entry is skipped once and the next segments are read"
+
+    spool = Spool(str(tmp_path), "influx", segmentsize=4096)
+    for i in range(300):
+        spool.append({"point": i})
+    first = spool.segments[0]
+    items, offset = spool.entries(first, 0, 10)
+    # damage the 11th entry of the first segment
+    with open(spool.segment(first), "r+b") as segfile:
+        segfile.seek(offset + 10)
+        segfile.write(b"\xff\xff")
+
+    points = []
+    while True:
+        batch = spool.read(15)
+        if not batch:
+            break
+        points += [item["point"] for item, position in batch]
+        spool.commit(batch[-1][1], len(batch))
+    assert points[:10] == list(range(10))
+    assert points[-1] == 299
+    assert points == sorted(points)
+    assert spool.stats()["corrupt"] == 1
+    spool.close()